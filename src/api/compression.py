@@ -0,0 +1,48 @@
+"""
+Response compression for the API.
+
+JSON responses are compressed with brotli when brotli-asgi is installed and
+the client accepts it, and with gzip otherwise. Image routes are excluded:
+PNG/WebP are already compressed, and compressing them would break range
+requests and ETags.
+"""
+
+from typing import Sequence
+
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.config.settings import Settings
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli is optional, gzip is always available
+    BrotliMiddleware = None
+
+
+class CompressionMiddleware:
+    """Negotiates brotli/gzip for every HTTP response outside the excluded path prefixes."""
+
+    def __init__(self, app: ASGIApp, settings: Settings, excluded_prefixes: Sequence[str] = ()):
+        self._app = app
+        self._excluded_prefixes = tuple(excluded_prefixes)
+        minimum_size = settings.api.compression_minimum_size
+        if BrotliMiddleware is not None:
+            self._compressed_app = BrotliMiddleware(
+                app,
+                quality=settings.api.brotli_quality,
+                minimum_size=minimum_size,
+                gzip_fallback=True
+            )
+        else:
+            self._compressed_app = GZipMiddleware(
+                app,
+                minimum_size=minimum_size,
+                compresslevel=settings.api.gzip_level
+            )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not scope["path"].startswith(self._excluded_prefixes):
+            await self._compressed_app(scope, receive, send)
+        else:
+            await self._app(scope, receive, send)
@@ -1,26 +1,19 @@
 from fastapi import FastAPI
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 import logging
 
-from src.api.routes import download_besluiten, health
+from src.api.compression import CompressionMiddleware
+from src.api.tracing import TracingMiddleware
+from src.api.routes import backfill, download_besluiten, export, health, images, metrics, search
 from src.config.settings import get_settings
+from src.services.cache_warmer import get_cache_warmer
+from src.utils.logging_setup import configure_logging
+from src.utils.tracing import get_tracer
 
 settings = get_settings()
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.logging.level),
-    format=settings.logging.format,
-    handlers=[
-        logging.StreamHandler(),  # Console output for Docker logs
-        logging.FileHandler(settings.logging.file)  # File output
-    ],
-    force=True  # Override any existing logging configuration
-)
-
-# Ensure root logger level is set
-logging.getLogger().setLevel(getattr(logging, settings.logging.level))
+# Configure logging (console and file are written by a background thread)
+configure_logging(settings)
 
 # Test logging configuration
 logging.info("🚀 Logging configured successfully - detailed processing logs will be visible")
@@ -31,8 +24,19 @@ app = FastAPI(
     version="1.1.0"
 )
 
-# Mount static files for serving saved images
-app.mount("/afbeeldingen", StaticFiles(directory="afbeeldingen"), name="afbeeldingen")
+# Compress JSON responses (images are served as-is)
+if settings.api.compression_enabled:
+    app.add_middleware(CompressionMiddleware, settings=settings, excluded_prefixes=["/afbeeldingen"])
+
+# Trace every request; adds X-Trace-Id and a Server-Timing breakdown per stage
+app.add_middleware(TracingMiddleware, settings=settings, tracer=get_tracer())
+
+# Serve saved images (with caching headers, range requests and thumbnails)
+app.include_router(
+    images.router,
+    prefix="/afbeeldingen",
+    tags=["afbeeldingen"]
+)
 
 # Mount routes
 app.include_router(
@@ -47,6 +51,43 @@ app.include_router(
     tags=["besluiten"]
 )
 
+app.include_router(
+    backfill.router,
+    prefix="/backfill",
+    tags=["backfill"]
+)
+
+app.include_router(
+    export.router,
+    prefix="/export",
+    tags=["export"]
+)
+
+app.include_router(
+    search.router,
+    prefix="/search",
+    tags=["search"]
+)
+
+app.include_router(
+    metrics.router,
+    prefix="/metrics",
+    tags=["metrics"]
+)
+
+
+# Pre-process the most recent publication days in the background (warmer settings)
+@app.on_event("startup")
+def start_cache_warmer():
+    if settings.warmer.enabled:
+        get_cache_warmer().start()
+
+
+@app.on_event("shutdown")
+def stop_cache_warmer():
+    if settings.warmer.enabled:
+        get_cache_warmer().stop()
+
 
 
 if __name__ == "__main__":
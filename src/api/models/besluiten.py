@@ -1,6 +1,14 @@
 from typing import List, Optional
+from enum import Enum
 from pydantic import BaseModel, HttpUrl, Field
 
+class BesluitField(str, Enum):
+    """Top-level fields that can be selected with the `fields` parameter."""
+    ID = "id"
+    TEXT = "text"
+    METADATA = "metadata"
+    IMAGES = "images"
+
 class GebiedsMarkeringModel(BaseModel):
     """Model for geographical area markings in a verkeersbesluit."""
     type: str = Field(..., description="Type of area marking (e.g., 'Lijn')")
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, HTTPException, Path
+from fastapi.responses import JSONResponse
+
+from src.services.backfill_service import BackfillService
+from src.config.settings import get_settings
+
+router = APIRouter()
+settings = get_settings()
+backfill_service = BackfillService(settings=settings)
+
+DATE_REGEX = r"^\d{4}-\d{2}-\d{2}$"
+
+@router.post("/{start_date_str}/{end_date_str}", summary="Start a sharded backfill for a large date range")
+async def start_backfill(
+    start_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=DATE_REGEX),
+    end_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=DATE_REGEX)
+):
+    """
+    Starts a backfill in the background and returns immediately.
+    
+    The range is split into day/week shards sized from the SRU hit count. Shards run
+    concurrently within the rate limit budget and are checkpointed, so posting the same
+    range again after an interruption resumes where the previous run stopped.
+    
+    Examples:
+        - `POST /backfill/2022-01-01/2024-12-01`
+    """
+    try:
+        started = backfill_service.start_backfill(start_date_str, end_date_str)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    status = backfill_service.get_status(start_date_str, end_date_str)
+    status["started"] = started
+    return JSONResponse(status_code=202, content=status)
+
+@router.get("/{start_date_str}/{end_date_str}", summary="Get the progress of a backfill")
+async def get_backfill_status(
+    start_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=DATE_REGEX),
+    end_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=DATE_REGEX)
+):
+    """Returns shard and record counts of a (running or finished) backfill job."""
+    return backfill_service.get_status(start_date_str, end_date_str)
@@ -1,28 +1,44 @@
-from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi import APIRouter, HTTPException, Path, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
-from typing import List, Optional
+from functools import partial
+from typing import Any, Dict, List, Optional
 import logging
 
-from src.services.besluit_download_service import BesluitService
+from src.services.besluit_download_service import SruError, get_besluit_service
 from src.config.settings import get_settings
-from src.api.models.besluiten import VerkeersBesluitResponse
+from src.api.models.besluiten import BesluitField, VerkeersBesluitResponse
+from src.utils.besluit_record import records_to_json
 from src.utils.filters import BordcodeCategory
+from src.utils.query_cache import BYPASS, BesluitenQuery, get_query_cache
 
 router = APIRouter()
 settings = get_settings()
-besluit_service = BesluitService(settings=settings)
+besluit_service = get_besluit_service()
+query_cache = get_query_cache()
 
 @router.get("/{start_date_str}/{end_date_str}", summary="Get traffic decisions for a specific date range")
 async def get_besluiten_by_date(
+    response: Response,
     start_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=r"^\d{4}-\d{2}-\d{2}$"),
     end_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=r"^\d{4}-\d{2}-\d{2}$"),
     bordcode_categories: Optional[List[BordcodeCategory]] = Query(None, description="Filter by bordcode categories (A, C, D, F, G). Include if metadata contains ANY of these letters."),
     provinces: Optional[List[str]] = Query(None, description="Filter by Dutch provinces (case-insensitive). Valid values: drenthe, flevoland, friesland, gelderland, groningen, limburg, noord-brabant, noord-holland, overijssel, utrecht, zeeland, zuid-holland"),
-    gemeenten: Optional[List[str]] = Query(None, description="Filter by municipalities (case-insensitive). Include decisions from these specific municipalities.")
+    gemeenten: Optional[List[str]] = Query(None, description="Filter by municipalities (case-insensitive). Include decisions from these specific municipalities."),
+    fields: Optional[List[BesluitField]] = Query(None, description="Only return these fields (id is always included). Without 'text' no plain text is extracted, without 'images' the image pipeline is skipped."),
+    metadata_only: bool = Query(False, description="Only fetch metadata: no content download, text, images, PDFs or classification. Returns id and metadata."),
+    fast: Optional[bool] = Query(None, description="Serialize the service output directly, skipping response model validation. Same JSON shape; defaults to the api.fast_json setting."),
+    classify_images: Optional[bool] = Query(None, description="Download embedded illustraties (rejecting small ones) and only return maps/aerial photos. Defaults to the file.classify_embedded_images setting."),
+    profile: bool = Query(False, description="Profile this run (sampled CPU stacks and memory per stage) into the profiles directory")
 ) -> List[VerkeersBesluitResponse]:
     """
     Retrieves all traffic decisions for a given date range with optional filtering.
     
+    Results are cached per normalized query (see query_cache settings); the
+    X-Cache header tells whether a response came from the cache (HIT), from a
+    stale entry that is being refreshed (STALE), from a new run (MISS) or
+    skipped the cache (BYPASS, e.g. profiled runs).
+    
     Args:
         start_date_str: Start date in YYYY-MM-DD format
         end_date_str: End date in YYYY-MM-DD format  
@@ -30,6 +46,11 @@ async def get_besluiten_by_date(
                            Includes decisions if metadata contains ANY of these letters.
         provinces: Optional list of Dutch provinces (case-insensitive)
         gemeenten: Optional list of municipalities (case-insensitive)
+        fields: Optional list of fields to return; unrequested parts are not produced at all
+        metadata_only: Only use the SRU records and metadata manifestations
+        fast: Skip response model validation and encode with orjson
+        classify_images: Only return embedded illustraties that CLIP classifies as maps/aerial photos
+        profile: Write a CPU flamegraph (folded stacks) and top allocators per stage
         
     Returns:
         List of processed verkeersbesluit data including metadata, text, and image URLs
@@ -39,22 +60,102 @@ async def get_besluiten_by_date(
         - `/besluiten/2024-01-01/2024-01-02?provinces=utrecht&provinces=gelderland`
         - `/besluiten/2024-01-01/2024-01-02?gemeenten=amsterdam&gemeenten=rotterdam`
         - `/besluiten/2024-01-01/2024-01-02?bordcode_categories=A&provinces=utrecht&gemeenten=amsterdam`
+        - `/besluiten/2024-01-01/2024-01-02?fields=metadata&fields=images`
+        - `/besluiten/2024-01-01/2024-01-02?metadata_only=true`
+        - `/besluiten/2024-01-01/2024-01-02?fast=true`
+        - `/besluiten/2024-01-01/2024-01-02?classify_images=true`
+        - `/besluiten/2024-01-01/2024-01-02?profile=true`
     """
     try:
-        # Pass filters directly to service for early filtering (before image processing)
-        results = besluit_service.get_besluiten_for_date(
+        if profile and not settings.profiling.allow_per_request:
+            raise HTTPException(status_code=403, detail="Per-request profiling is disabled (profiling.allow_per_request)")
+        
+        # Pass filters directly to service for early filtering (before image processing).
+        # The service blocks on network I/O, so it runs in the threadpool to keep the
+        # event loop free and let concurrent callers share in-flight downloads.
+        field_names = {field.value for field in fields} if fields else None
+        if metadata_only:
+            field_names = (field_names or {"id", "metadata"}) - {"text", "images"}
+        include_text = field_names is None or "text" in field_names
+        include_images = field_names is None or "images" in field_names
+        if classify_images is None:
+            classify_images = settings.file.classify_embedded_images
+        load = partial(
+            besluit_service.get_besluiten_for_date,
             start_date_str=start_date_str,
             end_date_str=end_date_str,
             bordcode_categories=bordcode_categories,
             provinces=provinces,
-            gemeenten=gemeenten
+            gemeenten=gemeenten,
+            include_text=include_text,
+            include_images=include_images,
+            metadata_only=metadata_only,
+            classify_embedded_images=classify_images,
+            profile=profile
         )
+        if query_cache is None or profile:
+            results, cache_status = await run_in_threadpool(load), BYPASS
+        else:
+            query = BesluitenQuery.normalize(
+                start_date_str, end_date_str, bordcode_categories, provinces, gemeenten,
+                include_text, include_images, metadata_only, classify_images
+            )
+            results, cache_status = await run_in_threadpool(query_cache.get, query, load)
         
-        return results
+        # Projected items don't match the response model, so they are always serialized directly
+        if field_names is not None or (settings.api.fast_json if fast is None else fast):
+            # The service output is trusted, so returning a Response skips FastAPI's
+            # per-item validation (HttpUrl checks, alias mapping) and stdlib encoding
+            return Response(
+                content=records_to_json(results, field_names),
+                media_type="application/json",
+                headers={"X-Cache": cache_status}
+            )
+        response.headers["X-Cache"] = cache_status
+        return [besluit.to_dict() for besluit in results]
     except HTTPException:
         # Re-raise HTTPExceptions (like our validation errors) without modification
         raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except SruError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
+
+
+@router.get("/{start_date_str}/{end_date_str}/aggregate", summary="Count traffic decisions per authority, province, bordcode category and day")
+async def aggregate_besluiten(
+    start_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=r"^\d{4}-\d{2}-\d{2}$"),
+    end_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=r"^\d{4}-\d{2}-\d{2}$"),
+    bordcode_categories: Optional[List[BordcodeCategory]] = Query(None, description="Filter by bordcode categories (A, C, D, F, G)."),
+    provinces: Optional[List[str]] = Query(None, description="Filter by Dutch provinces (case-insensitive)."),
+    gemeenten: Optional[List[str]] = Query(None, description="Filter by municipalities (case-insensitive)."),
+    source: str = Query("live", description="'live' queries KOOP in metadata-only mode; 'index' counts the besluiten already in the local search index", regex=r"^(live|index)$")
+) -> Dict[str, Any]:
+    """
+    Aggregated counts for dashboards, without downloading content, PDFs or images.
+    
+    Returns:
+        Total plus counts by authority, province, bordcode category and day
+        
+    Examples:
+        - `/besluiten/2024-01-01/2024-01-31/aggregate`
+        - `/besluiten/2024-01-01/2024-12-31/aggregate?source=index&provinces=utrecht`
+    """
+    try:
+        return await run_in_threadpool(
+            besluit_service.aggregate_besluiten,
+            start_date_str=start_date_str,
+            end_date_str=end_date_str,
+            bordcode_categories=bordcode_categories,
+            provinces=provinces,
+            gemeenten=gemeenten,
+            source=source
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except SruError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An internal error occurred: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, HTTPException, Path, Query
+from fastapi.responses import JSONResponse
+from typing import Optional
+
+from src.services.export_service import ExportService
+from src.config.settings import get_settings
+
+router = APIRouter()
+settings = get_settings()
+export_service = ExportService(settings=settings)
+
+DATE_REGEX = r"^\d{4}-\d{2}-\d{2}$"
+SOURCE_REGEX = r"^(index|live)$"
+
+@router.post("/{start_date_str}/{end_date_str}", summary="Start a Parquet/Arrow export of a date range")
+async def start_export(
+    start_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=DATE_REGEX),
+    end_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=DATE_REGEX),
+    source: str = Query("index", description="'index' exports what the service has already processed, 'live' downloads the range through the pipeline", regex=SOURCE_REGEX),
+    include_text: Optional[bool] = Query(None, description="Add a column with the plain text. Defaults to the export.include_text setting."),
+    format: Optional[str] = Query(None, description="'parquet' or 'arrow'. Defaults to the export.format setting.", regex=r"^(parquet|arrow)$")
+):
+    """
+    Starts an export in the background and returns immediately.
+    
+    Besluiten are written to `<export.dirname>/<start>_<end>_<source>/` as Hive-style
+    partitions (`date=YYYY-MM-DD/authority=.../part-0.parquet`) in row groups, so
+    exports of years of data run in bounded memory. Read them with e.g.
+    `pyarrow.dataset.dataset(path, partitioning="hive")`.
+    
+    Examples:
+        - `POST /export/2022-01-01/2024-12-31`
+        - `POST /export/2024-01-01/2024-01-31?source=live&include_text=true&format=arrow`
+    """
+    try:
+        started = export_service.start_export(
+            start_date_str, end_date_str, source, include_text=include_text, file_format=format
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    status = export_service.get_status(start_date_str, end_date_str, source)
+    status["started"] = started
+    return JSONResponse(status_code=202, content=status)
+
+@router.get("/{start_date_str}/{end_date_str}", summary="Get the status of an export")
+async def get_export_status(
+    start_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=DATE_REGEX),
+    end_date_str: str = Path(..., description="Date in YYYY-MM-DD format", regex=DATE_REGEX),
+    source: str = Query("index", description="Source of the export", regex=SOURCE_REGEX)
+):
+    """Returns whether the export is running and the summary of its last completed run."""
+    return export_service.get_status(start_date_str, end_date_str, source)
@@ -0,0 +1,135 @@
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import FileResponse, Response
+from typing import Literal, Optional, Tuple, Union
+import re
+
+from src.config.settings import get_settings
+from src.utils.image_index import ImageEntry, get_image_index
+
+router = APIRouter()
+settings = get_settings()
+image_index = get_image_index()
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+# _parse_range result for a well-formed range that lies outside the image (416)
+_UNSATISFIABLE = object()
+
+@router.get("/besluit/{besluit_id}", summary="List the saved images of a verkeersbesluit")
+async def get_besluit_images(
+    besluit_id: str = Path(..., description="ID of the verkeersbesluit, e.g. gmb-2024-12345")
+):
+    """
+    Returns the image and thumbnail URLs stored for a besluit.
+    Answered from the in-memory image index, without touching the filesystem.
+    """
+    filenames = image_index.images_for_besluit(besluit_id)
+    if not filenames:
+        raise HTTPException(status_code=404, detail=f"No images found for {besluit_id}")
+
+    base_url = f"{settings.api.external_base_url}/afbeeldingen"
+    return {
+        "id": besluit_id,
+        "images": [f"{base_url}/{name}" for name in filenames],
+        "thumbnails": [
+            f"{base_url}/thumbnails/{name}" for name in filenames
+            if image_index.get(name, thumbnail=True) is not None
+        ]
+    }
+
+@router.api_route("/thumbnails/{filename}", methods=["GET", "HEAD"], summary="Get an image thumbnail")
+async def get_thumbnail(request: Request, filename: str = Path(..., description="Image filename")):
+    """Serves the pre-generated thumbnail of an image."""
+    return _serve(request, filename, thumbnail=True)
+
+@router.api_route("/{filename}", methods=["GET", "HEAD"], summary="Get a saved image")
+async def get_image(
+    request: Request,
+    filename: str = Path(..., description="Image filename, e.g. gmb-2024-12345_page_1_bijlage.png"),
+    variant: Literal["original", "thumbnail"] = Query("original", description="Serve the original image or its thumbnail")
+):
+    """
+    Serves a saved besluit image.
+    
+    Filenames are named after the besluit, not the content, and can be saved again with
+    different content (reclassification, scan_all_pages, another image_format). Responses
+    therefore carry a strong ETag (the content hash) and are revalidated by default:
+    conditional requests (If-None-Match) are answered with 304 and single byte ranges
+    (Range / If-Range) with 206.
+    """
+    return _serve(request, filename, thumbnail=(variant == "thumbnail"))
+
+def _serve(request: Request, filename: str, thumbnail: bool) -> Response:
+    entry = image_index.get(filename, thumbnail=thumbnail)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": _cache_control(settings.file.image_cache_max_age),
+        "Accept-Ranges": "bytes"
+    }
+
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == entry.etag):
+        byte_range = _parse_range(range_header, entry.size)
+        if byte_range is _UNSATISFIABLE:
+            headers["Content-Range"] = f"bytes */{entry.size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            return _partial_response(request, entry, byte_range, headers)
+        # Unparsable or unsupported (multipart) ranges are ignored: the full image follows
+
+    return FileResponse(entry.path, media_type=entry.media_type, headers=headers)
+
+def _cache_control(max_age: int) -> str:
+    return f"public, max-age={max_age}" if max_age > 0 else "public, no-cache"
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def _parse_range(range_header: str, size: int) -> Union[Tuple[int, int], object, None]:
+    """
+    Parses a single 'bytes=start-end' range into inclusive offsets.
+
+    Returns:
+        (start, end), _UNSATISFIABLE for a well-formed range outside the image, or None
+        for a header that is unparsable or unsupported (multipart ranges), which RFC 9110
+        says to ignore
+    """
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        return None
+    start_str, end_str = match.groups()
+    if not start_str:
+        # Suffix range: the last N bytes
+        if not end_str:
+            return None
+        if int(end_str) == 0 or size == 0:
+            return _UNSATISFIABLE
+        return max(0, size - int(end_str)), size - 1
+    start = int(start_str)
+    if end_str and int(end_str) < start:
+        return None
+    if start >= size:
+        return _UNSATISFIABLE
+    end = min(int(end_str), size - 1) if end_str else size - 1
+    return start, end
+
+def _partial_response(request: Request, entry: ImageEntry, byte_range: Tuple[int, int], headers: dict) -> Response:
+    start, end = byte_range
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{entry.size}"
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status_code=206, media_type=entry.media_type, headers=headers)
+    with open(entry.path, "rb") as f:
+        f.seek(start)
+        content = f.read(length)
+    return Response(content=content, status_code=206, media_type=entry.media_type, headers=headers)
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+
+from src.utils.metrics import get_metrics
+
+router = APIRouter()
+
+@router.get("/", summary="Get service metrics")
+async def get_service_metrics():
+    """
+    Returns a snapshot of the in-process metrics, such as how many downloads
+    and computations were coalesced with an identical in-flight request.
+    """
+    return get_metrics().snapshot()
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
+
+from src.config.settings import get_settings
+from src.utils.search_index import get_search_index
+from src.utils.spatial_index import get_spatial_index
+
+router = APIRouter()
+settings = get_settings()
+
+DATE_REGEX = r"^\d{4}-\d{2}-\d{2}$"
+
+@router.get("/", summary="Search processed traffic decisions")
+async def search_besluiten(
+    q: Optional[str] = Query(None, description="Full-text query (FTS5 syntax), e.g. 'hoofdweg', 'fiets*', 'parkeren NOT laadpaal'"),
+    authority: Optional[str] = Query(None, description="Match within the authority (OVERHEID.authority)"),
+    creator: Optional[str] = Query(None, description="Match within the creator (DC.creator)"),
+    bordcode: Optional[str] = Query(None, description="Verkeersbordcode prefix, e.g. 'C' or 'C12'"),
+    label: Optional[str] = Query(None, description="Match within gebiedsmarkering labels (e.g. a street name)"),
+    start_date: Optional[str] = Query(None, description="Only decisions on or after this date (YYYY-MM-DD)", regex=DATE_REGEX),
+    end_date: Optional[str] = Query(None, description="Only decisions on or before this date (YYYY-MM-DD)", regex=DATE_REGEX),
+    limit: int = Query(50, ge=1, le=settings.search.max_results, description="Maximum number of results"),
+    offset: int = Query(0, ge=0, description="Number of results to skip"),
+    include_text: bool = Query(False, description="Include the full text of each decision")
+):
+    """
+    Searches the local index of every verkeersbesluit this service has processed
+    (through /besluiten or a backfill), without contacting KOOP.
+    
+    Examples:
+        - `/search?q=hoofdweg`
+        - `/search?bordcode=C&authority=utrecht`
+        - `/search?label=stationsplein&start_date=2024-01-01`
+    """
+    if not settings.search.enabled:
+        raise HTTPException(status_code=404, detail="Search index is disabled")
+    
+    try:
+        return await run_in_threadpool(
+            get_search_index().search,
+            q=q,
+            authority=authority,
+            creator=creator,
+            bordcode=bordcode,
+            label=label,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit,
+            offset=offset,
+            include_text=include_text
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/spatial", summary="Find traffic decisions by location")
+async def search_besluiten_by_location(
+    bbox: Optional[str] = Query(None, description="Bounding box as 'min_x,min_y,max_x,max_y'"),
+    x: Optional[float] = Query(None, description="Longitude (WGS84) or RD x of the centre point"),
+    y: Optional[float] = Query(None, description="Latitude (WGS84) or RD y of the centre point"),
+    radius: Optional[float] = Query(None, gt=0, description="Radius around (x, y) in metres"),
+    limit: int = Query(100, ge=1, le=settings.search.max_results, description="Maximum number of results")
+):
+    """
+    Returns the processed besluiten whose gebiedsmarkering geometries intersect a
+    bounding box, or lie within a radius of a point (nearest first, with distance_m).
+    
+    Coordinates must use the reference system of the geometries in the metadata
+    (WGS84 longitude/latitude or RD New metres).
+    
+    Examples:
+        - `/search/spatial?bbox=4.85,52.35,4.95,52.40`
+        - `/search/spatial?x=5.1214&y=52.0907&radius=500`
+    """
+    if not settings.search.enabled:
+        raise HTTPException(status_code=404, detail="Search index is disabled")
+    
+    spatial_index = get_spatial_index()
+    try:
+        if bbox is not None:
+            try:
+                min_x, min_y, max_x, max_y = (float(value) for value in bbox.split(","))
+            except ValueError:
+                raise ValueError("bbox must be 'min_x,min_y,max_x,max_y'")
+            results = await run_in_threadpool(spatial_index.search_bbox, min_x, min_y, max_x, max_y, limit=limit)
+        elif x is not None and y is not None and radius is not None:
+            results = await run_in_threadpool(spatial_index.search_radius, x, y, radius, limit=limit)
+        else:
+            raise ValueError("Provide either bbox, or x, y and radius")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"total": len(results), "results": results}
@@ -0,0 +1,89 @@
+"""
+Entry point of the API server.
+
+With server.workers = 1 this runs a single uvicorn process, like
+`python -m src.api.main`. With more workers it runs a pre-fork gunicorn server
+with uvicorn workers:
+
+- The CLIP model is loaded once in the master process and the heap is frozen
+  (gc.freeze) before forking, so all workers share the model's memory
+  copy-on-write instead of each loading their own copy.
+- The app itself is imported in each worker after the fork, so SQLite
+  connections and the logging, tracing and pipeline threads belong to the
+  worker that uses them.
+- Rate limiting and attachment outcomes are shared between the workers
+  through SharedState (see src/utils/shared_state.py).
+
+Usage:
+    python -m src.api.server
+    VERKEERSBESLUIT_SERVER__WORKERS=4 python -m src.api.server
+"""
+
+import gc
+import logging
+
+import uvicorn
+
+from src.config.settings import Settings, get_settings
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # Only needed for more than one worker
+    BaseApplication = None
+
+APP = "src.api.main:app"
+
+
+def preload_model() -> None:
+    """Load CLIP in the master process and freeze the heap before the workers are forked."""
+    import torch
+    from src.ml.clip_classifier import load_clip_model
+
+    if torch.cuda.is_available():
+        # CUDA state cannot be shared through fork; every worker initializes its own
+        logging.info("🧠 CUDA available - CLIP is loaded per worker")
+        return
+
+    load_clip_model("cpu")
+    # Objects that exist now are never examined by the cyclic GC in the workers,
+    # which would otherwise touch (and so copy) the pages they live in
+    gc.collect()
+    gc.freeze()
+    logging.info(f"🧠 CLIP loaded before forking - {gc.get_freeze_count()} objects frozen")
+
+
+def run_prefork(settings: Settings) -> None:
+    """Run a gunicorn master with uvicorn workers."""
+    if BaseApplication is None:
+        raise RuntimeError("Running more than one worker requires gunicorn (pip install gunicorn)")
+
+    class PreforkServer(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{settings.api.host}:{settings.api.port}")
+            self.cfg.set("workers", settings.server.workers)
+            self.cfg.set("worker_class", "uvicorn.workers.UvicornWorker")
+            self.cfg.set("timeout", settings.server.worker_timeout)
+            self.cfg.set("graceful_timeout", 30)
+
+        def load(self):
+            # Imported in each worker after the fork
+            from src.api.main import app
+            return app
+
+    if settings.server.preload_model:
+        preload_model()
+    logging.info(f"🚀 Starting {settings.server.workers} workers on {settings.api.host}:{settings.api.port}")
+    PreforkServer().run()
+
+
+def main() -> None:
+    settings = get_settings()
+    logging.basicConfig(level=settings.logging.level, format=settings.logging.format)
+    if settings.server.workers > 1:
+        run_prefork(settings)
+    else:
+        uvicorn.run(APP, host=settings.api.host, port=settings.api.port, reload=False)
+
+
+if __name__ == "__main__":
+    main()
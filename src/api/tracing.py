@@ -0,0 +1,47 @@
+"""
+Request tracing for the API.
+
+Every HTTP request runs inside a trace (continuing an incoming W3C
+`traceparent`). The response carries the trace ID in `X-Trace-Id` and, when
+enabled, a `Server-Timing` header with the time spent per pipeline stage and
+for the slowest besluiten, which browser dev tools show as a timing breakdown.
+"""
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config.settings import Settings
+from src.utils.tracing import Tracer
+
+
+class TracingMiddleware:
+    """Wraps each HTTP request in a trace and reports its timing breakdown."""
+
+    def __init__(self, app: ASGIApp, settings: Settings, tracer: Tracer):
+        self._app = app
+        self._settings = settings
+        self._tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._tracer.enabled:
+            await self._app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1") or None
+        with self._tracer.start_trace(
+            f"{scope['method']} {scope['path']}",
+            traceparent=traceparent,
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as trace:
+
+            async def send_with_timing(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    response_headers = MutableHeaders(scope=message)
+                    response_headers.append("X-Trace-Id", trace.trace_id)
+                    if self._settings.tracing.server_timing:
+                        if server_timing := trace.server_timing(self._settings.tracing.server_timing_besluiten):
+                            response_headers.append("Server-Timing", server_timing)
+                await send(message)
+
+            await self._app(scope, receive, send_with_timing)
@@ -0,0 +1,187 @@
+"""
+A fake KOOP backend for benchmarks and local load tests.
+
+Serves just enough of the SRU endpoint, the content and metadata
+manifestations and the zoek illustraties for the service to run against it
+without touching the real (rate-limited) KOOP servers. Records are generated
+deterministically from the requested date range, so results are repeatable.
+
+Usage:
+    python -m src.benchmarks.fake_koop --port 9911 --records-per-day 3
+
+    VERKEERSBESLUIT_SRU__BASE_URL=http://127.0.0.1:9911/sru \\
+    VERKEERSBESLUIT_SRU__ZOEK_BASE_URL=http://127.0.0.1:9911 \\
+    VERKEERSBESLUIT_RATE_LIMIT__REQUEST_DELAY=0 python -m src.api.server
+"""
+
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Iterator, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+import argparse
+import random
+import re
+import threading
+import time
+
+from PIL import Image
+
+AUTHORITIES = ["Utrecht", "Amsterdam", "Gemeente Zwolle", "Provincie Gelderland"]
+
+_CONTENT_PATH = re.compile(r"^/(c|m)/(gmb-(\d{4}-\d{2}-\d{2})-(\d+))\.xml$")
+_DATE_BOUNDS = re.compile(r"dt\.modified[<>]=(\d{4}-\d{2}-\d{2})")
+
+
+def _png(size: Tuple[int, int], noise: bool) -> bytes:
+    """A PNG of the given size: random noise (large file) or plain white (tiny file)."""
+    if noise:
+        rng = random.Random(0)
+        image = Image.frombytes("RGB", size, bytes(rng.getrandbits(8) for _ in range(size[0] * size[1] * 3)))
+    else:
+        image = Image.new("RGB", size, "white")
+    buffer = BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class FakeKoopServer:
+    """Threaded HTTP server imitating the KOOP endpoints used by the service."""
+
+    def __init__(self, port: int = 9911, records_per_day: int = 3, latency: float = 0.0, host: str = "127.0.0.1",
+                 error_rate: float = 0.0):
+        """
+        Args:
+            port: Port to listen on
+            records_per_day: Verkeersbesluiten generated per day in a date range
+            latency: Seconds added to every response (simulated network latency)
+            error_rate: Share of requests answered with a 503 (simulated backend trouble)
+        """
+        self.records_per_day = records_per_day
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(0)
+        self.base_url = f"http://{host}:{port}"
+        self.map_image = _png((300, 200), noise=True)
+        self.logo_image = _png((32, 32), noise=False)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FakeKoopServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-koop", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def besluit_ids(self, start: date, end: date) -> Iterator[Tuple[str, date]]:
+        day = start
+        while day <= end:
+            for number in range(self.records_per_day):
+                yield f"gmb-{day.isoformat()}-{number}", day
+            day += timedelta(days=1)
+
+    def sru_response(self, query: str, maximum_records: int) -> bytes:
+        start, end = (date.fromisoformat(value) for value in _DATE_BOUNDS.findall(query)[:2])
+        ids = list(self.besluit_ids(start, end))
+        records = "".join(
+            '<sru:record><sru:recordData><gzd:gzd><gzd:enrichedData>'
+            f'<gzd:itemUrl manifestation="xml">{self.base_url}/c/{besluit_id}.xml</gzd:itemUrl>'
+            f'<gzd:itemUrl manifestation="metadata">{self.base_url}/m/{besluit_id}.xml</gzd:itemUrl>'
+            '</gzd:enrichedData></gzd:gzd></sru:recordData></sru:record>'
+            for besluit_id, _ in ids[:maximum_records]
+        )
+        return (
+            '<sru:searchRetrieveResponse xmlns:sru="http://docs.oasis-open.org/ns/search-ws/sruResponse" '
+            'xmlns:gzd="http://standaarden.overheid.nl/sru">'
+            f'<sru:numberOfRecords>{len(ids)}</sru:numberOfRecords><sru:records>{records}</sru:records>'
+            '</sru:searchRetrieveResponse>'
+        ).encode()
+
+    @staticmethod
+    def content(besluit_id: str, number: int) -> bytes:
+        return (
+            f'<besluit><al>Verkeersbesluit {besluit_id}: parkeerverbod Hoofdweg, bord C{number}</al>'
+            f'<illustratie naam="{besluit_id}-kaart.png"/><illustratie naam="{besluit_id}-logo.png"/></besluit>'
+        ).encode()
+
+    @staticmethod
+    def metadata(day: str, number: int) -> bytes:
+        authority = AUTHORITIES[number % len(AUTHORITIES)]
+        return (
+            '<metadata_gegevens>'
+            f'<metadata name="OVERHEID.authority" content="{authority}"/>'
+            f'<metadata name="DC.creator" content="{authority}"/>'
+            f'<metadata name="DCTERMS.modified" content="{day}"/>'
+            f'<metadata name="OVERHEIDop.verkeersbordcode" content="C{number} A1"/>'
+            '<metadata name="OVERHEIDop.gebiedsmarkering" content="Punt">'
+            f'<metadata name="OVERHEIDop.geometrie" content="POINT({5.0 + number * 0.01} {52.0 + number * 0.01})"/>'
+            f'<metadata name="OVERHEIDop.geometrieLabel" content="Hoofdweg {number}"/>'
+            '</metadata>'
+            '<metadata name="OVERHEIDop.gebiedsmarkering" content="Lijn">'
+            '<metadata name="OVERHEIDop.geometrie" content="LINESTRING(5 52, 5.1 52.1)"/>'
+            '</metadata></metadata_gegevens>'
+        ).encode()
+
+    def _handler(self):
+        backend = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                if backend.latency:
+                    time.sleep(backend.latency)
+                if backend.error_rate and backend._random.random() < backend.error_rate:
+                    return self._send(b"service unavailable", "text/plain", 503)
+                url = urlparse(self.path)
+                if url.path == "/sru":
+                    query = parse_qs(url.query)
+                    return self._send(backend.sru_response(query["query"][0], int(query["maximumRecords"][0])))
+                if match := _CONTENT_PATH.match(url.path):
+                    kind, besluit_id, day, number = match.groups()
+                    if kind == "c":
+                        return self._send(backend.content(besluit_id, int(number)))
+                    return self._send(backend.metadata(day, int(number)))
+                if url.path.endswith("-kaart.png"):
+                    return self._send(backend.map_image, "image/png")
+                if url.path.endswith("-logo.png"):
+                    return self._send(backend.logo_image, "image/png")
+                self._send(b"not found", "text/plain", 404)
+
+            def _send(self, body: bytes, content_type: str = "application/xml", status: int = 200):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a fake KOOP backend")
+    parser.add_argument("--port", type=int, default=9911)
+    parser.add_argument("--records-per-day", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    args = parser.parse_args()
+
+    server = FakeKoopServer(args.port, args.records_per_day, args.latency, error_rate=args.error_rate)
+    print(f"Fake KOOP backend on {server.base_url} ({args.records_per_day} records per day)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Load test of the API with concurrent callers, against the fake KOOP backend.
+
+Imitates several n8n workflows calling the API at once: concurrent clients
+send a weighted mix of requests back to back,
+
+- short:    single-day /besluiten ranges
+- long:     multi-day /besluiten ranges (--long-days)
+- filtered: single-day ranges with bordcode and gemeente filters
+- health:   /health checks
+
+while a separate probe checks /health at a fixed interval, to show whether the
+API still answers (e.g. an orchestrator's liveness check) while it is busy.
+Each concurrency level is a phase of --duration seconds. Reported per phase:
+throughput, latency percentiles and error rate overall and per request kind,
+and the /health probe latencies next to an idle baseline.
+
+Results are stored as JSON in `<directories.verkeersbesluiten>/load_tests/`,
+labelled with the git revision, and can be compared with an earlier run
+(--compare last, or a path to a result file).
+
+Usage:
+    python -m src.benchmarks.load_test --concurrency 4 16 --duration 30 --mix short=6 long=1 filtered=2 health=1
+    python -m src.benchmarks.load_test --workers 2 --compare last
+    python -m src.benchmarks.load_test --base-url http://localhost:8001  # An already running API
+"""
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import threading
+import time
+
+import requests
+
+from src.benchmarks.fake_koop import FakeKoopServer
+from src.benchmarks.worker_scaling_benchmark import percentile, start_server, stop_server, wait_until_healthy
+from src.config.settings import get_settings
+
+KINDS = ("short", "long", "filtered", "health")
+DEFAULT_MIX = {"short": 6, "long": 1, "filtered": 2, "health": 1}
+
+# Filters that match part of the fake backend's besluiten
+FILTERS = "bordcode_categories=A&gemeenten=amsterdam"
+
+RESULTS_DIRNAME = "load_tests"
+
+
+class _Recorder:
+    """Latencies of successful requests and error counts per request kind."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, Counter] = {}
+
+    def record(self, kind: str, elapsed: float, error: Optional[str]) -> None:
+        with self._lock:
+            if error is None:
+                self.latencies.setdefault(kind, []).append(elapsed)
+            else:
+                self.errors.setdefault(kind, Counter())[error] += 1
+
+    def summary(self, kind: str, elapsed: float) -> Dict[str, Any]:
+        return summarize(self.latencies.get(kind, []), self.errors.get(kind, Counter()), elapsed)
+
+    def overall(self, elapsed: float) -> Dict[str, Any]:
+        latencies = [value for values in self.latencies.values() for value in values]
+        errors = sum(self.errors.values(), Counter())
+        return summarize(latencies, errors, elapsed)
+
+
+def summarize(latencies: List[float], errors: Counter, elapsed: float) -> Dict[str, Any]:
+    total = len(latencies) + sum(errors.values())
+    return {
+        "requests": total,
+        "errors": dict(errors),
+        "error_rate": round(sum(errors.values()) / total, 4) if total else 0.0,
+        "requests_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 1) if latencies else None
+    }
+
+
+def parse_mix(values: List[str]) -> Dict[str, int]:
+    """`kind=weight` pairs, e.g. ["short=6", "health=1"]."""
+    mix = {}
+    for value in values:
+        kind, _, weight = value.partition("=")
+        if kind not in KINDS or not weight.isdigit():
+            raise ValueError(f"Invalid mix entry '{value}' (expected kind=weight, kinds: {', '.join(KINDS)})")
+        mix[kind] = int(weight)
+    if not any(mix.values()):
+        raise ValueError("The request mix needs at least one kind with a positive weight")
+    return mix
+
+
+def request_path(kind: str, rng: random.Random, ranges: int, long_days: int, start: date = date(2024, 1, 1)) -> str:
+    """A request of the given kind over one of `ranges` distinct start days."""
+    if kind == "health":
+        return "/health/"
+    day = start + timedelta(days=rng.randrange(ranges))
+    if kind == "long":
+        return f"/besluiten/{day}/{day + timedelta(days=long_days - 1)}"
+    if kind == "filtered":
+        return f"/besluiten/{day}/{day}?{FILTERS}"
+    return f"/besluiten/{day}/{day}"
+
+
+def send(session: requests.Session, url: str, timeout: float) -> Optional[str]:
+    """None on success, otherwise the status code or the kind of failure."""
+    try:
+        status = session.get(url, timeout=timeout).status_code
+    except requests.Timeout:
+        return "timeout"
+    except requests.RequestException:
+        return "connection"
+    return None if status == 200 else str(status)
+
+
+def probe_health(base_url: str, interval: float, timeout: float, stop: threading.Event) -> _Recorder:
+    """Checks /health every interval until stopped."""
+    recorder = _Recorder()
+    session = requests.Session()
+    while not stop.is_set():
+        started = time.perf_counter()
+        error = send(session, f"{base_url}/health/", timeout)
+        elapsed = time.perf_counter() - started
+        recorder.record("health", elapsed, error)
+        stop.wait(max(0.0, interval - elapsed))
+    return recorder
+
+
+def run_phase(base_url: str, concurrency: int, duration: float, mix: Dict[str, int], ranges: int,
+              long_days: int, timeout: float, probe_interval: float, seed: int) -> Dict[str, Any]:
+    """Concurrent clients sending the request mix back to back for the duration, with a /health probe."""
+    recorder = _Recorder()
+    kinds = [kind for kind in mix if mix[kind] > 0]
+    weights = [mix[kind] for kind in kinds]
+    deadline = time.monotonic() + duration
+
+    def client(number: int) -> None:
+        rng = random.Random(seed * 1000 + number)  # Repeatable request sequence per client
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            path = request_path(kind, rng, ranges, long_days)
+            started = time.perf_counter()
+            error = send(session, f"{base_url}{path}", timeout)
+            recorder.record(kind, time.perf_counter() - started, error)
+
+    stop_probe = threading.Event()
+    with ThreadPoolExecutor(max_workers=concurrency + 1) as pool:
+        probe = pool.submit(probe_health, base_url, probe_interval, timeout, stop_probe)
+        started = time.perf_counter()
+        list(pool.map(client, range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop_probe.set()
+        health_probe = probe.result()
+
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 1),
+        "overall": recorder.overall(elapsed),
+        "kinds": {kind: recorder.summary(kind, elapsed) for kind in kinds},
+        "health_probe": health_probe.summary("health", elapsed)
+    }
+
+
+def idle_health(base_url: str, samples: int, timeout: float) -> Dict[str, Any]:
+    """/health latency without load, as the baseline for the probe under load."""
+    recorder = _Recorder()
+    session = requests.Session()
+    for _ in range(samples):
+        started = time.perf_counter()
+        error = send(session, f"{base_url}/health/", timeout)
+        recorder.record("health", time.perf_counter() - started, error)
+    return recorder.summary("health", 0.0)
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+
+def results_dir() -> Path:
+    return Path(get_settings().directories.verkeersbesluiten) / RESULTS_DIRNAME
+
+
+def save_result(result: Dict[str, Any]) -> Path:
+    directory = results_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}_{result['revision']}.json"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def load_result(reference: str, exclude: Optional[Path] = None) -> Dict[str, Any]:
+    """A stored result: 'last' for the most recent one (other than `exclude`), else a path."""
+    if reference == "last":
+        candidates = sorted(path for path in results_dir().glob("*.json") if path != exclude)
+        if not candidates:
+            raise FileNotFoundError(f"No earlier load test results in {results_dir()}")
+        path = candidates[-1]
+    else:
+        path = Path(reference)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(previous: Dict[str, Any], current: Dict[str, Any]) -> str:
+    """Side-by-side table of the phases both runs have in common."""
+    columns = ("requests_per_s", "p95_ms", "p99_ms", "error_rate")
+    lines = [f"{previous['revision']} ({previous['started_at']}) -> {current['revision']} ({current['started_at']})"]
+    previous_phases = {phase["concurrency"]: phase for phase in previous["phases"]}
+    for phase in current["phases"]:
+        before = previous_phases.get(phase["concurrency"])
+        if before is None:
+            continue
+        lines.append(f"\nconcurrency {phase['concurrency']}")
+        rows = [("overall", before["overall"], phase["overall"])]
+        rows += [(kind, before["kinds"][kind], stats) for kind, stats in phase["kinds"].items() if kind in before["kinds"]]
+        rows.append(("health probe", before["health_probe"], phase["health_probe"]))
+        for name, old, new in rows:
+            cells = "  ".join(f"{column} {old[column]} -> {new[column]}" for column in columns)
+            lines.append(f"  {name:<13} {cells}")
+    return "\n".join(lines)
+
+
+def run(concurrency: List[int], duration: float, mix: Dict[str, int], ranges: int, long_days: int,
+        workers: int, records_per_day: int, latency: float, error_rate: float, port: int, backend_port: int,
+        timeout: float, probe_interval: float, base_url: Optional[str] = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Runs one phase per concurrency level.
+
+    Without a base URL, the fake KOOP backend and `python -m src.api.server` are
+    started for the run and stopped afterwards.
+    """
+    result = {
+        "revision": git_revision(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "cpu_count": os.cpu_count(),
+        "target": base_url or "local",
+        "workers": None if base_url else workers,
+        "mix": mix,
+        "date_ranges": ranges,
+        "long_days": long_days,
+        "records_per_day": None if base_url else records_per_day,
+        "backend_latency_s": None if base_url else latency,
+        "backend_error_rate": None if base_url else error_rate,
+        "health_idle": None,
+        "phases": []
+    }
+    backend = process = None
+    if base_url is None:
+        backend = FakeKoopServer(backend_port, records_per_day, latency, error_rate=error_rate).start()
+        process = start_server(workers, port, backend)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_healthy(base_url, timeout=120)
+        result["health_idle"] = idle_health(base_url, samples=20, timeout=timeout)
+        for level in concurrency:
+            result["phases"].append(
+                run_phase(base_url, level, duration, mix, ranges, long_days, timeout, probe_interval, seed)
+            )
+    finally:
+        if process is not None:
+            stop_server(process)
+        if backend is not None:
+            backend.stop()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the API with concurrent request mixes")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16], help="Concurrent clients per phase")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per phase")
+    parser.add_argument("--mix", nargs="+", default=None,
+                        help="Request kinds and weights (default: short=6 long=1 filtered=2 health=1)")
+    parser.add_argument("--ranges", type=int, default=32, help="Distinct start days requested")
+    parser.add_argument("--long-days", type=int, default=14, help="Days per long range")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a request counts as timed out")
+    parser.add_argument("--probe-interval", type=float, default=1.0, help="Seconds between /health probes")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the request sequences")
+    parser.add_argument("--base-url", default=None, help="Test an already running API instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the API server under test")
+    parser.add_argument("--records-per-day", type=int, default=3, help="Verkeersbesluiten per day in the fake backend")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds of simulated backend latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of backend requests failing with 503")
+    parser.add_argument("--port", type=int, default=8011, help="Port for the API server under test")
+    parser.add_argument("--backend-port", type=int, default=9911, help="Port for the fake KOOP backend")
+    parser.add_argument("--compare", default=None, help="Compare with a stored result: 'last' or a path")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the result")
+    args = parser.parse_args()
+
+    result = run(
+        args.concurrency, args.duration, parse_mix(args.mix) if args.mix else dict(DEFAULT_MIX), args.ranges,
+        args.long_days, args.workers, args.records_per_day, args.latency, args.error_rate, args.port,
+        args.backend_port, args.timeout, args.probe_interval, base_url=args.base_url, seed=args.seed
+    )
+    print(json.dumps(result, indent=2))
+    saved = None if args.no_save else save_result(result)
+    if saved is not None:
+        print(f"\nStored in {saved}")
+    if args.compare:
+        print()
+        print(compare(load_result(args.compare, exclude=saved), result))
@@ -0,0 +1,114 @@
+"""
+Compares the two response paths of the /besluiten endpoint.
+
+- validated: what FastAPI does for a `List[VerkeersBesluitResponse]` return value;
+  validate every item through the Pydantic models, jsonable_encoder, stdlib json
+- fast: records_to_json on the service records (orjson when installed)
+
+Usage:
+    python -m src.benchmarks.serialization_benchmark --count 5000 --text-size 20000
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+import argparse
+import json
+import random
+import statistics
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from src.api.models.besluiten import VerkeersBesluitResponse
+from src.utils.besluit_record import BesluitMetadata, BesluitRecord, orjson, records_to_json
+
+_WORDS = ["verkeersbesluit", "parkeren", "fietspad", "gemeente", "verbod", "rijbaan", "wegvak", "bord", "zone"]
+
+
+def make_records(count: int, text_size: int, seed: int = 42) -> List[BesluitRecord]:
+    """Synthetic records shaped like real service output."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        words = []
+        length = 0
+        while length < text_size:
+            word = rng.choice(_WORDS)
+            words.append(word)
+            length += len(word) + 1
+        metadata = BesluitMetadata.from_dict({
+            "OVERHEIDop.verkeersbordcode": rng.choice(["C1", "E1", "A1", "F1 G7"]),
+            "OVERHEID.authority": rng.choice(["Amsterdam", "Utrecht", "Rotterdam"]),
+            "DC.creator": rng.choice(["Noord-Holland", "Utrecht", "Zuid-Holland"]),
+            "DCTERMS.modified": "2024-01-02",
+            "OVERHEIDop.externeBijlage": f"exb-2024-{i}",
+            "exb_code": f"exb-2024-{i}",
+            "OVERHEIDop.gebiedsmarkering": [
+                {"type": "Lijn", "geometrie": f"LINESTRING({4 + i % 100 / 100} 52.1, 4.95 52.2)", "label": f"Hoofdweg {i}"}
+            ]
+        })
+        records.append(BesluitRecord(
+            id=f"gmb-2024-{i}",
+            text=" ".join(words),
+            metadata=metadata,
+            images=[f"http://localhost:8001/afbeeldingen/gmb-2024-{i}_page_1_bijlage.png"]
+        ))
+    return records
+
+
+def validated_path(records: List[BesluitRecord]) -> bytes:
+    """Mirrors FastAPI's serialize_response + JSONResponse for the annotated return type."""
+    adapter = TypeAdapter(List[VerkeersBesluitResponse])
+    validated = adapter.validate_python([record.to_dict() for record in records])
+    content = jsonable_encoder(validated, by_alias=True)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(records: List[BesluitRecord]) -> bytes:
+    return records_to_json(records)
+
+
+def measure(fn: Callable[[List[BesluitRecord]], bytes], records: List[BesluitRecord], repeat: int) -> Dict[str, Any]:
+    """Median wall time over `repeat` runs, plus peak traced memory of one run."""
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        size = len(fn(records))
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn(records)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_s": round(statistics.median(timings), 4),
+        "min_s": round(min(timings), 4),
+        "peak_mb": round(peak / 1_000_000, 1),
+        "bytes": size
+    }
+
+
+def run(count: int, text_size: int, repeat: int) -> Dict[str, Any]:
+    records = make_records(count, text_size)
+    results: List[Tuple[str, Dict[str, Any]]] = [
+        ("validated", measure(validated_path, records, repeat)),
+        ("fast", measure(fast_path, records, repeat)),
+    ]
+    summary = dict(results)
+    summary["speedup"] = round(summary["validated"]["median_s"] / max(summary["fast"]["median_s"], 1e-9), 1)
+    summary["encoder"] = "orjson" if orjson is not None else "json"
+    summary["records"] = count
+    summary["text_size"] = text_size
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /besluiten response serialization")
+    parser.add_argument("--count", type=int, default=5000, help="Number of besluiten per response")
+    parser.add_argument("--text-size", type=int, default=20000, help="Characters of plain text per besluit")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per path")
+    args = parser.parse_args()
+    print(json.dumps(run(args.count, args.text_size, args.repeat), indent=2))
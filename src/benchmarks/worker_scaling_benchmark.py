@@ -0,0 +1,171 @@
+"""
+Throughput and latency of the API server per worker count.
+
+Starts the fake KOOP backend, then for each worker count starts
+`python -m src.api.server` against it, warms it up with one request per date
+range and fires concurrent /besluiten requests for a fixed duration. Reports
+requests per second and latency percentiles per worker count.
+
+The numbers depend on the machine: extra workers only add throughput when
+there are CPU cores for them (CLIP, PDF rendering and JSON encoding are
+CPU-bound), so run it on hardware comparable to production.
+
+Usage:
+    python -m src.benchmarks.worker_scaling_benchmark --workers 1 2 4 --concurrency 16 --duration 30
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from src.benchmarks.fake_koop import FakeKoopServer
+
+
+def date_ranges(count: int, start: date = date(2024, 1, 1)) -> List[str]:
+    """Distinct single-day ranges, so requests are not all coalesced into one."""
+    return [f"{day}/{day}" for day in (start + timedelta(days=offset) for offset in range(count))]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def start_server(workers: int, port: int, backend: FakeKoopServer,
+                 extra_env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "VERKEERSBESLUIT_SERVER__WORKERS": str(workers),
+        "VERKEERSBESLUIT_API__PORT": str(port),
+        "VERKEERSBESLUIT_API__HOST": "127.0.0.1",
+        "VERKEERSBESLUIT_SRU__BASE_URL": f"{backend.base_url}/sru",
+        "VERKEERSBESLUIT_SRU__ZOEK_BASE_URL": backend.base_url,
+        "VERKEERSBESLUIT_RATE_LIMIT__REQUEST_DELAY": "0",
+        "VERKEERSBESLUIT_LOGGING__CONSOLE": "false",
+        **(extra_env or {})
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "src.api.server"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True  # So the gunicorn master and its workers are stopped together
+    )
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def wait_until_healthy(base_url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"{base_url}/health/", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not become healthy within {timeout}s")
+
+
+def load(base_url: str, ranges: List[str], concurrency: int, duration: float) -> Dict[str, Any]:
+    """Concurrent clients, each sending requests back to back until the duration is over."""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(number: int) -> None:
+        nonlocal errors
+        session = requests.Session()
+        index = number
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                ok = session.get(f"{base_url}/besluiten/{ranges[index % len(ranges)]}", timeout=120).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+            index += concurrency
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(client, range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None
+    }
+
+
+def run(workers: List[int], concurrency: int, duration: float, ranges: int, records_per_day: int,
+        latency: float, port: int, backend_port: int) -> Dict[str, Any]:
+    backend = FakeKoopServer(backend_port, records_per_day, latency).start()
+    base_url = f"http://127.0.0.1:{port}"
+    paths = date_ranges(ranges)
+    results = {}
+    try:
+        for count in workers:
+            # Every request runs the pipeline: a query cache hit would only measure serialization
+            process = start_server(count, port, backend, {"VERKEERSBESLUIT_QUERY_CACHE__ENABLED": "false"})
+            try:
+                wait_until_healthy(base_url, timeout=120)
+                for path in paths:
+                    requests.get(f"{base_url}/besluiten/{path}", timeout=120)
+                results[str(count)] = load(base_url, paths, concurrency, duration)
+            finally:
+                stop_server(process)
+    finally:
+        backend.stop()
+
+    return {
+        "cpu_count": os.cpu_count(),
+        "concurrency": concurrency,
+        "duration_s": duration,
+        "date_ranges": ranges,
+        "records_per_day": records_per_day,
+        "backend_latency_s": latency,
+        "workers": results
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API throughput per worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds of load per worker count")
+    parser.add_argument("--ranges", type=int, default=32, help="Distinct date ranges requested")
+    parser.add_argument("--records-per-day", type=int, default=3, help="Verkeersbesluiten per day in the fake backend")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds of simulated backend latency")
+    parser.add_argument("--port", type=int, default=8011, help="Port for the API server under test")
+    parser.add_argument("--backend-port", type=int, default=9911, help="Port for the fake KOOP backend")
+    args = parser.parse_args()
+    print(json.dumps(run(args.workers, args.concurrency, args.duration, args.ranges, args.records_per_day,
+                         args.latency, args.port, args.backend_port), indent=2))
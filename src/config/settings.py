@@ -1,6 +1,6 @@
 from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, HttpUrl, validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
@@ -14,6 +14,14 @@ class APISettings(BaseModel):
     external_service_name: str = "koop-api-service"
     # External base URL for browser/external access
     external_base_url_override: str = ""
+    # Serialize /besluiten responses directly (orjson) instead of re-validating them
+    # through the Pydantic response models; can be overridden per request with ?fast=
+    fast_json: bool = False
+    # Response compression (gzip, or brotli when brotli-asgi is installed)
+    compression_enabled: bool = True
+    compression_minimum_size: int = 1000  # Smaller responses are sent uncompressed
+    gzip_level: int = 6
+    brotli_quality: int = 4  # 0-11; low qualities compress JSON well at little CPU cost
 
     @property
     def base_url(self) -> str:
@@ -27,6 +35,19 @@ class APISettings(BaseModel):
             return self.external_base_url_override
         return f"{self.protocol}://{self.external_service_name}:{self.port}"
 
+class ServerSettings(BaseModel):
+    """Process model of the API server (python -m src.api.server)."""
+    workers: int = 1  # More than 1 runs a pre-fork gunicorn server with uvicorn workers
+    preload_model: bool = True  # Load CLIP before forking, so workers share it copy-on-write
+    shared_state: Optional[bool] = None  # Share rate limiting and caches between workers (default: when workers > 1)
+    shared_state_database: str = "shared_state.db"  # Created inside directories.verkeersbesluiten
+    attachment_cache_ttl: int = 86400  # Seconds a PDF attachment's classification outcome is reused
+    worker_timeout: int = 300  # Seconds before a silent worker is restarted (large date ranges take long)
+
+    @property
+    def shared_state_enabled(self) -> bool:
+        return self.workers > 1 if self.shared_state is None else self.shared_state
+
 class DateRangeSettings(BaseModel):
     """Date range configuration for API queries."""
     start: str = "2022-01-01"
@@ -70,28 +91,163 @@ class RateLimitSettings(BaseModel):
     request_timeout: int = 30  # Increased to 30 seconds for slow government APIs
     connect_timeout: int = 10  # Separate connection timeout
     max_retry_delay: float = 10.0  # Maximum delay between retries
+    max_concurrent_requests: int = 2  # Shared budget for requests issued from worker threads
+
+class ResilienceSettings(BaseModel):
+    """Negative cache of permanently failing URLs and per-host circuit breaker."""
+    negative_cache_enabled: bool = True
+    not_found_ttl: int = 6 * 3600  # 404/410, e.g. missing exb attachments
+    client_error_ttl: int = 900  # Other 4xx (except 408/429)
+    redirect_ttl: int = 3600  # Redirect loops and invalid URLs (never resolve with retries)
+    negative_cache_max_entries: int = 10_000
+    circuit_breaker_enabled: bool = True
+    failure_threshold: int = 5  # Consecutive request errors (connection, timeout, ...) or 5xx that open a host's circuit
+    open_seconds: float = 30.0  # Fail fast this long before probing the host again
+    max_open_seconds: float = 300.0  # Open period doubles after every failed probe, up to this
 
 class FileSettings(BaseModel):
     """File handling configuration."""
     min_image_size_bytes: int = 50000
+    max_image_size_bytes: int = 20_000_000
+    classify_embedded_images: bool = False  # Download embedded illustraties and only return maps/aerial photos
+    embedded_image_workers: int = 4  # Concurrent illustratie downloads (still capped by rate_limit)
+    classification_batch_size: int = 8  # Images per CLIP forward pass
     min_pdf_size_bytes: int = 50000
+    max_pdf_size_bytes: int = 50_000_000  # Larger attachments are rejected while streaming
+    download_chunk_size: int = 1024 * 1024  # Bytes read per chunk when streaming to disk
+    temp_dir: str = ""  # Directory for streamed downloads (empty = system default)
     pdf_conversion_dpi: int = 300
+    # Where poppler writes rendered pages before they are memory-mapped (empty = /dev/shm if available, else temp_dir)
+    page_buffer_dir: str = ""
+    # Check every attachment page: all pages are rendered as CLIP-sized thumbnails and classified in
+    # one batch, only matching pages are rendered at pdf_conversion_dpi (otherwise only page 1 is used)
+    scan_all_pages: bool = False
+    scan_dpi: int = 30  # Thumbnail resolution (an A4 page is ~250 px wide, CLIP looks at 224 px)
+    max_scan_pages: int = 40  # Pages scanned per attachment
+    # Output encoding of saved images: png, png-optimized, palette (quantized PNG) or webp (lossless)
+    image_format: str = "png-optimized"
+    palette_colors: int = 256
+    webp_method: int = 4  # 0 (fast) - 6 (smallest)
+    thumbnail_max_size: int = 512  # Longest side in pixels, 0 disables thumbnails
+    image_cache_max_age: int = 0  # Cache-Control max-age for served images (0 = no-cache: always revalidate the ETag)
     supported_extensions: List[str] = [".pdf", ".jpg", ".png", ".jpeg"]
 
+class PrescreenSettings(BaseModel):
+    """Cheap pre-screen of PDF attachments before full-DPI rendering and CLIP."""
+    enabled: bool = False  # Off by default: the heuristic has not been measured against CLIP
+    # Map likelihood band (0-1): below reject_below the attachment is dropped without rendering it;
+    # above accept_above it is saved without CLIP only with accept_without_clip, else CLIP confirms it
+    reject_below: float = 0.1
+    accept_above: float = 0.9
+    accept_without_clip: bool = False
+    render_dpi: int = 20  # Resolution of the render used for the colour histogram
+    full_text_density: float = 15.0  # Text characters per square inch that count as a page of text
+    tool_timeout: int = 10  # Seconds per poppler call
+
+class PipelineSettings(BaseModel):
+    """Worker threads per processing stage, connected by bounded queues."""
+    fetch_workers: int = 4  # Content/metadata downloads (HTTP concurrency is still capped by rate_limit)
+    parse_workers: int = 1  # Filters, text and image reference extraction
+    render_workers: int = 2  # PDF attachment download and poppler rendering
+    classify_workers: int = 1  # CLIP classification and saving
+    queue_size: int = 16  # Besluiten waiting in front of each stage
+    page_queue_size: int = 4  # Rendered pages waiting for CLIP (tens of MB each at 300 dpi)
+    attachment_wait_timeout: int = 600  # Seconds a besluit waits for an attachment processed by another run
+
+class BackfillSettings(BaseModel):
+    """Backfill (sharded bulk download) configuration."""
+    max_concurrent_shards: int = 2
+    initial_shard_days: int = 7  # Week shards, split down to days when too large
+    max_records_per_shard: int = 900  # Should not exceed sru.max_records_per_request
+    checkpoint_dirname: str = "backfills"  # Created inside directories.verkeersbesluiten
+
+class SearchSettings(BaseModel):
+    """Local search index configuration."""
+    enabled: bool = True  # Index every processed besluit for /search
+    database: str = "search.db"  # Created inside directories.verkeersbesluiten
+    max_results: int = 500
+
+class ExportSettings(BaseModel):
+    """Columnar (Parquet/Arrow) export configuration."""
+    dirname: str = "exports"  # Created inside directories.verkeersbesluiten
+    format: str = "parquet"  # parquet or arrow (Arrow IPC file)
+    compression: str = "zstd"  # Parquet codec, or lz4/zstd for Arrow files
+    row_group_size: int = 10_000  # Rows per row group (and rows buffered per partition)
+    include_text: bool = False  # Plain text makes files many times larger
+    index_batch_size: int = 1000  # Rows read from the search index per query
+
+class QueryCacheSettings(BaseModel):
+    """Result cache of /besluiten queries (per server worker)."""
+    enabled: bool = True
+    max_entries: int = 128
+    max_records_per_entry: int = 5000  # Larger results are not cached
+    past_ttl: int = 86400  # Seconds results of ranges that ended before today stay fresh
+    current_ttl: int = 300  # Seconds results of ranges that include today stay fresh
+    stale_ttl: int = 3600  # Seconds after that a stale result is still served while it is refreshed
+
+class WarmerSettings(BaseModel):
+    """Scheduled cache warming of the most recent publication days (inside the API process)."""
+    enabled: bool = False
+    interval: int = 3600  # Seconds between warm passes
+    initial_delay: int = 120  # Seconds after startup before the first pass
+    hours: List[int] = []  # Hours of the day (0-23, local time) in which a pass may start (empty = any hour)
+    lookback_days: int = 2  # Publication days before today that are warmed, most recent first
+    include_today: bool = False  # Also warm today (its results only stay fresh for query_cache.current_ttl)
+    # /besluiten query strings warmed for every day, e.g. "provinces=utrecht" or "fields=metadata&fields=images"
+    queries: List[str] = [""]
+    nice: int = 10  # Niceness added to warm runs (lower CPU priority than requests), 0 = none
+    idle_wait: int = 300  # Seconds a warm run waits for interactive runs to finish before it starts anyway
+
+class TracingSettings(BaseModel):
+    """Span tracing of the processing pipeline."""
+    enabled: bool = True
+    server_timing: bool = True  # Add a Server-Timing header with the time per stage
+    server_timing_besluiten: int = 5  # Slowest besluiten listed in Server-Timing
+    max_spans_per_trace: int = 20000
+    service_name: str = "verkeersbesluiten-api"
+    export_file: str = ""  # Append OTLP/JSON span batches to this file (empty = off)
+    otlp_endpoint: str = ""  # OTLP/HTTP traces endpoint, e.g. http://otel-collector:4318/v1/traces
+
+class ProfilingSettings(BaseModel):
+    """Opt-in CPU and memory profiling of processing runs."""
+    enabled: bool = False  # Profile every run (otherwise only requests with ?profile=true)
+    allow_per_request: bool = True  # Honour ?profile=true on /besluiten
+    dirname: str = "profiles"  # Created inside directories.verkeersbesluiten
+    interval_ms: float = 5.0  # Stack sampling interval
+    tracemalloc_frames: int = 25  # Frames kept per allocation (deeper = better stage attribution, slower)
+    top_allocators: int = 15  # Allocation sites reported per stage
+
 class LoggingSettings(BaseModel):
     """Logging configuration."""
     level: str = "INFO"
     file: str = "download.log"
     format: str = "%(asctime)s - %(levelname)s - %(message)s"
+    file_enabled: bool = True
+    console: bool = True
+    json_format: bool = False  # One JSON object per line, including structured `extra` fields
+    queue_enabled: bool = True  # Write logs from a background thread behind a queue
+    queue_size: int = 10000  # Records beyond this are dropped (and counted) instead of blocking
+    sample_every: int = 10  # Keep 1 in N per-record/per-request INFO messages (1 = keep all)
 
 class Settings(BaseSettings):
     """Main settings class that combines all configuration groups."""
     api: APISettings = APISettings()
+    server: ServerSettings = ServerSettings()
     date_range: DateRangeSettings = DateRangeSettings()
     directories: DirectorySettings
     sru: SRUSettings = SRUSettings()
     rate_limit: RateLimitSettings = RateLimitSettings()
+    resilience: ResilienceSettings = ResilienceSettings()
     file: FileSettings = FileSettings()
+    prescreen: PrescreenSettings = PrescreenSettings()
+    pipeline: PipelineSettings = PipelineSettings()
+    backfill: BackfillSettings = BackfillSettings()
+    search: SearchSettings = SearchSettings()
+    export: ExportSettings = ExportSettings()
+    query_cache: QueryCacheSettings = QueryCacheSettings()
+    warmer: WarmerSettings = WarmerSettings()
+    tracing: TracingSettings = TracingSettings()
+    profiling: ProfilingSettings = ProfilingSettings()
     logging: LoggingSettings = LoggingSettings()
     # TODO: Add more keywords to exclude
     exclude_keywords: List[str] = [
@@ -2,8 +2,11 @@ import torch
 import clip
 from PIL import Image
 from io import BytesIO
+from functools import lru_cache
 import logging
 
+from src.utils.tracing import traced
+
 class ImageClassifier:
     """
     CLIP-based image classifier to determine if an image contains 
@@ -23,7 +26,7 @@ class ImageClassifier:
         self.device = device if device else ("cuda" if torch.cuda.is_available() else "cpu")
         
         try:
-            self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
+            self.model, self.preprocess = load_clip_model(self.device)
             logging.info(f"✅ CLIP model loaded successfully on {self.device}")
         except Exception as e:
             logging.error(f"❌ Failed to load CLIP model: {e}")
@@ -93,6 +96,7 @@ class ImageClassifier:
                 'error': str(e)
             }
     
+    @traced("clip.classify")
     def classify_image(self, pil_image):
         """
         Classify a PIL Image object.
@@ -123,49 +127,88 @@ class ImageClassifier:
                 logits_per_image, _ = self.model(image_tensor, text_inputs)
                 probabilities = logits_per_image.softmax(dim=-1).cpu().numpy()[0]
             
-            # Determine if this is a map/aerial/satellite image
-            # Prompts: 0 = maps, 1 = satellite/aerial, 2 = miscellaneous/other
-            map_confidence = probabilities[0]
-            aerial_confidence = probabilities[1]
-            misc_confidence = probabilities[2]
-            
-            # Consider it a map or aerial image if either maps or aerial confidence is high
-            # and miscellaneous confidence is relatively low
-            is_map_or_aerial = (
-                (map_confidence > self.confidence_threshold or 
-                 aerial_confidence > self.confidence_threshold) and
-                misc_confidence < 0.6  # Not primarily miscellaneous content
-            )
-            
-            # Overall confidence is the max of map and aerial confidence
-            overall_confidence = max(map_confidence, aerial_confidence)
-            
-            result = {
-                'is_map_or_aerial': bool(is_map_or_aerial),  # Convert numpy bool to Python bool
-                'confidence': float(overall_confidence),
-                'probabilities': {
-                    'maps': float(map_confidence),
-                    'aerial_satellite': float(aerial_confidence),
-                    'miscellaneous': float(misc_confidence)
-                },
-                'classification': self._get_classification_label(probabilities)
-            }
-            
+            result = self._result_from_probabilities(probabilities)
             logging.debug(f"🔍 Image classification: {result}")
             return result
             
         except Exception as e:
             logging.error(f"❌ Error during image classification: {e}")
-            return {
-                'is_map_or_aerial': False,
-                'confidence': 0.0,
-                'probabilities': {
-                    'maps': 0.0,
-                    'aerial_satellite': 0.0,
-                    'miscellaneous': 0.0
-                },
-                'error': str(e)
-            }
+            return self._error_result(e)
+    
+    @traced("clip.classify_batch")
+    def classify_images(self, pil_images):
+        """
+        Classify several PIL Image objects in a single forward pass.
+        
+        Args:
+            pil_images: List of PIL Image objects
+            
+        Returns:
+            list: One classification result per image, in the same order
+        """
+        if not pil_images:
+            return []
+        
+        try:
+            image_tensor = torch.stack([
+                self.preprocess(image if image.mode == 'RGB' else image.convert('RGB'))
+                for image in pil_images
+            ]).to(self.device)
+            text_inputs = clip.tokenize(self.classification_prompts).to(self.device)
+            
+            with torch.no_grad():
+                logits_per_image, _ = self.model(image_tensor, text_inputs)
+                probabilities = logits_per_image.softmax(dim=-1).cpu().numpy()
+            
+            return [self._result_from_probabilities(row) for row in probabilities]
+        
+        except Exception as e:
+            logging.error(f"❌ Error during batch image classification: {e}")
+            return [self._error_result(e) for _ in pil_images]
+    
+    def _result_from_probabilities(self, probabilities):
+        """Turn the prompt probabilities of one image into a classification result."""
+        # Determine if this is a map/aerial/satellite image
+        # Prompts: 0 = maps, 1 = satellite/aerial, 2 = miscellaneous/other
+        map_confidence = probabilities[0]
+        aerial_confidence = probabilities[1]
+        misc_confidence = probabilities[2]
+        
+        # Consider it a map or aerial image if either maps or aerial confidence is high
+        # and miscellaneous confidence is relatively low
+        is_map_or_aerial = (
+            (map_confidence > self.confidence_threshold or 
+             aerial_confidence > self.confidence_threshold) and
+            misc_confidence < 0.6  # Not primarily miscellaneous content
+        )
+        
+        # Overall confidence is the max of map and aerial confidence
+        overall_confidence = max(map_confidence, aerial_confidence)
+        
+        return {
+            'is_map_or_aerial': bool(is_map_or_aerial),  # Convert numpy bool to Python bool
+            'confidence': float(overall_confidence),
+            'probabilities': {
+                'maps': float(map_confidence),
+                'aerial_satellite': float(aerial_confidence),
+                'miscellaneous': float(misc_confidence)
+            },
+            'classification': self._get_classification_label(probabilities)
+        }
+    
+    @staticmethod
+    def _error_result(error):
+        """Classification result for an image that could not be classified."""
+        return {
+            'is_map_or_aerial': False,
+            'confidence': 0.0,
+            'probabilities': {
+                'maps': 0.0,
+                'aerial_satellite': 0.0,
+                'miscellaneous': 0.0
+            },
+            'error': str(error)
+        }
     
     def _get_classification_label(self, probabilities):
         """Get the most likely classification label."""
@@ -195,6 +238,16 @@ class ImageClassifier:
         return result.get('is_map_or_aerial', False)
 
 
+@lru_cache()
+def load_clip_model(device):
+    """
+    Load the CLIP model and its preprocessing once per process.
+    A pre-fork server calls this before forking, so the workers share the
+    weights copy-on-write instead of each loading their own copy.
+    """
+    return clip.load("ViT-B/32", device=device)
+
+
 # Global classifier instance (initialized when needed)
 _classifier_instance = None
 
@@ -0,0 +1,167 @@
+"""
+Cheap pre-screen of PDF attachments before rendering and CLIP.
+
+Many attachments are plainly textual (toelichtingen, signature pages) and a
+few are plainly maps or aerial photos. Rendering the first page at full DPI
+and running CLIP on it costs seconds; the signals below cost milliseconds and
+settle the obvious cases:
+
+- text density: characters of the first page's text layer (pdftotext) per
+  square inch. Generated documents full of text have a dense text layer; maps
+  carry a few labels at most.
+- image coverage: share of the page covered by embedded image XObjects
+  (pdfimages -list), e.g. an aerial photo or a scanned map.
+- colour histogram of a low-resolution render: colourfulness (mean HSV
+  saturation) and ink (share of non-white pixels). Text and scanned letters
+  are white with black ink; maps and photos are colourful and dense.
+
+The signals are combined into a map likelihood between 0 and 1. Below the
+reject threshold the attachment is dropped without rendering it. Everything
+else goes through CLIP as before, unless accept_without_clip is set: then an
+attachment above the accept threshold is saved without asking CLIP.
+"""
+
+from typing import Any, Dict, Optional
+from dataclasses import dataclass
+import logging
+import subprocess
+
+from pdf2image import convert_from_path
+from PIL import Image
+
+from src.config.settings import PrescreenSettings
+from src.utils.metrics import get_metrics
+from src.utils.tracing import traced
+
+ACCEPT = "accept"
+REJECT = "reject"
+UNCERTAIN = "uncertain"
+
+# Weights of the map evidence (sum to 1); dense text counts against all of it
+COVERAGE_WEIGHT = 0.35
+COLOUR_WEIGHT = 0.35
+INK_WEIGHT = 0.3
+
+# Saturation (0-1) from which a page counts as fully colourful
+FULL_COLOUR_SATURATION = 0.3
+# Grey level from which a pixel counts as paper
+WHITE_LEVEL = 230
+
+# pdfimages -list columns: page num type width height color comp bpc enc interp object ID x-ppi y-ppi size ratio
+_PDFIMAGES_COLUMNS = 16
+
+
+@dataclass(slots=True)
+class PrescreenResult:
+    """Outcome of the pre-screen of one PDF."""
+    verdict: str  # ACCEPT, REJECT or UNCERTAIN
+    score: Optional[float] = None  # Map likelihood (None when the signals could not be read)
+    text_density: Optional[float] = None  # Text layer characters per square inch
+    image_coverage: Optional[float] = None  # Share of the page covered by image XObjects
+    colourfulness: Optional[float] = None  # Mean saturation of the low-res render (0-1)
+    ink: Optional[float] = None  # Share of non-white pixels of the low-res render
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class PdfPrescreen:
+    """Decides obvious non-maps and obvious maps from cheap signals of the first PDF page."""
+
+    def __init__(self, settings: PrescreenSettings):
+        """
+        Args:
+            settings: Pre-screen settings (thresholds, render DPI, tool timeout)
+        """
+        if not 0 <= settings.reject_below <= settings.accept_above <= 1:
+            raise ValueError("Pre-screen thresholds must satisfy 0 <= reject_below <= accept_above <= 1")
+        self._settings = settings
+
+    @traced("pdf.prescreen")
+    def screen(self, pdf_path: str) -> PrescreenResult:
+        """
+        Pre-screens the first page of a PDF.
+
+        Returns:
+            The verdict and the signals it was based on; UNCERTAIN when a signal
+            could not be read (e.g. a poppler tool is missing or the PDF is damaged)
+        """
+        try:
+            preview = self._render_preview(pdf_path)
+            width_in = preview.width / self._settings.render_dpi
+            height_in = preview.height / self._settings.render_dpi
+            page_area = max(width_in * height_in, 1e-6)
+
+            result = PrescreenResult(
+                verdict=UNCERTAIN,
+                text_density=self._text_characters(pdf_path) / page_area,
+                image_coverage=min(self._image_area(pdf_path) / page_area, 1.0)
+            )
+            result.colourfulness, result.ink = self._histogram_signals(preview)
+        except Exception as e:
+            logging.info("🔎 Pre-screen unavailable for %s: %s", pdf_path, e, extra={"sample": "prescreen.failed"})
+            get_metrics().increment("prescreen.failed")
+            return PrescreenResult(verdict=UNCERTAIN)
+
+        result.score = self.score(result)
+        if result.score <= self._settings.reject_below:
+            result.verdict = REJECT
+        elif result.score >= self._settings.accept_above:
+            result.verdict = ACCEPT
+        get_metrics().increment(f"prescreen.{result.verdict}")
+        if result.verdict == REJECT or (result.verdict == ACCEPT and self._settings.accept_without_clip):
+            get_metrics().increment("prescreen.clip_calls_avoided")
+        return result
+
+    def score(self, result: PrescreenResult) -> float:
+        """Map likelihood (0-1) from the signals of a result."""
+        text = min(result.text_density / self._settings.full_text_density, 1.0)
+        colour = min(result.colourfulness / FULL_COLOUR_SATURATION, 1.0)
+        evidence = COVERAGE_WEIGHT * result.image_coverage + COLOUR_WEIGHT * colour + INK_WEIGHT * result.ink
+        return round(evidence * (1.0 - text), 3)
+
+    def _render_preview(self, pdf_path: str) -> Image.Image:
+        pages = convert_from_path(
+            pdf_path,
+            dpi=self._settings.render_dpi,
+            first_page=1,
+            last_page=1,
+            timeout=self._settings.tool_timeout
+        )
+        if not pages:
+            raise ValueError("no pages")
+        return pages[0]
+
+    def _text_characters(self, pdf_path: str) -> int:
+        """Non-whitespace characters in the text layer of the first page."""
+        output = self._run(["pdftotext", "-f", "1", "-l", "1", "-q", pdf_path, "-"])
+        return sum(1 for character in output if not character.isspace())
+
+    def _image_area(self, pdf_path: str) -> float:
+        """Square inches of the first page covered by image XObjects (at their placed resolution)."""
+        area = 0.0
+        for line in self._run(["pdfimages", "-f", "1", "-l", "1", "-list", pdf_path]).splitlines()[2:]:
+            columns = line.split()
+            if len(columns) != _PDFIMAGES_COLUMNS or columns[2] != "image":
+                continue  # Soft masks and stencils overlap the images they belong to
+            width, height, x_ppi, y_ppi = (int(columns[i]) for i in (3, 4, 12, 13))
+            if x_ppi and y_ppi:
+                area += (width / x_ppi) * (height / y_ppi)
+        return area
+
+    @staticmethod
+    def _histogram_signals(preview: Image.Image):
+        """Mean saturation (0-1) and share of non-white pixels."""
+        rgb = preview.convert("RGB")
+        pixels = rgb.width * rgb.height
+        saturation = rgb.convert("HSV").getchannel("S").histogram()
+        grey = rgb.convert("L").histogram()
+        colourfulness = sum(level * count for level, count in enumerate(saturation)) / (255 * pixels)
+        ink = sum(grey[:WHITE_LEVEL]) / pixels
+        return round(colourfulness, 3), round(ink, 3)
+
+    def _run(self, command) -> str:
+        completed = subprocess.run(
+            command, capture_output=True, timeout=self._settings.tool_timeout, check=True
+        )
+        return completed.stdout.decode("utf-8", errors="ignore")
@@ -0,0 +1,288 @@
+from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import threading
+
+from src.config.settings import Settings, get_settings
+from src.services.besluit_download_service import BesluitService, SruError, get_besluit_service
+from src.utils.logging_setup import configure_logging
+
+
+class BackfillService:
+    """
+    Runs large date-range downloads as a set of independent shards.
+
+    The range is split into week shards which are bisected down to single days
+    when the SRU hit count (numberOfRecords) exceeds the per-shard budget.
+    Shards run concurrently and every finished shard is checkpointed to disk,
+    so an interrupted backfill resumes without redoing completed shards. A
+    shard whose SRU search fails is not checkpointed, so it is retried when
+    the backfill runs again.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        besluit_service: Optional[BesluitService] = None
+    ):
+        """
+        Initialize the backfill service.
+        If not provided, the shared BesluitService instance is used.
+        """
+        self._settings = settings or get_settings()
+        self._besluit_service = besluit_service or get_besluit_service()
+        self._running_jobs: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def run_backfill(self, start_date_str: str, end_date_str: str) -> Dict[str, Any]:
+        """
+        Downloads all verkeersbesluiten in a date range shard by shard.
+
+        Args:
+            start_date_str: Start date in YYYY-MM-DD format
+            end_date_str: End date in YYYY-MM-DD format
+
+        Returns:
+            Summary of the backfill job (see get_status)
+
+        Raises:
+            SruError: If the shards could not be planned
+        """
+        start, end = self._parse_range(start_date_str, end_date_str)
+        job_id = self.job_id(start_date_str, end_date_str)
+        job_dir = self._job_dir(job_id)
+        (job_dir / "shards").mkdir(parents=True, exist_ok=True)
+
+        try:
+            shards = self._load_or_plan_shards(job_dir, start, end)
+        except SruError as e:
+            logging.error(f"❌ Backfill {job_id}: planning failed, nothing was downloaded: {e}")
+            raise
+        pending = [s for s in shards if not self._shard_path(job_dir, s).exists()]
+        logging.info(
+            f"🧱 Backfill {job_id}: {len(shards)} shards, "
+            f"{len(shards) - len(pending)} already completed, {len(pending)} to run"
+        )
+
+        failed: Dict[str, str] = {}
+        with ThreadPoolExecutor(max_workers=max(1, self._settings.backfill.max_concurrent_shards)) as executor:
+            futures = {executor.submit(self._run_shard, job_dir, shard): shard for shard in pending}
+            for future in as_completed(futures):
+                shard = futures[future]
+                try:
+                    count = future.result()
+                    logging.info(f"✅ Backfill {job_id}: shard {self._shard_key(shard)} done ({count} besluiten)")
+                except Exception as e:
+                    failed[self._shard_key(shard)] = str(e)
+                    logging.error(f"❌ Backfill {job_id}: shard {self._shard_key(shard)} failed: {e}")
+
+        self._write_json(job_dir / "failed.json", {"shards": failed})
+        status = self.get_status(start_date_str, end_date_str)
+        logging.info(
+            f"🏁 Backfill {job_id}: {status['shards_completed']}/{status['shards_total']} shards, "
+            f"{status['shards_failed']} failed, {status['records']} besluiten"
+        )
+        return status
+
+    def start_backfill(self, start_date_str: str, end_date_str: str) -> bool:
+        """
+        Starts a backfill in a background thread.
+
+        Returns:
+            True if a new job was started, False if the same job is already running
+        """
+        self._parse_range(start_date_str, end_date_str)
+        job_id = self.job_id(start_date_str, end_date_str)
+        with self._lock:
+            running = self._running_jobs.get(job_id)
+            if running and running.is_alive():
+                return False
+            thread = threading.Thread(
+                target=self.run_backfill,
+                args=(start_date_str, end_date_str),
+                name=f"backfill-{job_id}",
+                daemon=True
+            )
+            self._running_jobs[job_id] = thread
+            thread.start()
+        return True
+
+    def get_status(self, start_date_str: str, end_date_str: str) -> Dict[str, Any]:
+        """
+        Reports the progress of a backfill job from its checkpoints.
+
+        Returns:
+            Dictionary with job id, shard counts (failed shards are those that failed
+            in the last run), number of stored besluiten and whether it is running
+        """
+        job_id = self.job_id(start_date_str, end_date_str)
+        job_dir = self._job_dir(job_id)
+        plan = self._read_plan(job_dir)
+        shards = plan or []
+        failed = self._read_failed(job_dir)
+
+        completed = 0
+        records = 0
+        for shard in shards:
+            shard_path = self._shard_path(job_dir, shard)
+            if shard_path.exists():
+                completed += 1
+                with open(shard_path, encoding="utf-8") as f:
+                    records += json.load(f).get("count", 0)
+
+        with self._lock:
+            thread = self._running_jobs.get(job_id)
+            running = bool(thread and thread.is_alive())
+
+        return {
+            "job_id": job_id,
+            "running": running,
+            "planned": plan is not None,
+            "shards_total": len(shards),
+            "shards_completed": completed,
+            "shards_failed": len(failed),
+            "failed_shards": failed,
+            "records": records,
+            "directory": str(job_dir)
+        }
+
+    def iter_results(self, start_date_str: str, end_date_str: str):
+        """Yields the besluiten stored by the completed shards of a backfill job."""
+        job_dir = self._job_dir(self.job_id(start_date_str, end_date_str))
+        for shard in self._read_plan(job_dir) or []:
+            shard_path = self._shard_path(job_dir, shard)
+            if shard_path.exists():
+                with open(shard_path, encoding="utf-8") as f:
+                    yield from json.load(f).get("besluiten", [])
+
+    @staticmethod
+    def job_id(start_date_str: str, end_date_str: str) -> str:
+        """Backfill jobs are identified by their date range."""
+        return f"{start_date_str}_{end_date_str}"
+
+    def _run_shard(self, job_dir: Path, shard: Dict[str, str]) -> int:
+        """
+        Processes a single shard and writes its checkpoint atomically.
+
+        Raises:
+            SruError: If the SRU search failed (no checkpoint is written)
+        """
+        besluiten = self._besluit_service.get_besluiten_for_date(
+            start_date_str=shard["start"],
+            end_date_str=shard["end"]
+        )
+        self._write_json(self._shard_path(job_dir, shard), {
+            "start": shard["start"],
+            "end": shard["end"],
+            "count": len(besluiten),
+            "completed_at": datetime.now().isoformat(timespec="seconds"),
+            "besluiten": [besluit.to_dict() for besluit in besluiten]
+        })
+        return len(besluiten)
+
+    def _load_or_plan_shards(self, job_dir: Path, start: date, end: date) -> List[Dict[str, str]]:
+        """Reuses a stored shard plan, or plans the shards and stores them."""
+        shards = self._read_plan(job_dir)
+        if shards is not None:
+            return shards
+
+        shards = []
+        window = timedelta(days=max(1, self._settings.backfill.initial_shard_days))
+        window_start = start
+        while window_start <= end:
+            window_end = min(window_start + window - timedelta(days=1), end)
+            shards.extend(self._plan_window(window_start, window_end))
+            window_start = window_end + timedelta(days=1)
+
+        self._write_json(job_dir / "plan.json", {"shards": shards})
+        return shards
+
+    def _plan_window(self, start: date, end: date) -> List[Dict[str, str]]:
+        """
+        Bisects a window until each part fits within the per-shard record budget.
+
+        Raises:
+            SruError: If a count could not be retrieved (no plan is stored, so it is planned again next run)
+        """
+        count = self._besluit_service.count_besluiten(start.isoformat(), end.isoformat())
+        if count is None:
+            raise SruError(f"Failed to count SRU records for {start.isoformat()} to {end.isoformat()}")
+        if count == 0:
+            return []
+
+        max_records = min(
+            self._settings.backfill.max_records_per_shard,
+            self._settings.sru.max_records_per_request
+        )
+        if count <= max_records:
+            return [{"start": start.isoformat(), "end": end.isoformat()}]
+
+        if start == end:
+            logging.warning(
+                f"⚠️ {start.isoformat()} has {count} records, more than the shard budget of {max_records} - "
+                f"records beyond the budget will be missed"
+            )
+            return [{"start": start.isoformat(), "end": end.isoformat()}]
+
+        middle = start + (end - start) // 2
+        return self._plan_window(start, middle) + self._plan_window(middle + timedelta(days=1), end)
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self._settings.directories.verkeersbesluiten / self._settings.backfill.checkpoint_dirname / job_id
+
+    def _read_plan(self, job_dir: Path) -> Optional[List[Dict[str, str]]]:
+        plan_path = job_dir / "plan.json"
+        if not plan_path.exists():
+            return None
+        with open(plan_path, encoding="utf-8") as f:
+            return json.load(f)["shards"]
+
+    def _read_failed(self, job_dir: Path) -> Dict[str, str]:
+        failed_path = job_dir / "failed.json"
+        if not failed_path.exists():
+            return {}
+        with open(failed_path, encoding="utf-8") as f:
+            return json.load(f)["shards"]
+
+    def _shard_path(self, job_dir: Path, shard: Dict[str, str]) -> Path:
+        return job_dir / "shards" / f"{self._shard_key(shard)}.json"
+
+    @staticmethod
+    def _shard_key(shard: Dict[str, str]) -> str:
+        return f"{shard['start']}_{shard['end']}"
+
+    @staticmethod
+    def _write_json(path: Path, data: Dict[str, Any]) -> None:
+        """Writes JSON via a temp file so a crash never leaves a half-written checkpoint."""
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _parse_range(start_date_str: str, end_date_str: str):
+        try:
+            start = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("Date must be in YYYY-MM-DD format (YYYY-MM-DD)")
+        if end < start:
+            raise ValueError("End date must not be before start date")
+        return start, end
+
+
+if __name__ == "__main__":
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Backfill verkeersbesluiten over a large date range")
+    parser.add_argument("start", nargs="?", default=settings.date_range.start, help="Start date (YYYY-MM-DD)")
+    parser.add_argument("end", nargs="?", default=settings.date_range.end, help="End date (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    configure_logging(settings)
+    summary = BackfillService(settings=settings).run_backfill(args.start, args.end)
+    print(json.dumps(summary, indent=2))
@@ -1,17 +1,89 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import contextvars
+from dataclasses import dataclass, field
+from functools import lru_cache
+from io import BytesIO
 import logging
 from datetime import datetime
 import xml.etree.ElementTree as ET
 import os
-from io import BytesIO
-from pdf2image import convert_from_bytes
+import re
+import tempfile
+import threading
+import time
+from PIL import Image
 
 from src.config.settings import Settings, get_settings
 from src.utils.http_client import RateLimitedClient
 from src.utils.xml_parser import XMLParser
+from src.utils.aggregation import aggregate_metadata
+from src.utils.besluit_record import BesluitMetadata, BesluitRecord
+from src.utils.image_index import get_image_index
+from src.utils.image_store import ImageStore
+from src.utils.metrics import get_metrics
+from src.utils.page_buffers import buffer_directory, render_pages
+from src.utils.pipeline import Pipeline, Stage
+from src.utils.profiling import profile_run, run_profiled
+from src.utils.search_index import SearchIndex, get_search_index
+from src.utils.shared_state import get_shared_state
+from src.utils.spatial_index import SpatialIndex, get_spatial_index
+from src.utils.single_flight import SingleFlight
+from src.utils.thread_priority import reset_thread_priority
+from src.utils.tracing import BESLUIT_SPAN, get_tracer, traced
 from src.ml.clip_classifier import ImageClassifier
+from src.ml.pdf_prescreen import ACCEPT, REJECT, PdfPrescreen
 from src.utils.filters import BordcodeCategory, check_bordcode_filter, check_province_filter, check_gemeente_filter, validate_provinces
 
+# Page number in the filename of a saved attachment page
+_PAGE_NUMBER = re.compile(r"_page_(\d+)_bijlage")
+
+# Attachment outcomes kept in process memory without shared state (a short filename each)
+ATTACHMENT_OUTCOMES_MAX_ENTRIES = 50_000
+
+
+class SruError(RuntimeError):
+    """The SRU search failed, so it is unknown which verkeersbesluiten match (not the same as none)."""
+
+
+@dataclass(slots=True)
+class _Run:
+    """Options and shared state of one get_besluiten_for_date run."""
+    bordcode_categories: Optional[List[BordcodeCategory]]
+    provinces: Optional[List[str]]
+    gemeenten: Optional[List[str]]
+    include_text: bool
+    include_images: bool
+    metadata_only: bool
+    classify_embedded_images: bool
+    total: int
+    attachments: Dict[str, Future] = field(default_factory=dict)  # Image URLs per exb_code, reused within the run
+
+
+@dataclass(slots=True)
+class _BesluitWork:
+    """A besluit on its way through the processing pipeline."""
+    run: _Run
+    position: int
+    besluit_id: str
+    urls: Dict[str, str]
+    started_ns: int = 0
+    finished_ns: int = 0
+    content: Optional[str] = None
+    metadata: Optional[BesluitMetadata] = None
+    text: Optional[str] = None
+    embedded_images: List[str] = field(default_factory=list)
+    embedded_image_data: List[Tuple[str, bytes]] = field(default_factory=list)  # Downloaded illustraties to classify
+    exb_code: Optional[str] = None
+    attachment: Optional[Future] = None  # Resolves to the shared image URLs of the PDF attachment ([] if none)
+    owns_attachment: bool = False  # This besluit renders and classifies the attachment
+    page: Optional[Image.Image] = None
+    page_accepted: bool = False  # The pre-screen already identified the page as a map/aerial photo
+    pdf_path: Optional[str] = None  # Downloaded attachment, kept until its matching pages are rendered (scan_all_pages)
+    thumbnails: List[Image.Image] = field(default_factory=list)  # Low-res renders of all pages (scan_all_pages)
+
+
 class BesluitService:
     """
     Service for handling verkeersbesluit operations.
@@ -23,7 +95,10 @@ class BesluitService:
         settings: Optional[Settings] = None,
         http_client: Optional[RateLimitedClient] = None,
         xml_parser: Optional[XMLParser] = None,
-        image_classifier: Optional[ImageClassifier] = None
+        image_classifier: Optional[ImageClassifier] = None,
+        image_store: Optional[ImageStore] = None,
+        search_index: Optional[SearchIndex] = None,
+        spatial_index: Optional[SpatialIndex] = None
     ):
         """
         Initialize the service with its dependencies.
@@ -33,6 +108,37 @@ class BesluitService:
         self._http_client = http_client or RateLimitedClient(settings=self._settings)
         self._xml_parser = xml_parser or XMLParser()
         self._image_classifier = image_classifier or ImageClassifier(settings=self._settings)
+        self._image_store = image_store or ImageStore(settings=self._settings, index=get_image_index())
+        self._prescreen = PdfPrescreen(self._settings.prescreen) if self._settings.prescreen.enabled else None
+        self._search_index = search_index or (get_search_index() if self._settings.search.enabled else None)
+        self._spatial_index = spatial_index or (get_spatial_index() if self._settings.search.enabled else None)
+        
+        # Concurrent callers working on the same besluit share one download; attachments
+        # being processed are shared through futures per exb_code (see _claim_attachment)
+        self._besluit_flight = SingleFlight("besluiten")
+        self._attachment_lock = threading.Lock()
+        self._attachments_in_flight: Dict[str, Future] = {}
+        # Attachment outcomes (saved filename, "" if not relevant) are reused for attachment_cache_ttl:
+        # shared between the workers with several server workers, otherwise kept in this process
+        self._shared_state = get_shared_state()
+        self._attachment_outcomes: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._active_runs = 0
+        self._tracer = get_tracer()
+        
+        # Network, poppler and CLIP work overlap in separate stages instead of taking turns
+        pipeline = self._settings.pipeline
+        self._pipeline = Pipeline("besluiten", [
+            Stage("fetch", self._fetch_stage, pipeline.fetch_workers),
+            Stage("parse", self._parse_stage, pipeline.parse_workers),
+            Stage("render", self._render_stage, pipeline.render_workers),
+            Stage("classify", self._classify_stage, pipeline.classify_workers, queue_size=pipeline.page_queue_size)
+        ], queue_size=pipeline.queue_size)
+        self._image_fetch_pool = ThreadPoolExecutor(
+            max_workers=max(1, self._settings.file.embedded_image_workers),
+            thread_name_prefix="embedded-images",
+            # Workers may be started from a warm run's lower-priority thread
+            initializer=reset_thread_priority
+        )
     
     def get_besluiten_for_date(
         self, 
@@ -40,8 +146,13 @@ class BesluitService:
         end_date_str: str,
         bordcode_categories: Optional[List[BordcodeCategory]] = None,
         provinces: Optional[List[str]] = None,
-        gemeenten: Optional[List[str]] = None
-    ) -> List[Dict[str, Any]]:
+        gemeenten: Optional[List[str]] = None,
+        include_text: bool = True,
+        include_images: bool = True,
+        metadata_only: bool = False,
+        classify_embedded_images: Optional[bool] = None,
+        profile: bool = False
+    ) -> List[BesluitRecord]:
         """
         Fetches and processes verkeersbesluiten for a specific date with optional filtering.
         Filtering is applied BEFORE image processing for efficiency.
@@ -52,44 +163,82 @@ class BesluitService:
             bordcode_categories: Optional bordcode categories filter
             provinces: Optional provinces filter
             gemeenten: Optional municipalities filter
+            include_text: Extract the plain text (text is None otherwise)
+            include_images: Run the image pipeline (images is empty otherwise)
+            metadata_only: Only download the metadata manifestations - no content, text,
+                           keyword check, PDFs or CLIP (implies no text and no images)
+            classify_embedded_images: Download the embedded illustraties and only return
+                                      maps/aerial photos (defaults to file.classify_embedded_images)
+            profile: Profile this run (CPU samples and memory per stage) into the profiles
+                     directory; all runs are profiled when profiling.enabled is set
             
         Returns:
-            List of processed verkeersbesluit data (already filtered)
+            List of processed verkeersbesluit records (already filtered)
+            
+        Raises:
+            ValueError: If a date or province is invalid
+            SruError: If the SRU search failed
         """
-        # Validate date format
-        try:
-            datetime.strptime(start_date_str, "%Y-%m-%d")
-            datetime.strptime(end_date_str, "%Y-%m-%d")
-        except ValueError:
-            raise ValueError("Date must be in YYYY-MM-DD format (YYYY-MM-DD)")
-        
-        # Prepare SRU query
-        query = self._settings.query_template.format(
-            date_start=start_date_str,
-            date_end=end_date_str,
-            exclude_keywords=" ".join(self._settings.exclude_keywords)
-        )
+        self._validate_dates(start_date_str, end_date_str)
+        validate_provinces(provinces)
+        if metadata_only:
+            include_text = include_images = False
+        if classify_embedded_images is None:
+            classify_embedded_images = self._settings.file.classify_embedded_images
         
+        args = (start_date_str, end_date_str, bordcode_categories, provinces, gemeenten,
+                include_text, include_images, metadata_only, classify_embedded_images)
+        with self._attachment_lock:
+            self._active_runs += 1
+        try:
+            if profile or self._settings.profiling.enabled:
+                with profile_run(self._settings, f"besluiten_{start_date_str}_{end_date_str}"):
+                    return self._process_besluiten(*args)
+            return self._process_besluiten(*args)
+        finally:
+            with self._attachment_lock:
+                self._active_runs -= 1
+    
+    @property
+    def active_runs(self) -> int:
+        """Runs of get_besluiten_for_date in progress in this process."""
+        return self._active_runs
+    
+    def _process_besluiten(
+        self,
+        start_date_str: str,
+        end_date_str: str,
+        bordcode_categories: Optional[List[BordcodeCategory]],
+        provinces: Optional[List[str]],
+        gemeenten: Optional[List[str]],
+        include_text: bool,
+        include_images: bool,
+        metadata_only: bool,
+        classify_embedded_images: bool
+    ) -> List[BesluitRecord]:
+        """The body of get_besluiten_for_date, after validation."""
         # Make SRU request
-        params = {
-            "version": self._settings.sru.version,
-            "operation": self._settings.sru.operation,
-            "query": query,
-            "maximumRecords": str(self._settings.sru.max_records_per_request)
-        }
-        
-        response = self._http_client.get(str(self._settings.sru.base_url), params=params)
+        params = self._build_sru_params(start_date_str, end_date_str)
+        with self._tracer.span("sru.search", **{"sru.start": start_date_str, "sru.end": end_date_str}):
+            response = self._http_client.get(str(self._settings.sru.base_url), params=params)
         if not response or not response.ok:
-            logging.warning(f"⚠️ Failed to get SRU data for {start_date_str} to {end_date_str}")
-            return []
+            raise SruError(f"Failed to get SRU data for {start_date_str} to {end_date_str}")
         
         # Parse response and extract records
         records = self._xml_parser.parse_sru_response(response.content)
+        number_of_records = self._xml_parser.parse_number_of_records(response.content)
         if not records:
+            # A real search result always has a hit count, even when nothing matches
+            if number_of_records is None:
+                raise SruError(f"Invalid SRU response for {start_date_str} to {end_date_str}")
             return []
         
-        # Process each record
-        all_besluiten = []
+        if number_of_records is not None and number_of_records > len(records):
+            logging.warning(
+                f"⚠️ SRU reports {number_of_records} records for {start_date_str} to {end_date_str}, "
+                f"only the first {len(records)} are processed - use a backfill for large ranges"
+            )
+        
         total_records = len(records)
         logging.info(f"📄 Processing {total_records} verkeersbesluit records...")
         
@@ -103,162 +252,721 @@ class BesluitService:
         else:
             logging.info("📄 No filters applied - processing all records")
         
+        run = _Run(
+            bordcode_categories=bordcode_categories,
+            provinces=provinces,
+            gemeenten=gemeenten,
+            include_text=include_text,
+            include_images=include_images,
+            metadata_only=metadata_only,
+            classify_embedded_images=classify_embedded_images,
+            total=total_records
+        )
+        finished = self._pipeline.run(self._pipeline_items(run, records))
+        
+        # Combine all data, in SRU order
+        all_besluiten = []
+        for work in sorted(finished, key=lambda work: work.position):
+            image_urls = self._collect_images(work)
+            self._tracer.record(BESLUIT_SPAN, work.started_ns, work.finished_ns, **{"besluit.id": work.besluit_id})
+            all_besluiten.append(BesluitRecord(
+                id=work.besluit_id,
+                text=work.text,
+                metadata=work.metadata,
+                images=image_urls
+            ))
+            
+            # Summary logging for each processed besluit
+            if image_urls:
+                logging.info("✅ %s: Completed processing with %d image(s)", work.besluit_id, len(image_urls),
+                             extra={"sample": "besluit.completed", "besluit_id": work.besluit_id})
+            else:
+                logging.info("📝 %s: Completed processing (no images)", work.besluit_id,
+                             extra={"sample": "besluit.completed", "besluit_id": work.besluit_id})
+        
+        logging.info(f"🏁 Finished processing {len(all_besluiten)}/{total_records} verkeersbesluit records")
+        
+        # Without the image pipeline we don't know the images, so don't overwrite indexed ones
+        # (this also leaves metadata-only runs out of the index)
+        if include_images:
+            self._index_besluiten(all_besluiten)
+        return all_besluiten
+    
+    @traced("index.update")
+    def _index_besluiten(self, besluiten: List[BesluitRecord]) -> None:
+        """Keep the local search and spatial indexes up to date with everything we processed."""
+        for index in (self._search_index, self._spatial_index):
+            if index is None:
+                continue
+            try:
+                index.add_many(besluiten)
+            except Exception as e:
+                logging.warning(f"⚠️ Failed to update {type(index).__name__}: {e}")
+    
+    def _pipeline_items(self, run: _Run, records: List[ET.Element]) -> Iterator[_BesluitWork]:
+        """The SRU records as pipeline items (produced lazily, so backpressure reaches the producer)."""
         for i, record in enumerate(records, 1):
             urls = self._xml_parser.extract_urls_from_record(record)
             if not urls.get("content"):
-                logging.warning(f"⚠️ Record {i}/{total_records}: No content URL found, skipping...")
-                continue
-            
-            # Get and process content
-            content_url = urls["content"]
-            besluit_id = content_url.split("/")[-1].replace(".xml", "")
-            logging.info(f"📖 Processing {i}/{total_records}: {besluit_id}")
-            
-            content_response = self._http_client.get(content_url)
-            if not content_response or not content_response.ok:
-                logging.warning(f"❌ Failed to download content for {besluit_id}")
-                continue
-            
-            content = content_response.content.decode("utf-8", errors="ignore")
-            
-            # Check exclusion keywords
-            excluded_keywords = [k for k in self._settings.exclude_keywords if k in content.lower()]
-            if excluded_keywords:
-                logging.info(f"🚫 {besluit_id}: Excluded (contains: {', '.join(excluded_keywords)})")
+                logging.warning(f"⚠️ Record {i}/{run.total}: No content URL found, skipping...")
                 continue
+            yield _BesluitWork(run=run, position=i, besluit_id=self._besluit_id(urls), urls=urls)
+    
+    def _fetch_stage(self, work: _BesluitWork) -> Optional[_BesluitWork]:
+        """Pipeline stage: download the content and metadata (network)."""
+        work.started_ns = time.time_ns()
+        logging.info("📖 Processing %d/%d: %s", work.position, work.run.total, work.besluit_id,
+                     extra={"sample": "besluit.processing", "besluit_id": work.besluit_id})
+        if work.run.metadata_only:
+            work.metadata = self._fetch_metadata(work.urls.get("metadata"))
+            return work
+        
+        # Shared with concurrent callers processing the same besluit
+        fetched = self._besluit_flight.do(work.besluit_id, self._fetch_besluit, work.urls, work.besluit_id)
+        if fetched is None:
+            return None
+        work.content, work.metadata = fetched
+        return work
+    
+    def _parse_stage(self, work: _BesluitWork) -> Optional[_BesluitWork]:
+        """Pipeline stage: apply the filters, extract text and image references (CPU)."""
+        run = work.run
+        
+        # Apply filters BEFORE expensive image processing
+        if run.bordcode_categories or run.provinces or run.gemeenten:
+            if not self._passes_filters(work.metadata, work.besluit_id, run.bordcode_categories, run.provinces, run.gemeenten):
+                return None
+            logging.info("✅ %s: Passed filters - proceeding with image processing", work.besluit_id,
+                         extra={"sample": "besluit.passed_filters", "besluit_id": work.besluit_id})
+        
+        if run.include_text:
+            work.text = self._xml_parser.extract_plain_text(work.content)
+        if run.include_images:
+            logging.info("🔍 %s: Scanning for images...", work.besluit_id,
+                         extra={"sample": "images.scanning", "besluit_id": work.besluit_id})
+            work.exb_code = self._xml_parser.extract_exb_code(work.metadata)
+            work.embedded_images = self._xml_parser.extract_embedded_images(work.content)
+        
+        # Not needed downstream: don't keep the XML alive while the item waits in queues
+        work.content = None
+        return work
+    
+    def _render_stage(self, work: _BesluitWork) -> _BesluitWork:
+        """
+        Pipeline stage: download the PDF attachment and render its first page, or with
+        scan_all_pages low-res thumbnails of all its pages (network + poppler), and download
+        the embedded illustraties that are to be classified.
+        """
+        if work.run.classify_embedded_images and work.embedded_images:
+            work.embedded_image_data = self._fetch_embedded_images(work.embedded_images)
+        if not work.exb_code:
+            return work
+        
+        logging.info(f"📎 {work.besluit_id}: Found PDF attachment with exb_code: {work.exb_code}")
+        work.attachment, work.owns_attachment = self._claim_attachment(work.run, work.exb_code)
+        if work.owns_attachment and self._settings.file.scan_all_pages:
+            try:
+                work.pdf_path, work.thumbnails = self._scan_pdf_attachment(work.exb_code)
+            finally:
+                if work.pdf_path is None:
+                    self._resolve_attachment(work.exb_code, work.attachment, [], share=False)
+        elif work.owns_attachment:
+            verdict = None
+            try:
+                work.page, verdict = self._render_pdf_attachment(work.exb_code)
+                work.page_accepted = verdict == ACCEPT and self._settings.prescreen.accept_without_clip
+            finally:
+                if work.page is None:
+                    # A pre-screen rejection is final; a failed download may succeed next time,
+                    # so it is not shared with other workers
+                    self._resolve_attachment(work.exb_code, work.attachment, [], share=verdict == REJECT)
+        return work
+    
+    def _classify_stage(self, work: _BesluitWork) -> _BesluitWork:
+        """Pipeline stage: classify the rendered page and illustraties with CLIP, keep the relevant ones."""
+        image_urls, classified = [], False
+        try:
+            if work.page is not None:
+                image_url = self._save_if_relevant(work.page, work.besluit_id, classify=not work.page_accepted)
+                image_urls = [image_url] if image_url else []
+            elif work.pdf_path is not None:
+                image_urls = self._save_relevant_pages(work.pdf_path, work.thumbnails, work.besluit_id)
+            classified = True
+            if work.run.classify_embedded_images and work.embedded_images:
+                work.embedded_images = self._classify_embedded_images(work.besluit_id, work.embedded_image_data)
+                work.embedded_image_data = []
+        finally:
+            work.page = None
+            work.thumbnails = []
+            if work.pdf_path is not None and os.path.exists(work.pdf_path):
+                os.remove(work.pdf_path)
+            work.pdf_path = None
+            # Whatever fails, besluiten sharing the attachment must not wait for it forever
+            if work.owns_attachment and not work.attachment.done():
+                self._resolve_attachment(work.exb_code, work.attachment, image_urls, share=classified)
+        work.finished_ns = time.time_ns()
+        return work
+    
+    @traced("besluit.fetch")
+    def _fetch_besluit(self, urls: Dict[str, str], besluit_id: str) -> Optional[Tuple[str, BesluitMetadata]]:
+        """
+        Downloads the content and metadata of a single besluit.
+        
+        Returns:
+            Tuple of (content XML, parsed metadata), or None if the besluit should be skipped
+        """
+        content_response = self._http_client.get(urls["content"])
+        if not content_response or not content_response.ok:
+            logging.warning(f"❌ Failed to download content for {besluit_id}")
+            return None
+        
+        content = content_response.content.decode("utf-8", errors="ignore")
+        
+        # Check exclusion keywords
+        excluded_keywords = [k for k in self._settings.exclude_keywords if k in content.lower()]
+        if excluded_keywords:
+            logging.info("🚫 %s: Excluded (contains: %s)", besluit_id, ", ".join(excluded_keywords),
+                         extra={"sample": "besluit.excluded_keyword", "besluit_id": besluit_id})
+            return None
+        
+        return content, self._fetch_metadata(urls.get("metadata"))
+    
+    def _fetch_metadata(self, metadata_url: Optional[str]) -> BesluitMetadata:
+        """Downloads and parses a metadata manifestation (empty metadata if unavailable)."""
+        if metadata_url:
+            meta_response = self._http_client.get(metadata_url)
+            if meta_response and meta_response.ok:
+                return BesluitMetadata.from_dict(self._xml_parser.parse_metadata_block(
+                    ET.fromstring(meta_response.content)
+                ))
+        return BesluitMetadata()
+    
+    def aggregate_besluiten(
+        self,
+        start_date_str: str,
+        end_date_str: str,
+        bordcode_categories: Optional[List[BordcodeCategory]] = None,
+        provinces: Optional[List[str]] = None,
+        gemeenten: Optional[List[str]] = None,
+        source: str = "live"
+    ) -> Dict[str, Any]:
+        """
+        Counts verkeersbesluiten by authority, province, bordcode category and day.
+        
+        Args:
+            start_date_str: Start date in YYYY-MM-DD format
+            end_date_str: End date in YYYY-MM-DD format
+            bordcode_categories: Optional bordcode categories filter
+            provinces: Optional provinces filter
+            gemeenten: Optional municipalities filter
+            source: 'live' to query KOOP in metadata-only mode, or 'index' to count the
+                    besluiten already stored in the local search index
             
-            # Get metadata if available
-            metadata = {}
-            if metadata_url := urls.get("metadata"):
-                meta_response = self._http_client.get(metadata_url)
-                if meta_response and meta_response.ok:
-                    metadata = self._xml_parser.parse_metadata_block(
-                        ET.fromstring(meta_response.content)
-                    )
-            
-            # Apply filters BEFORE expensive image processing
-            if bordcode_categories or provinces or gemeenten:
-                # Validate provinces if provided
-                if provinces:
-                    validate_provinces(provinces)
-                
-                # Check each filter - if any fails, skip this besluit
-                if not check_bordcode_filter(metadata, bordcode_categories, besluit_id):
-                    continue
-                    
-                if not check_province_filter(metadata, provinces, besluit_id):
-                    continue
-                    
-                if not check_gemeente_filter(metadata, gemeenten, besluit_id):
-                    continue
-                
-                # If we get here, the besluit passed all filters
-                logging.info(f"✅ {besluit_id}: Passed filters - proceeding with image processing")
+        Returns:
+            Dictionary with the total and the counts per dimension
             
-            # Extract images (only for filtered besluiten)
-            image_urls = []
-            logging.info(f"🔍 {besluit_id}: Scanning for images...")
+        Raises:
+            ValueError: If a date, province or source is invalid
+        """
+        self._validate_dates(start_date_str, end_date_str)
+        validate_provinces(provinces)
+        
+        if source == "live":
+            records = self.get_besluiten_for_date(
+                start_date_str=start_date_str,
+                end_date_str=end_date_str,
+                bordcode_categories=bordcode_categories,
+                provinces=provinces,
+                gemeenten=gemeenten,
+                metadata_only=True
+            )
+            items: Iterable[Tuple[Optional[str], Any]] = (
+                (SearchIndex.publication_date(record.metadata), record.metadata) for record in records
+            )
+        elif source == "index":
+            if self._search_index is None:
+                raise ValueError("The local search index is disabled (VERKEERSBESLUIT_SEARCH__ENABLED)")
+            items = (
+                (day, metadata)
+                for besluit_id, day, metadata in self._search_index.iter_metadata(start_date_str, end_date_str)
+                if self._passes_filters(metadata, besluit_id, bordcode_categories, provinces, gemeenten)
+            )
+        else:
+            raise ValueError(f"Unknown source '{source}' (use 'live' or 'index')")
+        
+        summary = aggregate_metadata(items)
+        summary.update({"source": source, "start_date": start_date_str, "end_date": end_date_str})
+        return summary
+    
+    @staticmethod
+    def _passes_filters(
+        metadata: Any,
+        besluit_id: str,
+        bordcode_categories: Optional[List[BordcodeCategory]],
+        provinces: Optional[List[str]],
+        gemeenten: Optional[List[str]]
+    ) -> bool:
+        """
+        Applies the bordcode, province and municipality filters to one besluit
+        (provinces are validated once per run, before any download).
+        """
+        # Check each filter - if any fails, skip this besluit
+        return (
+            check_bordcode_filter(metadata, bordcode_categories, besluit_id)
+            and check_province_filter(metadata, provinces, besluit_id)
+            and check_gemeente_filter(metadata, gemeenten, besluit_id)
+        )
+    
+    @staticmethod
+    def _besluit_id(urls: Dict[str, str]) -> str:
+        return urls["content"].split("/")[-1].replace(".xml", "")
+    
+    @staticmethod
+    def _validate_dates(start_date_str: str, end_date_str: str) -> None:
+        try:
+            datetime.strptime(start_date_str, "%Y-%m-%d")
+            datetime.strptime(end_date_str, "%Y-%m-%d")
+        except ValueError:
+            raise ValueError("Date must be in YYYY-MM-DD format (YYYY-MM-DD)")
+    
+    def _collect_images(self, work: _BesluitWork) -> List[str]:
+        """
+        Image URLs of a processed besluit: the pages of its PDF attachment that are
+        maps/aerial photos (the first page, or any page with scan_all_pages) and its
+        embedded illustraties.
+        """
+        image_urls = []
+        
+        # Handle PDF attachments
+        if work.attachment is not None:
+            attachment_urls = self._attachment_result(work)
+            if not work.owns_attachment:
+                attachment_urls = [
+                    url for url in (self._link_attachment_image(url, work.besluit_id) for url in attachment_urls) if url
+                ]
+            if attachment_urls:
+                image_urls.extend(attachment_urls)
+                logging.info(f"✅ {work.besluit_id}: PDF contains {len(attachment_urls)} map/aerial photo page(s) - saved locally")
+            else:
+                logging.info(f"⏩ {work.besluit_id}: PDF does not contain map/aerial photo - skipped")
+        
+        # Handle embedded images
+        if work.embedded_images:
+            logging.info("🖼️ %s: Found %d embedded image(s)", work.besluit_id, len(work.embedded_images),
+                         extra={"sample": "images.embedded", "besluit_id": work.besluit_id})
+            for image_name in work.embedded_images:
+                image_urls.append(f"{self._settings.sru.zoek_base_url}/{image_name}")
+                logging.debug("   📷 Added embedded image: %s", image_name)
+        elif work.run.include_images:
+            logging.info("📷 %s: No embedded images found", work.besluit_id,
+                         extra={"sample": "images.embedded", "besluit_id": work.besluit_id})
+        
+        return image_urls
+    
+    def _fetch_embedded_images(self, image_names: List[str]) -> List[Tuple[str, bytes]]:
+        """
+        Downloads embedded illustraties concurrently. Images below min_image_size_bytes
+        (logos, sign icons) are rejected by a HEAD request, before their body is fetched.
+        
+        Returns:
+            (name, image bytes) of the illustraties that were downloaded
+        """
+        file_settings = self._settings.file
+        # Each task runs in a copy of this context, so its spans stay in the request's trace
+        # (and the pool thread is sampled while it works for a profiled run)
+        futures = [
+            self._image_fetch_pool.submit(
+                contextvars.copy_context().run,
+                run_profiled,
+                self._http_client.download_bytes,
+                f"{self._settings.sru.zoek_base_url}/{image_name}",
+                max_bytes=file_settings.max_image_size_bytes,
+                min_bytes=file_settings.min_image_size_bytes,
+                check_head=True
+            )
+            for image_name in image_names
+        ]
+        
+        downloaded = []
+        for image_name, future in zip(image_names, futures):
+            data = future.result()
+            if data is None:
+                get_metrics().increment("embedded_images.rejected_size")
+            else:
+                downloaded.append((image_name, data))
+        return downloaded
+    
+    def _classify_embedded_images(self, besluit_id: str, images: List[Tuple[str, bytes]]) -> List[str]:
+        """
+        Classifies downloaded illustraties with CLIP in batches.
+        
+        Returns:
+            Names of the illustraties that are maps/aerial photos
+        """
+        accepted = []
+        batch_size = max(1, self._settings.file.classification_batch_size)
+        for start in range(0, len(images), batch_size):
+            names, decoded = [], []
+            for image_name, data in images[start:start + batch_size]:
+                try:
+                    image = Image.open(BytesIO(data))
+                    # JPEGs are decoded at reduced scale: CLIP only looks at 224x224
+                    image.draft("RGB", (448, 448))
+                    decoded.append(image)
+                    names.append(image_name)
+                except Exception as e:
+                    get_metrics().increment("embedded_images.failed")
+                    logging.warning(f"⚠️ {besluit_id}: Could not decode embedded image {image_name}: {e}")
             
-            # Handle PDF attachments
-            if exb_code := self._xml_parser.extract_exb_code(metadata):
-                pdf_url = f"{self._settings.sru.repository_base_url}/externebijlagen/{exb_code}/1/bijlage/{exb_code}.pdf"
-                logging.info(f"📎 {besluit_id}: Found PDF attachment with exb_code: {exb_code}")
-                
-                # Download and check if it's a map/aerial photo
-                saved_image_url = self._download_and_save_pdf_attachment(pdf_url, exb_code, besluit_id)
-                if saved_image_url:
-                    image_urls.append(saved_image_url)
-                    logging.info(f"✅ {besluit_id}: PDF contains map/aerial photo - saved locally")
+            for image_name, result in zip(names, self._image_classifier.classify_images(decoded)):
+                if result.get("is_map_or_aerial", False):
+                    get_metrics().increment("embedded_images.accepted")
+                    accepted.append(image_name)
                 else:
-                    logging.info(f"⏩ {besluit_id}: PDF does not contain map/aerial photo - skipped")
-            
-            # Handle embedded images
-            embedded_images = self._xml_parser.extract_embedded_images(content)
-            if embedded_images:
-                logging.info(f"🖼️ {besluit_id}: Found {len(embedded_images)} embedded image(s)")
-                for image_name in embedded_images:
-                    image_url = f"{self._settings.sru.zoek_base_url}/{image_name}"
-                    image_urls.append(image_url)
-                    logging.info(f"   📷 Added embedded image: {image_name}")
-            else:
-                logging.info(f"📷 {besluit_id}: No embedded images found")
+                    get_metrics().increment("embedded_images.rejected_classifier")
+                    logging.info("⏩ %s: Embedded image %s is not a map/aerial photo", besluit_id, image_name,
+                                 extra={"sample": "images.embedded_rejected", "besluit_id": besluit_id})
+        return accepted
+    
+    def _claim_attachment(self, run: _Run, exb_code: str) -> Tuple[Future, bool]:
+        """
+        The future image URLs of an attachment, and whether the caller has to produce them.
+        
+        An attachment is downloaded, rendered and classified only once per exb_code:
+        the outcome is reused within a run and shared with concurrent runs while in flight
+        and with later runs (and, with shared state, the other server workers) for
+        attachment_cache_ttl.
+        """
+        with self._attachment_lock:
+            future = run.attachments.get(exb_code)
+            if future is not None:
+                get_metrics().increment("attachments.reused")
+                return future, False
             
-            # Combine all data
-            besluit_data = {
-                "id": besluit_id,
-                "text": self._xml_parser.extract_plain_text(content),
-                "metadata": metadata,
-                "images": image_urls
-            }
-            all_besluiten.append(besluit_data)
+            cached_filenames = self._cached_attachment(exb_code)
+            if cached_filenames is not None:
+                get_metrics().increment("attachments.shared" if self._shared_state is not None else "attachments.cached")
+                future = Future()
+                future.set_result([
+                    f"{self._settings.api.external_base_url}/afbeeldingen/{filename}"
+                    for filename in cached_filenames.split()
+                ])
+                run.attachments[exb_code] = future
+                return future, False
             
-            # Summary logging for each processed besluit
-            image_count = len(image_urls)
-            if image_count > 0:
-                logging.info(f"✅ {besluit_id}: Completed processing with {image_count} image(s)")
+            future = self._attachments_in_flight.get(exb_code)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._attachments_in_flight[exb_code] = future
             else:
-                logging.info(f"📝 {besluit_id}: Completed processing (no images)")
-        
-        logging.info(f"🏁 Finished processing {len(all_besluiten)}/{total_records} verkeersbesluit records")
-        return all_besluiten
+                get_metrics().increment("attachments.coalesced")
+            run.attachments[exb_code] = future
+            return future, owner
     
-    def _download_and_save_pdf_attachment(self, pdf_url: str, exb_code: str, besluit_id: str) -> str:
+    def _attachment_result(self, work: _BesluitWork) -> List[str]:
+        """The image URLs of a besluit's attachment, waiting at most attachment_wait_timeout for another run."""
+        try:
+            return work.attachment.result(timeout=self._settings.pipeline.attachment_wait_timeout)
+        except FutureTimeoutError:
+            get_metrics().increment("attachments.wait_timeout")
+            logging.warning(f"⚠️ {work.besluit_id}: Gave up waiting for attachment {work.exb_code}")
+            # Let later runs process the attachment again instead of waiting for the same future
+            with self._attachment_lock:
+                if self._attachments_in_flight.get(work.exb_code) is work.attachment:
+                    del self._attachments_in_flight[work.exb_code]
+            return []
+    
+    def _cached_attachment(self, exb_code: str) -> Optional[str]:
+        """
+        The saved filenames of an attachment processed earlier, separated by spaces ("" if none
+        was relevant), or None when it is not cached (hold the lock).
+        """
+        if self._shared_state is not None:
+            return self._shared_state.cache_get("attachments", exb_code)
+        entry = self._attachment_outcomes.get(exb_code)
+        if entry is None:
+            return None
+        expires, filename = entry
+        if expires <= time.monotonic():
+            del self._attachment_outcomes[exb_code]
+            return None
+        return filename
+    
+    def _resolve_attachment(self, exb_code: str, future: Future, image_urls: List[str], share: bool = True) -> None:
+        """Publish the outcome of an attachment to every besluit waiting for it."""
+        future.set_result(image_urls)
+        filenames = " ".join(url.rsplit("/", 1)[-1] for url in image_urls)
+        if share and self._shared_state is None:
+            with self._attachment_lock:
+                self._attachment_outcomes.pop(exb_code, None)
+                self._attachment_outcomes[exb_code] = (
+                    time.monotonic() + self._settings.server.attachment_cache_ttl, filenames
+                )
+                while len(self._attachment_outcomes) > ATTACHMENT_OUTCOMES_MAX_ENTRIES:
+                    self._attachment_outcomes.popitem(last=False)
+        elif share:
+            try:
+                self._shared_state.cache_set(
+                    "attachments", exb_code, filenames, self._settings.server.attachment_cache_ttl
+                )
+            except Exception as e:
+                logging.warning(f"⚠️ Failed to share the outcome of attachment {exb_code}: {e}")
+        with self._attachment_lock:
+            if self._attachments_in_flight.get(exb_code) is future:
+                del self._attachments_in_flight[exb_code]
+    
+    def _link_attachment_image(self, shared_image_url: str, besluit_id: str) -> str:
+        """Make an attachment image saved under another besluit's ID available under this one's."""
+        shared_filename = shared_image_url.rsplit("/", 1)[-1]
+        page = _PAGE_NUMBER.search(shared_filename)
+        try:
+            # Hard link: the image is stored once however many besluiten share it
+            output_filename = self._image_store.link(
+                shared_filename, self._image_stem(besluit_id, int(page.group(1)) if page else 1)
+            )
+        except OSError as e:
+            logging.warning(f"⚠️ Error linking shared attachment image: {e}")
+            return ""
+        return f"{self._settings.api.external_base_url}/afbeeldingen/{output_filename}"
+    
+    @staticmethod
+    def _image_stem(besluit_id: str, page: int = 1) -> str:
+        """Saved images are named after the verkeersbesluit and page, not the PDF's exb_code."""
+        return f"{besluit_id}_page_{page}_bijlage"
+    
+    def count_besluiten(self, start_date_str: str, end_date_str: str) -> Optional[int]:
+        """
+        Asks the SRU endpoint how many verkeersbesluiten match a date range,
+        without downloading the records themselves.
+        
+        Args:
+            start_date_str: Start date in YYYY-MM-DD format
+            end_date_str: End date in YYYY-MM-DD format
+            
+        Returns:
+            Number of matching records, or None if the count could not be retrieved
         """
-        Downloads a PDF attachment and converts its first page to an image.
-        Uses the PDF's exb_code for downloading but saves with the verkeersbesluit's ID.
-        Returns the API URL to access the saved image, or empty string if no image was saved.
+        params = self._build_sru_params(start_date_str, end_date_str, maximum_records=1)
+        response = self._http_client.get(str(self._settings.sru.base_url), params=params)
+        if not response or not response.ok:
+            logging.warning(f"⚠️ Failed to count SRU records for {start_date_str} to {end_date_str}")
+            return None
+        return self._xml_parser.parse_number_of_records(response.content)
+    
+    def _build_sru_params(
+        self,
+        start_date_str: str,
+        end_date_str: str,
+        maximum_records: Optional[int] = None
+    ) -> Dict[str, str]:
+        """Builds the SRU searchRetrieve parameters for a date range."""
+        query = self._settings.query_template.format(
+            date_start=start_date_str,
+            date_end=end_date_str,
+            exclude_keywords=" ".join(self._settings.exclude_keywords)
+        )
+        if maximum_records is None:
+            maximum_records = self._settings.sru.max_records_per_request
+        return {
+            "version": self._settings.sru.version,
+            "operation": self._settings.sru.operation,
+            "query": query,
+            "maximumRecords": str(maximum_records)
+        }
+    
+    def _download_pdf_attachment(self, exb_code: str) -> Tuple[Optional[str], Optional[int]]:
         """
+        Streams a PDF attachment to a temporary file: memory use stays bounded however
+        large the PDF is, and poppler reads it straight from disk. The PDF is rejected
+        early when it falls outside the configured size limits.
         
+        Returns:
+            Tuple of (path of the temporary file, to be removed by the caller, size in bytes),
+            or (None, None) if the download failed
+        """
+        pdf_url = f"{self._settings.sru.repository_base_url}/externebijlagen/{exb_code}/1/bijlage/{exb_code}.pdf"
         logging.info(f"⬇️ Downloading and converting: {pdf_url}")
         
+        file_settings = self._settings.file
+        pdf_file = tempfile.NamedTemporaryFile(suffix=".pdf", dir=file_settings.temp_dir or None, delete=False)
+        pdf_file.close()
+        
+        pdf_size = None
         try:
-            pdf_response = self._http_client.get(pdf_url)
-            if not pdf_response or not pdf_response.ok:
+            with self._tracer.span("pdf.download", **{"exb_code": exb_code}):
+                pdf_size = self._http_client.download_to_file(
+                    pdf_url,
+                    pdf_file.name,
+                    max_bytes=file_settings.max_pdf_size_bytes,
+                    min_bytes=file_settings.min_pdf_size_bytes,
+                    chunk_size=file_settings.download_chunk_size
+                )
+            if pdf_size is None:
                 logging.warning(f"❌ Failed to download PDF from {pdf_url}")
-                return ""
-            
-            if len(pdf_response.content) < self._settings.file.min_pdf_size_bytes:
-                logging.warning(f"❌ PDF too small ({len(pdf_response.content)} bytes)")
-                return ""
+        except Exception as e:
+            logging.warning(f"⚠️ Error downloading PDF: {e}")
+        finally:
+            if pdf_size is None and os.path.exists(pdf_file.name):
+                os.remove(pdf_file.name)
+        return (pdf_file.name, pdf_size) if pdf_size is not None else (None, None)
+    
+    def _render_pdf_attachment(self, exb_code: str) -> Tuple[Optional[Image.Image], Optional[str]]:
+        """
+        Downloads a PDF attachment and renders its first page.
+        When enabled, the pre-screen runs before rendering: obvious non-maps are not
+        rendered at all.
+        
+        Returns:
+            Tuple of (the rendered first page or None if the PDF could not be used or was
+            rejected, the pre-screen verdict or None if it did not run)
+        """
+        pdf_path, pdf_size = self._download_pdf_attachment(exb_code)
+        if pdf_path is None:
+            return None, None
+        
+        file_settings = self._settings.file
+        try:
+            verdict = None
+            if self._prescreen is not None:
+                prescreen = self._prescreen.screen(pdf_path)
+                verdict = prescreen.verdict
+                if verdict == REJECT:
+                    logging.info("⏩ %s: Pre-screen rejected the PDF (map score %s)", exb_code, prescreen.score,
+                                 extra={"sample": "prescreen.rejected"})
+                    return None, verdict
             
-            # Convert PDF bytes directly to images
-            images = convert_from_bytes(pdf_response.content, dpi=self._settings.file.pdf_conversion_dpi)
+            # Only the first page is rendered, through a memory-mapped page buffer
+            with self._tracer.span("pdf.render", dpi=file_settings.pdf_conversion_dpi, size_bytes=pdf_size):
+                images = render_pages(
+                    pdf_path,
+                    dpi=file_settings.pdf_conversion_dpi,
+                    first_page=1,
+                    last_page=1,
+                    directory=buffer_directory(file_settings.page_buffer_dir, file_settings.temp_dir)
+                )
             
             if not images:
                 logging.warning(f"❌ No pages found in PDF for {exb_code}")
-                return ""
+                return None, verdict
+            return images[0], verdict
+                
+        except Exception as e:
+            logging.warning(f"⚠️ Error processing PDF: {e}")
+            return None, None
+        finally:
+            if os.path.exists(pdf_path):
+                os.remove(pdf_path)
+    
+    def _scan_pdf_attachment(self, exb_code: str) -> Tuple[Optional[str], List[Image.Image]]:
+        """
+        Downloads a PDF attachment and renders all its pages (up to max_scan_pages) as
+        low-resolution thumbnails for CLIP. The pre-screen is skipped: it only looks at
+        the first page.
+        
+        Returns:
+            Tuple of (path of the downloaded PDF, kept for rendering the matching pages at
+            full DPI and removed by the caller, the thumbnails in page order), or (None, [])
+            if the PDF could not be used
+        """
+        pdf_path, pdf_size = self._download_pdf_attachment(exb_code)
+        if pdf_path is None:
+            return None, []
+        
+        file_settings = self._settings.file
+        thumbnails = []
+        try:
+            with self._tracer.span("pdf.scan", dpi=file_settings.scan_dpi, size_bytes=pdf_size):
+                thumbnails = render_pages(
+                    pdf_path,
+                    dpi=file_settings.scan_dpi,
+                    first_page=1,
+                    last_page=max(1, file_settings.max_scan_pages),
+                    directory=buffer_directory(file_settings.page_buffer_dir, file_settings.temp_dir)
+                )
+            if not thumbnails:
+                logging.warning(f"❌ No pages found in PDF for {exb_code}")
+        except Exception as e:
+            logging.warning(f"⚠️ Error scanning PDF: {e}")
+        finally:
+            if not thumbnails and os.path.exists(pdf_path):
+                os.remove(pdf_path)
+        return (pdf_path, thumbnails) if thumbnails else (None, [])
+    
+    def _save_relevant_pages(self, pdf_path: str, thumbnails: List[Image.Image], besluit_id: str) -> List[str]:
+        """
+        Classifies the thumbnails of all pages of an attachment in one CLIP batch and renders
+        only the pages that are maps/aerial photos at full DPI, each saved by its page number.
+        
+        Returns:
+            The API URLs of the saved pages
+        """
+        results = self._image_classifier.classify_images(thumbnails)
+        matches = [number for number, result in enumerate(results, start=1) if result.get("is_map_or_aerial")]
+        get_metrics().increment("attachments.pages_scanned", len(thumbnails))
+        get_metrics().increment("attachments.pages_matched", len(matches))
+        if not matches:
+            logging.info(f"⏩ None of the {len(thumbnails)} PDF pages contains a map/aerial photo")
+            return []
+        
+        file_settings = self._settings.file
+        image_urls = []
+        for page_number in matches:
+            try:
+                with self._tracer.span("pdf.render", dpi=file_settings.pdf_conversion_dpi, page=page_number):
+                    pages = render_pages(
+                        pdf_path,
+                        dpi=file_settings.pdf_conversion_dpi,
+                        first_page=page_number,
+                        last_page=page_number,
+                        directory=buffer_directory(file_settings.page_buffer_dir, file_settings.temp_dir)
+                    )
+            except Exception as e:
+                logging.warning(f"⚠️ Error rendering page {page_number} of PDF: {e}")
+                continue
+            if pages:
+                image_url = self._save_if_relevant(pages[0], besluit_id, classify=False, page_number=page_number)
+                if image_url:
+                    image_urls.append(image_url)
+        return image_urls
+    
+    def _save_if_relevant(self, page: Image.Image, besluit_id: str, classify: bool = True, page_number: int = 1) -> str:
+        """
+        Saves a rendered attachment page when CLIP classifies it as a map/aerial photo.
+        Saved with the verkeersbesluit's ID and the page number, not the PDF's exb_code.
+        
+        Args:
+            page: The rendered page
+            besluit_id: ID of the verkeersbesluit
+            classify: Ask CLIP first (False when the pre-screen or page scan already accepted the page)
+            page_number: Page of the attachment (1-based)
+        
+        Returns:
+            The API URL to access the saved image, or empty string if no image was saved
+        """
+        # Check if it's a map/aerial photo using CLIP
+        if classify and not self._image_classifier.should_download_image(page):
+            logging.info(f"⏩ PDF does not contain map/aerial photo")
+            return ""
+        
+        # Save the image locally (encoded per settings, deduplicated by content, with thumbnail)
+        try:
+            with self._tracer.span("image.save"):
+                output_filename = self._image_store.save(page, self._image_stem(besluit_id, page_number))
             
-            # Only process the first page
-            first_page = images[0]
+            # Return the external API-accessible URL (for Docker network access)
+            relative_path = f"afbeeldingen/{output_filename}"
+            image_url = f"{self._settings.api.external_base_url}/{relative_path}"
             
-            # Check if it's a map/aerial photo using CLIP
-            if not self._image_classifier.should_download_image(first_page):
-                logging.info(f"⏩ PDF does not contain map/aerial photo")
-                return ""
+            logging.info(f"✅ Saved page {page_number} (map/aerial photo): {image_url}")
+            return image_url
             
-            # Save the image locally
-            try:
-                # Ensure afbeeldingen directory exists
-                afbeeldingen_dir = self._settings.directories.afbeeldingen
-                os.makedirs(afbeeldingen_dir, exist_ok=True)
-                
-                # Use the verkeersbesluit ID for the filename, not the PDF's exb_code
-                output_filename = f"{besluit_id}_page_1_bijlage.png"
-                output_path = os.path.join(afbeeldingen_dir, output_filename)
-                
-                first_page.save(output_path, "PNG")
-                
-                # Return the external API-accessible URL (for Docker network access)
-                relative_path = f"afbeeldingen/{output_filename}"
-                image_url = f"{self._settings.api.external_base_url}/{relative_path}"
-                
-                logging.info(f"✅ Saved first page (map/aerial photo): {image_url}")
-                return image_url
-                
-            except Exception as e:
-                logging.warning(f"⚠️ Error saving image: {e}")
-                return ""
-                
         except Exception as e:
-            logging.warning(f"⚠️ Error processing PDF: {e}")
-            return ""
\ No newline at end of file
+            logging.warning(f"⚠️ Error saving image: {e}")
+            return ""
+
+
+@lru_cache()
+def get_besluit_service() -> BesluitService:
+    """Get a shared BesluitService instance (loads the CLIP model once per process)."""
+    return BesluitService(settings=get_settings())
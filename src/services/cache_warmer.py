@@ -0,0 +1,227 @@
+from typing import Any, Dict, List, Optional
+from datetime import date, datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+import logging
+import os
+import threading
+import time
+
+from src.config.settings import Settings, get_settings
+from src.services.besluit_download_service import BesluitService, get_besluit_service
+from src.utils.metrics import get_metrics
+from src.utils.query_cache import BesluitenQuery, QueryCache, get_query_cache
+from src.utils.shared_state import SharedState, get_shared_state
+from src.utils.thread_priority import lower_thread_priority
+
+# Lease in the shared state: with several server workers only the holder warms
+LEASE_NAME = "cache_warmer"
+
+
+class CacheWarmer:
+    """
+    Periodically runs the pipeline for the most recent publication days, so
+    interactive queries for those days are cache hits.
+
+    A pass warms every configured query for each day of the lookback window,
+    most recent day first. Each run fills the query result cache, the cache of
+    attachment outcomes (a PDF is not rendered or classified again), the search
+    index and the negative URL cache of the HTTP client.
+
+    Warm runs use the same rate-limited HTTP client as requests, so they stay
+    within the rate budget, and they give way to requests: a run only starts
+    when no other run is in progress (waiting at most `idle_wait` seconds), it
+    runs at a lower CPU priority, and queries whose cached result is still
+    fresh are skipped. Each run gets its own thread, lowered in priority and
+    ended with the run, so the lower priority reaches the pipeline threads of
+    that run but nothing that outlives it (see src/utils/thread_priority.py).
+
+    With several server workers every worker starts a warmer, but only the one
+    holding the "cache_warmer" lease in the shared state runs passes, so KOOP
+    is not warmed once per worker. The lease expires when its holder stops
+    renewing it, and another worker takes over.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        besluit_service: Optional[BesluitService] = None,
+        query_cache: Optional[QueryCache] = None,
+        shared_state: Optional[SharedState] = None
+    ):
+        """
+        Initialize the cache warmer.
+        If not provided, the shared BesluitService, query cache and shared state are used.
+        """
+        self._settings = settings or get_settings()
+        self._besluit_service = besluit_service or get_besluit_service()
+        self._query_cache = query_cache or get_query_cache()
+        self._shared_state = shared_state or get_shared_state()
+        self._owner = str(os.getpid())
+        self._leader = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._running_pass = False
+        self._last_pass: Optional[Dict[str, Any]] = None
+        get_metrics().register_collector("cache_warmer", self.get_status)
+
+    def start(self) -> bool:
+        """
+        Starts the schedule in a background thread.
+
+        Returns:
+            True if it was started, False if it is already running
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+            self._thread.start()
+        warmer = self._settings.warmer
+        logging.info(
+            f"🔥 Cache warmer started: every {warmer.interval}s, {warmer.lookback_days} days back, "
+            f"{len(warmer.queries)} queries per day"
+        )
+        return True
+
+    def stop(self) -> None:
+        """Stops the schedule (a run in progress finishes first) and hands over the lease."""
+        self._stop.set()
+        if self._shared_state is not None and self._leader:
+            try:
+                self._shared_state.release_lease(LEASE_NAME, self._owner)
+            except Exception as e:
+                logging.warning(f"⚠️ Cache warmer: failed to release the lease: {e}")
+
+    def run_pass(self) -> Dict[str, Any]:
+        """
+        Warms every configured query for each day of the lookback window.
+
+        Returns:
+            Summary of the pass (days, queries warmed, skipped and failed, besluiten)
+        """
+        started = time.perf_counter()
+        summary = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "days": self.days(),
+            "warmed": 0,
+            "skipped_fresh": 0,
+            "failed": 0,
+            "besluiten": 0
+        }
+        with self._lock:
+            self._running_pass = True
+        try:
+            for day in summary["days"]:
+                for query in self._queries(day):
+                    # Renewing the lease per query keeps it while a long pass runs
+                    if self._stop.is_set() or not self._acquire_lease():
+                        break
+                    if self._query_cache is not None and not self._query_cache.needs_refresh(query):
+                        summary["skipped_fresh"] += 1
+                        continue
+                    self._wait_until_idle()
+                    try:
+                        summary["besluiten"] += self._warm(query)
+                        summary["warmed"] += 1
+                    except Exception as e:
+                        summary["failed"] += 1
+                        logging.warning(f"⚠️ Cache warmer: {day} failed: {e}")
+        finally:
+            summary["duration_s"] = round(time.perf_counter() - started, 1)
+            with self._lock:
+                self._running_pass = False
+                self._last_pass = summary
+
+        metrics = get_metrics()
+        metrics.increment("warmer.passes")
+        metrics.increment("warmer.queries_warmed", summary["warmed"])
+        metrics.increment("warmer.queries_skipped", summary["skipped_fresh"])
+        metrics.increment("warmer.queries_failed", summary["failed"])
+        logging.info(
+            f"🔥 Cache warmer: {summary['warmed']} queries warmed ({summary['besluiten']} besluiten), "
+            f"{summary['skipped_fresh']} still fresh, {summary['failed']} failed in {summary['duration_s']}s"
+        )
+        return summary
+
+    def days(self, today: Optional[date] = None) -> List[str]:
+        """Days of the lookback window, most recent first."""
+        today = today or date.today()
+        first = 0 if self._settings.warmer.include_today else 1
+        return [
+            (today - timedelta(days=offset)).isoformat()
+            for offset in range(first, self._settings.warmer.lookback_days + 1)
+        ]
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self._thread is not None and self._thread.is_alive(),
+                "running": self._running_pass,
+                "leader": self._leader,
+                "last_pass": self._last_pass
+            }
+
+    def _queries(self, day: str) -> List[BesluitenQuery]:
+        classify_images = self._settings.file.classify_embedded_images
+        return [
+            BesluitenQuery.from_query_string(day, day, query_string, classify_images)
+            for query_string in self._settings.warmer.queries
+        ]
+
+    def _warm(self, query: BesluitenQuery) -> int:
+        load = partial(self._besluit_service.get_besluiten_for_date, **query.service_kwargs())
+        run = partial(self._query_cache.refresh, query, load) if self._query_cache is not None else load
+        with ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="cache-warmer-run",
+            initializer=lower_thread_priority,
+            initargs=(self._settings.warmer.nice,)
+        ) as executor:
+            return len(executor.submit(run).result())
+
+    def _wait_until_idle(self) -> None:
+        """Gives way to runs in progress (requests and background refreshes) for up to idle_wait seconds."""
+        deadline = time.monotonic() + self._settings.warmer.idle_wait
+        while self._besluit_service.active_runs > 0 and time.monotonic() < deadline:
+            if self._stop.wait(1.0):
+                return
+
+    def _acquire_lease(self) -> bool:
+        """Whether this worker may warm (always, without shared state)."""
+        if self._shared_state is None:
+            return True
+        warmer = self._settings.warmer
+        try:
+            leader = self._shared_state.acquire_lease(LEASE_NAME, self._owner, 2 * warmer.interval + warmer.idle_wait)
+        except Exception as e:
+            logging.warning(f"⚠️ Cache warmer: failed to take the lease: {e}")
+            leader = False
+        if leader != self._leader:
+            logging.info(f"🔥 Cache warmer: {'this worker warms' if leader else 'another worker warms'} the caches")
+            self._leader = leader
+        return leader
+
+    def _in_allowed_hours(self) -> bool:
+        hours = self._settings.warmer.hours
+        return not hours or datetime.now().hour in hours
+
+    def _run(self) -> None:
+        if self._stop.wait(self._settings.warmer.initial_delay):
+            return
+        while True:
+            if self._in_allowed_hours() and self._acquire_lease():
+                try:
+                    self.run_pass()
+                except Exception as e:
+                    logging.error(f"❌ Cache warmer pass failed: {e}")
+            if self._stop.wait(self._settings.warmer.interval):
+                return
+
+
+@lru_cache()
+def get_cache_warmer() -> CacheWarmer:
+    """Get the shared CacheWarmer instance."""
+    return CacheWarmer(settings=get_settings())
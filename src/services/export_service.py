@@ -0,0 +1,279 @@
+from typing import Any, Dict, Iterator, Optional, Tuple
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from src.config.settings import Settings, get_settings
+from src.services.besluit_download_service import BesluitService, get_besluit_service
+from src.utils.besluit_record import BesluitRecord
+from src.utils.columnar_export import PartitionedWriter, pa
+from src.utils.logging_setup import configure_logging
+from src.utils.metrics import get_metrics
+from src.utils.search_index import SearchIndex, get_search_index
+
+SOURCES = ("index", "live")
+
+
+class ExportService:
+    """
+    Exports processed besluiten to partitioned Parquet or Arrow files.
+
+    Records are streamed either from the local search index (everything this
+    service has processed, without contacting KOOP) or from the live pipeline,
+    one day at a time. Either way they are written in row groups as they come
+    in, so multi-year exports run in bounded memory. Live exports skip the
+    image pipeline (no attachment downloads, rendering or CLIP), so their
+    images column is empty; export from the index for image URLs.
+
+    An export is written to a temporary directory that replaces the previous
+    export of the same range and source only once it is complete. Its summary is
+    stored as `_summary.json`, which dataset readers skip.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        besluit_service: Optional[BesluitService] = None,
+        search_index: Optional[SearchIndex] = None
+    ):
+        """
+        Initialize the export service.
+        If not provided, the shared BesluitService and search index are used.
+        """
+        self._settings = settings or get_settings()
+        self._besluit_service = besluit_service
+        self._search_index = search_index
+        self._running_jobs: Dict[str, threading.Thread] = {}
+        self._errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def run_export(
+        self,
+        start_date_str: str,
+        end_date_str: str,
+        source: str = "index",
+        include_text: Optional[bool] = None,
+        file_format: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Exports all besluiten in a date range.
+
+        Args:
+            start_date_str: Start date in YYYY-MM-DD format
+            end_date_str: End date in YYYY-MM-DD format
+            source: 'index' (local search index) or 'live' (download through the pipeline)
+            include_text: Add the plain text column (defaults to export.include_text)
+            file_format: 'parquet' or 'arrow' (defaults to export.format)
+
+        Returns:
+            Summary of the export (rows, files, row groups, directory)
+
+        Raises:
+            SruError: If the SRU search of a day failed (live); the previous export is kept
+        """
+        start, end = self._parse_range(start_date_str, end_date_str, source)
+        export = self._settings.export
+        include_text = export.include_text if include_text is None else include_text
+        file_format = file_format or export.format
+        job_id = self.job_id(start_date_str, end_date_str, source)
+        job_dir = self._job_dir(job_id)
+        tmp_dir = job_dir.with_name(job_dir.name + ".tmp")
+        writer = PartitionedWriter(
+            tmp_dir,
+            file_format=file_format,
+            compression=export.compression or None,
+            row_group_size=export.row_group_size,
+            include_text=include_text
+        )
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        logging.info(f"📦 Export {job_id}: writing {file_format} from {source}")
+        started = time.perf_counter()
+        try:
+            records = self._iter_index(start, end, include_text) if source == "index" else \
+                self._iter_live(start, end, include_text)
+            for publication_date, record in records:
+                writer.write(record, publication_date)
+        except Exception:
+            # An incomplete export never replaces the previous one
+            writer.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        writer.close()
+
+        summary = {
+            "job_id": job_id,
+            "source": source,
+            "format": file_format,
+            "include_text": include_text,
+            "rows": writer.rows,
+            "row_groups": writer.row_groups,
+            "files": len(writer.files),
+            "bytes": sum(path.stat().st_size for path in writer.files),
+            "duration_s": round(time.perf_counter() - started, 2),
+            "completed_at": datetime.now().isoformat(timespec="seconds")
+        }
+        with open(tmp_dir / "_summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+        # Swap the finished export in for the previous one
+        if job_dir.exists():
+            old_dir = job_dir.with_name(job_dir.name + ".old")
+            shutil.rmtree(old_dir, ignore_errors=True)
+            os.replace(job_dir, old_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+        os.replace(tmp_dir, job_dir)
+
+        get_metrics().increment("export.rows", writer.rows)
+        get_metrics().increment("export.row_groups", writer.row_groups)
+        logging.info(
+            f"🏁 Export {job_id}: {writer.rows} besluiten in {len(writer.files)} files "
+            f"({summary['bytes'] / 1_000_000:.1f} MB, {summary['duration_s']}s)"
+        )
+        summary["directory"] = str(job_dir)
+        return summary
+
+    def start_export(self, start_date_str: str, end_date_str: str, source: str = "index", **options) -> bool:
+        """
+        Starts an export in a background thread.
+
+        Returns:
+            True if a new job was started, False if the same job is already running
+
+        Raises:
+            ValueError: If the range or source is invalid
+            RuntimeError: If pyarrow is not installed
+        """
+        self._parse_range(start_date_str, end_date_str, source)
+        if pa is None:
+            raise RuntimeError("Columnar export requires pyarrow (pip install pyarrow)")
+        job_id = self.job_id(start_date_str, end_date_str, source)
+        with self._lock:
+            running = self._running_jobs.get(job_id)
+            if running and running.is_alive():
+                return False
+            thread = threading.Thread(
+                target=self._run_logged,
+                args=(start_date_str, end_date_str, source),
+                kwargs=options,
+                name=f"export-{job_id}",
+                daemon=True
+            )
+            self._running_jobs[job_id] = thread
+            thread.start()
+        return True
+
+    def get_status(self, start_date_str: str, end_date_str: str, source: str = "index") -> Dict[str, Any]:
+        """
+        Reports whether an export is running and the summary of its last completed run.
+
+        Returns:
+            Dictionary with job id, running flag, directory, the last summary (or None)
+            and the error of the last run if it failed (or None)
+        """
+        job_id = self.job_id(start_date_str, end_date_str, source)
+        job_dir = self._job_dir(job_id)
+        summary_path = job_dir / "_summary.json"
+        summary = None
+        if summary_path.exists():
+            with open(summary_path, encoding="utf-8") as f:
+                summary = json.load(f)
+
+        with self._lock:
+            thread = self._running_jobs.get(job_id)
+            running = bool(thread and thread.is_alive())
+            error = self._errors.get(job_id)
+
+        return {
+            "job_id": job_id,
+            "running": running,
+            "directory": str(job_dir),
+            "last_export": summary,
+            "last_error": error
+        }
+
+    @staticmethod
+    def job_id(start_date_str: str, end_date_str: str, source: str) -> str:
+        """Exports are identified by their date range and source."""
+        return f"{start_date_str}_{end_date_str}_{source}"
+
+    def _run_logged(self, *args, **kwargs) -> None:
+        job_id = self.job_id(*args[:3])
+        try:
+            self.run_export(*args, **kwargs)
+            error = None
+        except Exception as e:
+            error = str(e)
+            logging.error(f"❌ Export {job_id} failed: {e}")
+        with self._lock:
+            self._errors[job_id] = error
+
+    def _iter_index(self, start: date, end: date, include_text: bool) -> Iterator[Tuple[Optional[str], BesluitRecord]]:
+        """Besluiten from the local search index, in date order."""
+        search_index = self._search_index or get_search_index()
+        yield from search_index.iter_records(
+            start.isoformat(), end.isoformat(),
+            include_text=include_text,
+            batch_size=self._settings.export.index_batch_size
+        )
+
+    def _iter_live(self, start: date, end: date, include_text: bool) -> Iterator[Tuple[Optional[str], BesluitRecord]]:
+        """
+        Besluiten downloaded through the pipeline, one day at a time. The export has
+        no use for the image pipeline, so it does not run.
+
+        Raises:
+            SruError: If the SRU search of a day failed (rather than exporting it as empty)
+        """
+        besluit_service = self._besluit_service or get_besluit_service()
+        day = start
+        while day <= end:
+            besluiten = besluit_service.get_besluiten_for_date(
+                start_date_str=day.isoformat(),
+                end_date_str=day.isoformat(),
+                include_text=include_text,
+                include_images=False
+            )
+            for besluit in sorted(besluiten, key=lambda besluit: besluit.id):
+                yield SearchIndex.publication_date(besluit.metadata) or day.isoformat(), besluit
+            day += timedelta(days=1)
+
+    def _job_dir(self, job_id: str) -> Path:
+        return self._settings.directories.verkeersbesluiten / self._settings.export.dirname / job_id
+
+    def _parse_range(self, start_date_str: str, end_date_str: str, source: str) -> Tuple[date, date]:
+        if source not in SOURCES:
+            raise ValueError(f"Unknown export source '{source}' (expected one of: {', '.join(SOURCES)})")
+        if source == "index" and not self._settings.search.enabled:
+            raise ValueError("Exporting from the index requires the search index (search.enabled)")
+        try:
+            start = datetime.strptime(start_date_str, "%Y-%m-%d").date()
+            end = datetime.strptime(end_date_str, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValueError("Date must be in YYYY-MM-DD format (YYYY-MM-DD)")
+        if end < start:
+            raise ValueError("End date must not be before start date")
+        return start, end
+
+
+if __name__ == "__main__":
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Export processed verkeersbesluiten to partitioned Parquet/Arrow files")
+    parser.add_argument("start", nargs="?", default=settings.date_range.start, help="Start date (YYYY-MM-DD)")
+    parser.add_argument("end", nargs="?", default=settings.date_range.end, help="End date (YYYY-MM-DD)")
+    parser.add_argument("--source", choices=SOURCES, default="index", help="Read from the search index or download live")
+    parser.add_argument("--format", choices=("parquet", "arrow"), default=None, help="File format (defaults to export.format)")
+    parser.add_argument("--include-text", action="store_true", default=None, help="Add the plain text column")
+    args = parser.parse_args()
+
+    configure_logging(settings)
+    summary = ExportService(settings=settings).run_export(
+        args.start, args.end, source=args.source, include_text=args.include_text, file_format=args.format
+    )
+    print(json.dumps(summary, indent=2))
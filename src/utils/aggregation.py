@@ -0,0 +1,56 @@
+"""
+Aggregate counts over verkeersbesluit metadata for dashboards.
+
+Categories follow the same rules as the filters: a besluit counts towards a
+bordcode category when its verkeersbordcode contains the letter, and towards a
+province when the province name occurs in its authority or creator.
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+from collections import Counter
+
+from src.utils.filters import BordcodeCategory, Province
+
+UNKNOWN = "onbekend"
+
+
+def aggregate_metadata(items: Iterable[Tuple[Optional[str], Any]]) -> Dict[str, Any]:
+    """
+    Count besluiten by authority, province, bordcode category and day.
+
+    Args:
+        items: Tuples of (publication day YYYY-MM-DD or None, metadata). Metadata may be
+               a dictionary or a BesluitMetadata.
+
+    Returns:
+        Dictionary with the total and a count per value for each dimension
+    """
+    total = 0
+    by_authority: Counter = Counter()
+    by_province: Counter = Counter()
+    by_bordcode_category: Counter = Counter()
+    by_day: Counter = Counter()
+
+    for day, metadata in items:
+        total += 1
+        authority = metadata.get("OVERHEID.authority") or ""
+        creator = metadata.get("DC.creator") or ""
+        bordcode = (metadata.get("OVERHEIDop.verkeersbordcode") or "").upper()
+
+        by_authority[authority or UNKNOWN] += 1
+        by_day[day or UNKNOWN] += 1
+
+        searchable = f"{authority} {creator}".lower()
+        provinces = [p.value for p in Province if p.value in searchable]
+        by_province.update(provinces or [UNKNOWN])
+
+        categories = [c.value for c in BordcodeCategory if c.value in bordcode]
+        by_bordcode_category.update(categories or [UNKNOWN])
+
+    return {
+        "total": total,
+        "by_authority": dict(by_authority.most_common()),
+        "by_province": dict(by_province.most_common()),
+        "by_bordcode_category": dict(sorted(by_bordcode_category.items())),
+        "by_day": dict(sorted(by_day.items()))
+    }
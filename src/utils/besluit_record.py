@@ -0,0 +1,174 @@
+"""
+Compact internal representation of a processed verkeersbesluit.
+
+Records use slotted dataclasses instead of nested dicts: the metadata fields the
+service works with are typed attributes, metadata keys and low-cardinality
+values (authority, creator, sign codes, ...) are interned, and records can be
+serialized straight to JSON without going through the Pydantic response models.
+The JSON shape is the same as the API response.
+"""
+
+from typing import Any, Collection, Dict, Iterable, List, Optional, Tuple
+from dataclasses import dataclass, field
+import json
+import sys
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder is used as fallback
+    orjson = None
+
+# Metadata keys that map onto typed BesluitMetadata attributes
+BORDCODE_KEY = "OVERHEIDop.verkeersbordcode"
+AUTHORITY_KEY = "OVERHEID.authority"
+CREATOR_KEY = "DC.creator"
+EXTERNE_BIJLAGE_KEY = "OVERHEIDop.externeBijlage"
+GEBIEDSMARKERING_KEY = "OVERHEIDop.gebiedsmarkering"
+
+EXB_CODE_KEY = "exb_code"
+
+# Top-level fields of a record in the API response
+RECORD_FIELDS = ("id", "text", "metadata", "images")
+
+_TYPED_KEYS = {
+    BORDCODE_KEY: "bordcode",
+    AUTHORITY_KEY: "authority",
+    CREATOR_KEY: "creator",
+    EXTERNE_BIJLAGE_KEY: "externe_bijlage",
+}
+
+# Extra metadata whose values repeat across many besluiten and are worth interning
+_INTERNED_VALUE_KEYS = {
+    "DC.type", "DC.language", "DC.publisher", "OVERHEID.category", "OVERHEID.organisationType",
+    "OVERHEIDop.publicationName", "DCTERMS.modified", "DCTERMS.issued", "DCTERMS.available",
+}
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
+
+
+@dataclass(slots=True)
+class GebiedsMarkering:
+    """A geographical area marking of a verkeersbesluit."""
+    type: Optional[str]
+    geometrie: Optional[str] = None
+    label: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {"type": self.type, "geometrie": self.geometrie, "label": self.label}
+
+
+@dataclass(slots=True)
+class BesluitMetadata:
+    """
+    Metadata of a verkeersbesluit with the fields used by filtering typed.
+    All other metadata is kept in `extra` under its original key.
+    """
+    bordcode: Optional[str] = None
+    authority: Optional[str] = None
+    creator: Optional[str] = None
+    externe_bijlage: Optional[str] = None
+    gebiedsmarkering: Tuple[GebiedsMarkering, ...] = ()
+    extra: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, metadata: Dict[str, Any]) -> "BesluitMetadata":
+        """Build from the dictionary produced by XMLParser.parse_metadata_block."""
+        record = cls()
+        for key, value in metadata.items():
+            if attribute := _TYPED_KEYS.get(key):
+                setattr(record, attribute, _intern(value))
+            elif key == GEBIEDSMARKERING_KEY:
+                record.gebiedsmarkering = tuple(
+                    GebiedsMarkering(_intern(g.get("type")), g.get("geometrie"), g.get("label"))
+                    for g in value
+                )
+            else:
+                record.extra[sys.intern(key)] = _intern(value) if key in _INTERNED_VALUE_KEYS else value
+        return record
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style access by original metadata key, so filters work on records and dicts alike."""
+        if attribute := _TYPED_KEYS.get(key):
+            value = getattr(self, attribute)
+            return default if value is None else value
+        if key == GEBIEDSMARKERING_KEY:
+            return [g.to_dict() for g in self.gebiedsmarkering] if self.gebiedsmarkering else default
+        return self.extra.get(key, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Metadata as a dictionary keyed by the original metadata names."""
+        metadata = {}
+        for key, attribute in _TYPED_KEYS.items():
+            value = getattr(self, attribute)
+            if value is not None:
+                metadata[key] = value
+        metadata.update(self.extra)
+        if self.gebiedsmarkering:
+            metadata[GEBIEDSMARKERING_KEY] = [g.to_dict() for g in self.gebiedsmarkering]
+        return metadata
+
+
+@dataclass(slots=True)
+class BesluitRecord:
+    """A processed verkeersbesluit."""
+    id: str
+    text: Optional[str]
+    metadata: BesluitMetadata
+    images: List[str] = field(default_factory=list)
+
+    def to_dict(self, fields: Optional[Collection[str]] = None) -> Dict[str, Any]:
+        """
+        The record in the API response shape.
+
+        Args:
+            fields: Only include these fields (see RECORD_FIELDS); 'id' is always included
+        """
+        besluit: Dict[str, Any] = {"id": self.id}
+        if fields is None or "text" in fields:
+            besluit["text"] = self.text
+        if fields is None or "metadata" in fields:
+            besluit["metadata"] = self.metadata.to_dict()
+        if fields is None or "images" in fields:
+            besluit["images"] = self.images
+        return besluit
+
+    @classmethod
+    def from_dict(cls, besluit: Dict[str, Any]) -> "BesluitRecord":
+        """Rebuild a record from its to_dict() form (e.g. from a stored checkpoint)."""
+        return cls(
+            id=besluit["id"],
+            text=besluit.get("text"),
+            metadata=BesluitMetadata.from_dict(besluit.get("metadata") or {}),
+            images=list(besluit.get("images") or [])
+        )
+
+
+# Metadata keys the response model always emits (null when missing)
+_RESPONSE_METADATA_KEYS = (
+    BORDCODE_KEY, AUTHORITY_KEY, CREATOR_KEY, GEBIEDSMARKERING_KEY, EXTERNE_BIJLAGE_KEY, EXB_CODE_KEY
+)
+
+
+def records_to_json(records: Iterable[BesluitRecord], fields: Optional[Collection[str]] = None) -> bytes:
+    """
+    Serialize records to a UTF-8 JSON array without model validation.
+    The output matches what VerkeersBesluitResponse produces for the same records.
+
+    Args:
+        records: Records to serialize
+        fields: Only include these top-level fields ('id' is always included)
+    """
+    payload = []
+    for record in records:
+        besluit = record.to_dict(fields)
+        if metadata := besluit.get("metadata"):
+            for key in _RESPONSE_METADATA_KEYS:
+                metadata.setdefault(key, None)
+        elif "metadata" in besluit:
+            besluit["metadata"] = dict.fromkeys(_RESPONSE_METADATA_KEYS)
+        payload.append(besluit)
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,183 @@
+"""
+Fail-fast protection for the HTTP client.
+
+- NegativeCache remembers URLs that failed permanently (404/410, other client
+  errors, redirect loops) for a TTL per kind of failure, so dead attachment
+  links are not requested again on every run. With shared state the entries
+  are shared between server workers.
+- CircuitBreaker tracks consecutive failures (connection errors, timeouts and
+  other request errors, 5xx) per host. After `failure_threshold` failures the
+  circuit opens and requests to that host fail immediately instead of waiting
+  for timeouts and backoff. Once the open period is over a single probe
+  request is let through (half-open): success closes the circuit, failure
+  opens it again for twice as long, up to `max_open_seconds`.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import logging
+import threading
+import time
+
+from src.utils.metrics import MetricsRegistry, get_metrics
+from src.utils.shared_state import SharedState
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_NAMESPACE = "negative_urls"
+
+
+class NegativeCache:
+    """TTL cache of URLs that failed permanently."""
+
+    def __init__(self, max_entries: int = 10_000, shared_state: Optional[SharedState] = None):
+        """
+        Args:
+            max_entries: Entries kept in memory (least recently added are dropped first)
+            shared_state: Also store entries here, for the other server workers
+        """
+        self._max_entries = max_entries
+        self._shared_state = shared_state
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        """The reason a URL failed, or None when it is not (or no longer) known to fail."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, reason = entry
+                if expires > time.monotonic():
+                    return reason
+                del self._entries[key]
+        if self._shared_state is not None:
+            return self._shared_state.cache_get(_NAMESPACE, key)
+        return None
+
+    def add(self, key: str, reason: str, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + ttl, reason)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        if self._shared_state is not None:
+            try:
+                self._shared_state.cache_set(_NAMESPACE, key, reason, ttl)
+            except Exception as e:
+                logging.warning(f"⚠️ Failed to share negative cache entry for {key}: {e}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "open_seconds", "probe_started", "times_opened")
+
+    def __init__(self, open_seconds: float):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.open_seconds = open_seconds
+        self.probe_started: Optional[float] = None  # When the current half-open probe was let through
+        self.times_opened = 0
+
+
+class CircuitBreaker:
+    """Per-host circuit breaker."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, open_seconds: float = 30.0,
+                 max_open_seconds: float = 300.0, metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            name: Name under which host states are reported in the metrics snapshot
+            failure_threshold: Consecutive failures that open the circuit of a host
+            open_seconds: How long a circuit stays open before a probe is let through
+            max_open_seconds: Cap of the open period, which doubles after every failed probe
+            metrics: Metrics registry (defaults to the process-wide registry)
+        """
+        self._failure_threshold = max(1, failure_threshold)
+        self._open_seconds = open_seconds
+        self._max_open_seconds = max_open_seconds
+        self._lock = threading.Lock()
+        self._circuits: Dict[str, _Circuit] = {}
+        self._metrics = metrics or get_metrics()
+        self._metrics.register_collector(f"circuit_breaker.{name}", self.stats)
+
+    @staticmethod
+    def host(url: str) -> str:
+        return urlsplit(url).netloc
+
+    def allow(self, host: str) -> bool:
+        """Whether a request to the host may be made now (False while its circuit is open)."""
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None or circuit.state == CLOSED:
+                return True
+            now = time.monotonic()
+            if circuit.state == OPEN and now - circuit.opened_at >= circuit.open_seconds:
+                circuit.state = HALF_OPEN
+                circuit.probe_started = None
+            if circuit.state == HALF_OPEN:
+                # Exactly one probe at a time; everyone else keeps failing fast. A probe whose
+                # outcome was never recorded (its caller failed elsewhere) is replaced after open_seconds
+                expired = circuit.probe_started is not None and now - circuit.probe_started >= circuit.open_seconds
+                if circuit.probe_started is None or expired:
+                    if expired:
+                        self._metrics.increment("circuit_breaker.probe_expired")
+                    circuit.probe_started = now
+                    logging.info(f"🔌 Circuit for {host} half-open: probing")
+                    return True
+        self._metrics.increment("circuit_breaker.short_circuited")
+        return False
+
+    def record_success(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                return
+            if circuit.state != CLOSED:
+                logging.info(f"✅ Circuit for {host} closed again")
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.probe_started = None
+            circuit.open_seconds = self._open_seconds
+
+    def record_failure(self, host: str) -> None:
+        with self._lock:
+            circuit = self._circuits.get(host)
+            if circuit is None:
+                circuit = self._circuits[host] = _Circuit(self._open_seconds)
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN:
+                # Failed probe: back off longer before the next one
+                circuit.open_seconds = min(circuit.open_seconds * 2, self._max_open_seconds)
+            elif circuit.state == OPEN or circuit.failures < self._failure_threshold:
+                return
+            circuit.state = OPEN
+            circuit.opened_at = time.monotonic()
+            circuit.probe_started = None
+            circuit.times_opened += 1
+            open_seconds = circuit.open_seconds
+        self._metrics.increment("circuit_breaker.opened")
+        logging.warning(f"🔌 Circuit for {host} opened: failing fast for {open_seconds:.0f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """State per host that has failed at least once."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                host: {
+                    "state": circuit.state,
+                    "consecutive_failures": circuit.failures,
+                    "times_opened": circuit.times_opened,
+                    "open_seconds_left": round(max(0.0, circuit.opened_at + circuit.open_seconds - now), 1)
+                    if circuit.state == OPEN else 0.0
+                }
+                for host, circuit in self._circuits.items()
+            }
@@ -0,0 +1,183 @@
+"""
+Partitioned columnar files (Parquet or Arrow IPC) of processed besluiten.
+
+Rows are written Hive-style, one directory per publication day and authority:
+
+    date=2024-01-02/authority=Utrecht/part-0.parquet
+
+so analysts can read a whole export with `pyarrow.dataset.dataset(path,
+partitioning="hive")` (or pandas/polars/DuckDB) and prune by day and
+authority without opening the other files. The partition values live in the
+path, not in the files.
+
+Rows are buffered per partition and written as one row group once
+`row_group_size` rows are buffered. Input is expected in date order (the
+search index and the live pipeline both produce it that way): when the date
+changes, the partitions of the previous date are flushed and closed, so memory
+holds at most one day of buffered rows. Out-of-order rows are still written,
+to an extra part file.
+
+pyarrow is optional; the writer raises a RuntimeError when it is missing.
+"""
+
+from typing import Any, Dict, List, Optional
+from pathlib import Path
+from urllib.parse import quote
+
+from src.utils.besluit_record import BesluitRecord
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, only needed for exports
+    pa = None
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Partition value for rows without a date or authority (what pyarrow uses for nulls)
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def export_schema(include_text: bool) -> "pa.Schema":
+    """Columns of an exported file (date and authority are partition keys)."""
+    fields = [
+        pa.field("id", pa.string(), nullable=False),
+        pa.field("creator", pa.string()),
+        pa.field("bordcode", pa.string()),
+        pa.field("externe_bijlage", pa.string()),
+        pa.field("gebiedsmarkering", pa.list_(pa.struct([
+            pa.field("type", pa.string()),
+            pa.field("geometrie", pa.string()),
+            pa.field("label", pa.string()),
+        ]))),
+        pa.field("images", pa.list_(pa.string())),
+        pa.field("metadata", pa.map_(pa.string(), pa.string())),  # All other metadata fields
+    ]
+    if include_text:
+        fields.append(pa.field("text", pa.string()))
+    return pa.schema(fields)
+
+
+class _Partition:
+    __slots__ = ("columns", "rows", "writer", "sink", "part")
+
+    def __init__(self, names: List[str], part: int):
+        self.columns: Dict[str, List[Any]] = {name: [] for name in names}
+        self.rows = 0
+        self.writer = None
+        self.sink = None
+        self.part = part
+
+
+class PartitionedWriter:
+    """Streams besluit records into date/authority partitioned Parquet or Arrow files."""
+
+    def __init__(self, directory: Path, file_format: str = "parquet", compression: Optional[str] = "zstd",
+                 row_group_size: int = 10_000, include_text: bool = False):
+        """
+        Args:
+            directory: Output directory (partition directories are created inside it)
+            file_format: 'parquet' or 'arrow'
+            compression: Codec name, or None for uncompressed files
+            row_group_size: Rows per row group (Parquet) or record batch (Arrow)
+            include_text: Add a column with the plain text of each besluit
+
+        Raises:
+            RuntimeError: If pyarrow is not installed
+            ValueError: If the format is not supported
+        """
+        if pa is None:
+            raise RuntimeError("Columnar export requires pyarrow (pip install pyarrow)")
+        if file_format not in FORMATS:
+            raise ValueError(f"Unsupported export format '{file_format}' (expected one of: {', '.join(FORMATS)})")
+        self._directory = directory
+        self._format = file_format
+        self._compression = compression
+        self._row_group_size = max(1, row_group_size)
+        self._include_text = include_text
+        self._schema = export_schema(include_text)
+        self._partitions: Dict[tuple, _Partition] = {}
+        self._next_part: Dict[tuple, int] = {}
+        self._current_date: Optional[str] = None
+        self.rows = 0
+        self.row_groups = 0
+        self.files: List[Path] = []
+
+    def write(self, record: BesluitRecord, publication_date: Optional[str]) -> None:
+        """Add one record to the partition of its publication date and authority."""
+        if publication_date != self._current_date:
+            self._close_partitions()
+            self._current_date = publication_date
+
+        key = (publication_date, record.metadata.authority)
+        partition = self._partitions.get(key)
+        if partition is None:
+            partition = self._partitions[key] = _Partition(self._schema.names, self._next_part.get(key, 0))
+            self._next_part[key] = partition.part + 1
+
+        metadata = record.metadata
+        columns = partition.columns
+        columns["id"].append(record.id)
+        columns["creator"].append(metadata.creator)
+        columns["bordcode"].append(metadata.bordcode)
+        columns["externe_bijlage"].append(metadata.externe_bijlage)
+        columns["gebiedsmarkering"].append([gebied.to_dict() for gebied in metadata.gebiedsmarkering])
+        columns["images"].append([str(url) for url in record.images])
+        columns["metadata"].append([(name, str(value)) for name, value in metadata.extra.items() if value is not None])
+        if self._include_text:
+            columns["text"].append(record.text)
+        partition.rows += 1
+
+        if partition.rows >= self._row_group_size:
+            self._flush(key, partition)
+
+    def close(self) -> None:
+        """Write the remaining buffered rows and close all files."""
+        self._close_partitions()
+
+    def _close_partitions(self) -> None:
+        for key, partition in self._partitions.items():
+            self._flush(key, partition)
+            if partition.writer is not None:
+                partition.writer.close()
+            if partition.sink is not None:
+                partition.sink.close()
+        self._partitions.clear()
+
+    def _flush(self, key: tuple, partition: _Partition) -> None:
+        if not partition.rows:
+            return
+        table = pa.Table.from_pydict(partition.columns, schema=self._schema)
+        if partition.writer is None:
+            self._open(key, partition)
+        if self._format == "parquet":
+            partition.writer.write_table(table, row_group_size=partition.rows)
+        else:
+            partition.writer.write_table(table, max_chunksize=partition.rows)
+        self.rows += partition.rows
+        self.row_groups += 1
+        partition.columns = {name: [] for name in self._schema.names}
+        partition.rows = 0
+
+    def _open(self, key: tuple, partition: _Partition) -> None:
+        publication_date, authority = key
+        directory = (
+            self._directory
+            / f"date={self._partition_value(publication_date)}"
+            / f"authority={self._partition_value(authority)}"
+        )
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"part-{partition.part}{FORMATS[self._format]}"
+        if self._format == "parquet":
+            partition.writer = pq.ParquetWriter(str(path), self._schema, compression=self._compression or "none")
+        else:
+            partition.sink = pa.OSFile(str(path), "wb")
+            options = pa.ipc.IpcWriteOptions(compression=self._compression)
+            partition.writer = pa.ipc.new_file(partition.sink, self._schema, options=options)
+        self.files.append(path)
+
+    @staticmethod
+    def _partition_value(value: Optional[str]) -> str:
+        """URI-encoded, as pyarrow's Hive partitioning decodes it."""
+        return quote(value, safe="") if value else NULL_PARTITION
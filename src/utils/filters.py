@@ -72,7 +72,7 @@ def check_bordcode_filter(
     Check if a besluit passes the bordcode categories filter.
     
     Args:
-        metadata: Besluit metadata dictionary
+        metadata: Besluit metadata (dictionary or BesluitMetadata)
         bordcode_categories: List of required bordcode categories (A, C, D, F, G)
         besluit_id: ID of the besluit for logging
         
@@ -93,8 +93,9 @@ def check_bordcode_filter(
     
     if not contains_category:
         logging.info(
-            f"🚫 {besluit_id}: Excluded by bordcode filter "
-            f"(has '{bordcode_value}', need any of: {[c.value for c in bordcode_categories]})"
+            "🚫 %s: Excluded by bordcode filter (has '%s', need any of: %s)",
+            besluit_id, bordcode_value, [c.value for c in bordcode_categories],
+            extra={"sample": "filter.bordcode", "besluit_id": besluit_id}
         )
         return False
     
@@ -113,7 +114,7 @@ def check_province_filter(
     DC.creator (case-insensitive).
     
     Args:
-        metadata: Besluit metadata dictionary
+        metadata: Besluit metadata (dictionary or BesluitMetadata)
         provinces: List of required provinces
         besluit_id: ID of the besluit for logging
         
@@ -136,9 +137,9 @@ def check_province_filter(
     
     if not province_match:
         logging.info(
-            f"🚫 {besluit_id}: Excluded by province filter "
-            f"(has authority: '{authority_value}', creator: '{creator_value}', "
-            f"need any of: {[p.lower() for p in provinces]})"
+            "🚫 %s: Excluded by province filter (has authority: '%s', creator: '%s', need any of: %s)",
+            besluit_id, authority_value, creator_value, [p.lower() for p in provinces],
+            extra={"sample": "filter.province", "besluit_id": besluit_id}
         )
         return False
     
@@ -158,7 +159,7 @@ def check_gemeente_filter(
     the authority/creator fields often contain the municipality name.
     
     Args:
-        metadata: Besluit metadata dictionary
+        metadata: Besluit metadata (dictionary or BesluitMetadata)
         gemeenten: List of required municipalities
         besluit_id: ID of the besluit for logging
         
@@ -182,9 +183,9 @@ def check_gemeente_filter(
     
     if not gemeente_match:
         logging.info(
-            f"🚫 {besluit_id}: Excluded by gemeente filter "
-            f"(has authority: '{authority_value}', creator: '{creator_value}', "
-            f"need any of: {[g.lower() for g in gemeenten]})"
+            "🚫 %s: Excluded by gemeente filter (has authority: '%s', creator: '%s', need any of: %s)",
+            besluit_id, authority_value, creator_value, [g.lower() for g in gemeenten],
+            extra={"sample": "filter.gemeente", "besluit_id": besluit_id}
         )
         return False
     
@@ -250,7 +251,8 @@ def apply_filters(
             continue
         
         # If we get here, the besluit passed all filters
-        logging.info(f"✅ {besluit_id}: Included (passed all filters)")
+        logging.info("✅ %s: Included (passed all filters)", besluit_id,
+                     extra={"sample": "filter.included", "besluit_id": besluit_id})
         filtered_results.append(besluit)
     
     # Summary logging
@@ -0,0 +1,300 @@
+"""
+Compact parsing of the WKT geometries found in gebiedsmarkering metadata.
+
+Geometries are parsed into flat arrays of doubles (one per ring or line) plus
+their bounding box, which is all that is needed for spatial indexing and the
+bbox/radius queries of the search API. Coordinates are kept in their source
+reference system (WGS84 lon/lat or RD New metres).
+"""
+
+from typing import List, Optional, Tuple
+from array import array
+import logging
+import math
+import re
+
+# Component kinds
+POINT = 0
+LINE = 1
+POLYGON = 2
+
+_KINDS = {
+    "POINT": POINT,
+    "LINESTRING": LINE,
+    "POLYGON": POLYGON,
+    "MULTIPOINT": POINT,
+    "MULTILINESTRING": LINE,
+    "MULTIPOLYGON": POLYGON,
+}
+
+_TOKEN_PATTERN = re.compile(r"\s*([A-Za-z]+|\(|\)|,|[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+
+# Metres per degree of latitude (and of longitude at the equator)
+METRES_PER_DEGREE = 111_320.0
+
+Ring = array  # Flat array('d') of x, y pairs
+
+
+class Geometry:
+    """A parsed geometry: components of (kind, rings) with a bounding box."""
+
+    __slots__ = ("geometry_type", "components", "bbox")
+
+    def __init__(self, geometry_type: str, components: List[Tuple[int, List[Ring]]]):
+        self.geometry_type = geometry_type
+        self.components = components
+        xs = [ring[i] for _, rings in components for ring in rings for i in range(0, len(ring), 2)]
+        ys = [ring[i] for _, rings in components for ring in rings for i in range(1, len(ring), 2)]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+
+    @property
+    def is_geographic(self) -> bool:
+        """Whether the coordinates look like WGS84 longitude/latitude."""
+        min_x, min_y, max_x, max_y = self.bbox
+        return -180 <= min_x and max_x <= 180 and -90 <= min_y and max_y <= 90
+
+    def to_blobs(self) -> Tuple[bytes, bytes]:
+        """
+        Pack the geometry into two binary blobs.
+
+        Returns:
+            Tuple of (coordinates as float64, structure as int32:
+            component count, then per component its kind, ring count and ring lengths)
+        """
+        coords = array("d")
+        structure = array("i", [len(self.components)])
+        for kind, rings in self.components:
+            structure.extend([kind, len(rings)])
+            for ring in rings:
+                structure.append(len(ring))
+                coords.extend(ring)
+        return coords.tobytes(), structure.tobytes()
+
+    @classmethod
+    def from_blobs(cls, geometry_type: str, coords_blob: bytes, structure_blob: bytes) -> "Geometry":
+        """Unpack a geometry packed with to_blobs()."""
+        coords = array("d")
+        coords.frombytes(coords_blob)
+        structure = array("i")
+        structure.frombytes(structure_blob)
+
+        components = []
+        position = 1
+        offset = 0
+        for _ in range(structure[0]):
+            kind, ring_count = structure[position], structure[position + 1]
+            position += 2
+            rings = []
+            for _ in range(ring_count):
+                length = structure[position]
+                position += 1
+                rings.append(coords[offset:offset + length])
+                offset += length
+            components.append((kind, rings))
+        return cls(geometry_type, components)
+
+    def intersects_bbox(self, min_x: float, min_y: float, max_x: float, max_y: float) -> bool:
+        """Whether the geometry intersects an axis-aligned box."""
+        g_min_x, g_min_y, g_max_x, g_max_y = self.bbox
+        if g_max_x < min_x or g_min_x > max_x or g_max_y < min_y or g_min_y > max_y:
+            return False
+
+        for kind, rings in self.components:
+            for ring in rings:
+                # Any vertex inside the box
+                for i in range(0, len(ring), 2):
+                    if min_x <= ring[i] <= max_x and min_y <= ring[i + 1] <= max_y:
+                        return True
+                # Any segment crossing the box
+                if kind != POINT:
+                    for i in range(0, len(ring) - 2, 2):
+                        if _segment_intersects_box(ring[i], ring[i + 1], ring[i + 2], ring[i + 3],
+                                                   min_x, min_y, max_x, max_y):
+                            return True
+            # The box lies entirely inside a polygon
+            if kind == POLYGON and _point_in_polygon(min_x, min_y, rings):
+                return True
+        return False
+
+    def distance_to(self, x: float, y: float) -> float:
+        """
+        Distance from a point to the geometry (0 when inside a polygon).
+        In metres: geographic coordinates are projected locally around the point.
+        """
+        if self.is_geographic:
+            scale_x = METRES_PER_DEGREE * math.cos(math.radians(y))
+            scale_y = METRES_PER_DEGREE
+        else:
+            scale_x = scale_y = 1.0
+
+        best = math.inf
+        for kind, rings in self.components:
+            if kind == POLYGON and _point_in_polygon(x, y, rings):
+                return 0.0
+            for ring in rings:
+                points = [((ring[i] - x) * scale_x, (ring[i + 1] - y) * scale_y) for i in range(0, len(ring), 2)]
+                if kind == POINT or len(points) == 1:
+                    best = min(best, min(math.hypot(px, py) for px, py in points))
+                    continue
+                for (ax, ay), (bx, by) in zip(points, points[1:]):
+                    best = min(best, _distance_to_segment(ax, ay, bx, by))
+        return best
+
+
+def parse_wkt(wkt: Optional[str]) -> Optional[Geometry]:
+    """
+    Parse a WKT string (optionally with an EWKT 'SRID=...;' prefix and Z/M ordinates).
+
+    Args:
+        wkt: Geometry in WKT, e.g. 'POINT(4.8896 52.3740)'
+
+    Returns:
+        The parsed Geometry, or None for empty or unsupported input
+    """
+    if not wkt:
+        return None
+    text = wkt.strip()
+    if text.upper().startswith("SRID="):
+        text = text.split(";", 1)[-1]
+    try:
+        tokens = [token for token in _TOKEN_PATTERN.findall(text) if token]
+        parser = _WKTParser(tokens)
+        components = parser.parse_geometry()
+        geometry_type = parser.geometry_type
+        if not components:
+            return None
+        return Geometry(geometry_type, components)
+    except (ValueError, IndexError) as e:
+        logging.debug(f"⚠️ Could not parse geometry {wkt[:80]!r}: {e}")
+        return None
+
+
+class _WKTParser:
+    """Recursive descent parser over WKT tokens."""
+
+    def __init__(self, tokens: List[str]):
+        self._tokens = tokens
+        self._position = 0
+        self.geometry_type = ""
+
+    def parse_geometry(self) -> List[Tuple[int, List[Ring]]]:
+        name = self._next().upper()
+        if not self.geometry_type:
+            self.geometry_type = name
+        while self._peek().upper() in ("Z", "M", "ZM"):
+            self._next()
+        if self._peek().upper() == "EMPTY":
+            self._next()
+            return []
+
+        if name == "GEOMETRYCOLLECTION":
+            components = []
+            for _ in self._list():
+                components.extend(self.parse_geometry())
+            return components
+        if name not in _KINDS:
+            raise ValueError(f"unsupported geometry type {name}")
+
+        kind = _KINDS[name]
+        if name == "POINT":
+            return [(POINT, [self._coordinates()])]
+        if name == "LINESTRING":
+            return [(LINE, [self._coordinates()])]
+        if name == "POLYGON":
+            return [(POLYGON, self._rings())]
+        if name == "MULTIPOINT":
+            # Both 'MULTIPOINT((1 2),(3 4))' and 'MULTIPOINT(1 2, 3 4)' are valid
+            if self._tokens[self._position + 1] == "(":
+                return [(kind, [self._coordinates()]) for _ in self._list()]
+            coords = self._coordinates()
+            return [(kind, [coords[i:i + 2]]) for i in range(0, len(coords), 2)]
+        if name == "MULTILINESTRING":
+            return [(kind, [self._coordinates()]) for _ in self._list()]
+        return [(kind, self._rings()) for _ in self._list()]
+
+    def _list(self):
+        """Iterate over the items of a parenthesised, comma separated list."""
+        self._expect("(")
+        while True:
+            yield
+            token = self._next()
+            if token == ")":
+                return
+            if token != ",":
+                raise ValueError(f"expected ',' or ')', got {token!r}")
+
+    def _rings(self) -> List[Ring]:
+        return [self._coordinates() for _ in self._list()]
+
+    def _coordinates(self) -> Ring:
+        """Parse '(x y [z [m]], ...)' keeping only x and y."""
+        self._expect("(")
+        coords = array("d")
+        ordinates = []
+        while True:
+            token = self._next()
+            if token in (",", ")"):
+                if len(ordinates) < 2:
+                    raise ValueError("coordinate with fewer than two ordinates")
+                coords.extend(ordinates[:2])
+                ordinates = []
+                if token == ")":
+                    return coords
+            else:
+                ordinates.append(float(token))
+
+    def _expect(self, expected: str) -> None:
+        token = self._next()
+        if token != expected:
+            raise ValueError(f"expected {expected!r}, got {token!r}")
+
+    def _next(self) -> str:
+        token = self._tokens[self._position]
+        self._position += 1
+        return token
+
+    def _peek(self) -> str:
+        return self._tokens[self._position] if self._position < len(self._tokens) else ""
+
+
+def _point_in_polygon(x: float, y: float, rings: List[Ring]) -> bool:
+    """Even-odd rule over all rings, so holes are excluded."""
+    inside = False
+    for ring in rings:
+        n = len(ring) // 2
+        j = n - 1
+        for i in range(n):
+            xi, yi = ring[2 * i], ring[2 * i + 1]
+            xj, yj = ring[2 * j], ring[2 * j + 1]
+            if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+    return inside
+
+
+def _distance_to_segment(ax: float, ay: float, bx: float, by: float) -> float:
+    """Distance from the origin to segment a-b."""
+    dx, dy = bx - ax, by - ay
+    length_squared = dx * dx + dy * dy
+    t = 0.0 if length_squared == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / length_squared))
+    return math.hypot(ax + t * dx, ay + t * dy)
+
+
+def _segment_intersects_box(x1: float, y1: float, x2: float, y2: float,
+                            min_x: float, min_y: float, max_x: float, max_y: float) -> bool:
+    """Liang-Barsky clipping: does segment (x1, y1)-(x2, y2) pass through the box?"""
+    t0, t1 = 0.0, 1.0
+    dx, dy = x2 - x1, y2 - y1
+    for p, q in ((-dx, x1 - min_x), (dx, max_x - x1), (-dy, y1 - min_y), (dy, max_y - y1)):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        t = q / p
+        if p < 0:
+            t0 = max(t0, t)
+        else:
+            t1 = min(t1, t)
+        if t0 > t1:
+            return False
+    return True
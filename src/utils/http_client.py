@@ -1,13 +1,31 @@
+import os
 import time
 import logging
+import threading
 from typing import Optional, Dict, Any
 import requests
 from requests import Response
 
+from src.utils.circuit_breaker import CircuitBreaker, NegativeCache
+from src.utils.metrics import get_metrics
+from src.utils.shared_state import get_shared_state
+from src.utils.single_flight import SingleFlight
+from src.utils.tracing import SPAN_KIND_CLIENT, get_tracer
+
+# Exceptions that no retry will fix
+_PERMANENT_ERRORS = (
+    requests.exceptions.TooManyRedirects,
+    requests.exceptions.InvalidURL,
+    requests.exceptions.MissingSchema,
+    requests.exceptions.InvalidSchema
+)
+
 class RateLimitedClient:
     """
     HTTP client with built-in rate limiting and retry functionality.
     Handles 429 responses adaptively and implements exponential backoff.
+    Permanently failing URLs are remembered in a negative cache, and hosts that
+    keep failing are short-circuited by a circuit breaker (see circuit_breaker.py).
     """
     
     def __init__(
@@ -28,10 +46,29 @@ class RateLimitedClient:
         self._connect_timeout = self._settings.rate_limit.connect_timeout
         self._max_retry_delay = self._settings.rate_limit.max_retry_delay
         
-        # Rate limiting state
+        # Rate limiting state (shared between threads, guarded by _lock)
         self._rate_limited = False
         self._last_request_time = 0
         self._successful_requests = 0
+        self._lock = threading.Lock()
+        # With several server workers, rate limiting is shared between them and the
+        # request budget is divided over the workers
+        self._shared_state = get_shared_state()
+        workers = self._settings.server.workers if self._shared_state else 1
+        # Caps the number of requests in flight when the client is used from worker threads
+        self._request_slots = threading.BoundedSemaphore(
+            max(1, self._settings.rate_limit.max_concurrent_requests // max(1, workers))
+        )
+        # Concurrent GETs for the same URL share a single download
+        self._in_flight = SingleFlight("http")
+        resilience = self._settings.resilience
+        self._negative_cache = NegativeCache(
+            resilience.negative_cache_max_entries, self._shared_state
+        ) if resilience.negative_cache_enabled else None
+        self._circuit_breaker = CircuitBreaker(
+            "http", resilience.failure_threshold, resilience.open_seconds, resilience.max_open_seconds
+        ) if resilience.circuit_breaker_enabled else None
+        self._tracer = get_tracer()
         
     def get(
         self,
@@ -43,6 +80,10 @@ class RateLimitedClient:
         """
         Make a rate-limited GET request.
         
+        Concurrent requests for the same URL and parameters are coalesced: only one
+        download is made and every caller receives the same Response object.
+        Requests with extra keyword arguments (e.g. stream=True) are never coalesced.
+        
         Args:
             url: The URL to request
             params: Optional query parameters
@@ -52,30 +93,214 @@ class RateLimitedClient:
         Returns:
             Response object if successful, None if all retries failed
         """
-        return self._make_request(url, params, timeout, **kwargs)
+        if kwargs:
+            return self._make_request(url, params, timeout, **kwargs)
+        key = (url, tuple(sorted((k, str(v)) for k, v in (params or {}).items())))
+        return self._in_flight.do(key, self._make_request, url, params, timeout)
+    
+    def head(self, url: str, timeout: Optional[int] = None) -> Optional[Response]:
+        """
+        Make a rate-limited HEAD request (following redirects), e.g. to check the
+        size of a resource before downloading it.
+        
+        Returns:
+            Response object if successful, None if all retries failed
+        """
+        return self._make_request(url, timeout=timeout, method="HEAD")
+    
+    def download_bytes(
+        self,
+        url: str,
+        max_bytes: Optional[int] = None,
+        min_bytes: int = 0,
+        check_head: bool = False,
+        chunk_size: int = 64 * 1024
+    ) -> Optional[bytes]:
+        """
+        Download a body into memory, rejecting it as early as possible when it falls
+        outside the size limits.
+        
+        Args:
+            url: The URL to download
+            max_bytes: Optional maximum size in bytes
+            min_bytes: Minimum size in bytes
+            check_head: Check the Content-Length with a HEAD request before requesting the body
+            chunk_size: Number of bytes read per chunk
+            
+        Returns:
+            The body, or None if the download failed or was rejected
+        """
+        if check_head:
+            head_response = self.head(url)
+            if head_response is not None and head_response.ok and not self._size_allowed(
+                head_response, url, min_bytes, max_bytes
+            ):
+                return None
+        
+        response = self._make_request(url, stream=True)
+        if not response or not response.ok:
+            if response is not None:
+                response.close()
+            return None
+        
+        try:
+            if not self._size_allowed(response, url, min_bytes, max_bytes):
+                return None
+            
+            chunks = []
+            received = 0
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                received += len(chunk)
+                if max_bytes and received > max_bytes:
+                    logging.warning(f"❌ Aborted {url}: larger than {max_bytes} bytes")
+                    return None
+                chunks.append(chunk)
+            if received < min_bytes:
+                logging.info("❌ Rejected %s: too small (%d bytes)", url, received,
+                             extra={"sample": "http.rejected_size"})
+                return None
+            return b"".join(chunks)
+        except requests.RequestException as e:
+            logging.warning(f"⚠️ Error while streaming {url}: {e}")
+            return None
+        finally:
+            response.close()
+    
+    def download_to_file(
+        self,
+        url: str,
+        destination: str,
+        max_bytes: Optional[int] = None,
+        min_bytes: int = 0,
+        chunk_size: int = 1024 * 1024
+    ) -> Optional[int]:
+        """
+        Stream a rate-limited GET request to a file without buffering the body in memory.
+        
+        The Content-Length header (when present) is checked before any of the body is
+        read, so attachments that are too small or too large are rejected early. The
+        byte cap is also enforced while streaming, for servers that omit the header.
+        
+        Args:
+            url: The URL to download
+            destination: Path of the file to write (removed again when rejected)
+            max_bytes: Optional maximum size in bytes
+            min_bytes: Minimum size in bytes
+            chunk_size: Number of bytes read per chunk
+            
+        Returns:
+            Number of bytes written, or None if the download failed or was rejected
+        """
+        response = self._make_request(url, stream=True)
+        if not response or not response.ok:
+            if response is not None:
+                response.close()
+            return None
+        
+        try:
+            if not self._size_allowed(response, url, min_bytes, max_bytes):
+                return None
+            
+            written = 0
+            with open(destination, "wb") as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    written += len(chunk)
+                    if max_bytes and written > max_bytes:
+                        logging.warning(f"❌ Aborted {url}: larger than {max_bytes} bytes")
+                        break
+                    f.write(chunk)
+                else:
+                    if written >= min_bytes:
+                        return written
+                    logging.warning(f"❌ Rejected {url}: too small ({written} bytes)")
+            
+            os.remove(destination)
+            return None
+        except requests.RequestException as e:
+            logging.warning(f"⚠️ Error while streaming {url}: {e}")
+            if os.path.exists(destination):
+                os.remove(destination)
+            return None
+        finally:
+            response.close()
+    
+    @staticmethod
+    def _size_allowed(response: Response, url: str, min_bytes: int, max_bytes: Optional[int]) -> bool:
+        """Check the Content-Length header (when present) against the size limits."""
+        content_length = response.headers.get("Content-Length")
+        if content_length and content_length.isdigit():
+            size = int(content_length)
+            if size < min_bytes or (max_bytes and size > max_bytes):
+                logging.info(
+                    "❌ Rejected %s before download: %d bytes (allowed: %d-%s)",
+                    url, size, min_bytes, max_bytes or "unlimited",
+                    extra={"sample": "http.rejected_size"}
+                )
+                return False
+        return True
     
     def _make_request(
         self,
         url: str,
         params: Optional[Dict[str, Any]] = None,
         timeout: Optional[int] = None,
+        method: str = "GET",
         **kwargs
     ) -> Optional[Response]:
         """Internal method to make the actual HTTP request with rate limiting."""
+        with self._tracer.span(f"http.{method.lower()}", SPAN_KIND_CLIENT, **{"http.url": url}) as span:
+            response = self._make_request_with_retries(url, params, timeout, method, **kwargs)
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code if response is not None else 0)
+            return response
+    
+    def _make_request_with_retries(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[int] = None,
+        method: str = "GET",
+        **kwargs
+    ) -> Optional[Response]:
+        cache_key = f"{method} {url} {sorted((params or {}).items())}" if params else f"{method} {url}"
+        if self._negative_cache is not None:
+            reason = self._negative_cache.get(cache_key)
+            if reason is not None:
+                logging.info("⏭️ Skipping %s: failed recently (%s)", url, reason,
+                             extra={"sample": "http.negative_cache_hit"})
+                get_metrics().increment("http.negative_cache_hits")
+                return None
+        
+        host = CircuitBreaker.host(url)
+        started = time.monotonic()
         for attempt in range(self._max_retries + 1):
+            if self._circuit_breaker is not None and not self._circuit_breaker.allow(host):
+                logging.info("🔌 Failing fast for %s: circuit for %s is open", url, host,
+                             extra={"sample": "http.short_circuited"})
+                self._record_wasted_retries(started, attempt)
+                return None
             try:
                 # Apply rate limiting delay if needed
                 self._apply_rate_limiting_delay(attempt)
                 
                 # Make the request
-                logging.debug(f"🌐 Requesting: {url}")
-                response = requests.get(
-                    url,
-                    params=params,
-                    timeout=(self._connect_timeout, timeout or self._timeout),  # (connect_timeout, read_timeout)
-                    **kwargs
-                )
-                self._last_request_time = time.time()
+                logging.debug("🌐 Requesting: %s %s", method, url)
+                with self._request_slots:
+                    response = requests.request(
+                        method,
+                        url,
+                        params=params,
+                        timeout=(self._connect_timeout, timeout or self._timeout),  # (connect_timeout, read_timeout)
+                        **kwargs
+                    )
+                with self._lock:
+                    self._last_request_time = max(self._last_request_time, time.time())
+                
+                if self._circuit_breaker is not None:
+                    if response.status_code >= 500:
+                        self._circuit_breaker.record_failure(host)
+                    else:
+                        self._circuit_breaker.record_success(host)
                 
                 # Handle rate limiting response
                 if response.status_code == 429:
@@ -87,17 +312,45 @@ class RateLimitedClient:
                     self._handle_success()
                 else:
                     self._handle_failure(response)
+                    self._remember_permanent_failure(cache_key, response.status_code)
                 
                 return response
                 
+            except _PERMANENT_ERRORS as e:
+                if self._circuit_breaker is not None:
+                    self._circuit_breaker.record_success(host)  # The host answered, the URL is broken
+                self._handle_error(e, attempt, url)
+                if self._negative_cache is not None:
+                    self._negative_cache.add(cache_key, type(e).__name__, self._settings.resilience.redirect_ttl)
+                self._record_wasted_retries(started, attempt)
+                return None
             except requests.RequestException as e:
+                if self._circuit_breaker is not None:
+                    self._circuit_breaker.record_failure(host)
                 self._handle_error(e, attempt, url)
                 if attempt == self._max_retries:
                     logging.error(f"❌ All {self._max_retries + 1} retries failed for {url}")
+                    self._record_wasted_retries(started, attempt)
                     return None
         
+        self._record_wasted_retries(started, self._max_retries)
         return None
     
+    def _remember_permanent_failure(self, cache_key: str, status_code: int) -> None:
+        """Negative-cache client errors that will not go away by asking again soon."""
+        if self._negative_cache is None or status_code in (408, 429) or not 400 <= status_code < 500:
+            return
+        resilience = self._settings.resilience
+        ttl = resilience.not_found_ttl if status_code in (404, 410) else resilience.client_error_ttl
+        self._negative_cache.add(cache_key, f"HTTP {status_code}", ttl)
+    
+    @staticmethod
+    def _record_wasted_retries(started: float, attempt: int) -> None:
+        """Count the time spent on a request that was retried and failed anyway."""
+        if attempt > 0:
+            get_metrics().increment("http.failed_after_retries")
+            get_metrics().increment("http.wasted_retry_seconds", round(time.monotonic() - started, 3))
+    
     def _apply_rate_limiting_delay(self, attempt: int) -> None:
         """Apply appropriate delays for rate limiting and retries."""
         if attempt > 0:
@@ -105,48 +358,73 @@ class RateLimitedClient:
             delay = self._request_delay * (self._retry_delay_multiplier ** (attempt - 1))
             delay = min(delay, self._max_retry_delay)
             logging.info(f"⏳ Retry attempt {attempt}: waiting {delay:.1f} seconds...")
+            get_metrics().increment("http.retry_sleep_seconds", delay)
             try:
-                time.sleep(delay)
+                with self._tracer.span("http.backoff", reason="retry", attempt=attempt):
+                    time.sleep(delay)
             except KeyboardInterrupt:
                 logging.info("⚠️ Retry interrupted by user")
                 raise
-        elif self._rate_limited:
-            # Regular rate limiting delay
-            time_since_last = time.time() - self._last_request_time
-            if time_since_last < self._request_delay:
-                sleep_time = self._request_delay - time_since_last
+        elif self._is_rate_limited():
+            # Regular rate limiting delay. The slot is reserved under the lock (or in the
+            # shared state, across workers) so that concurrent callers are spaced out
+            # instead of all waking up at once.
+            if self._shared_state is not None:
+                sleep_time = self._shared_state.reserve_request(self._request_delay)
+            else:
+                with self._lock:
+                    now = time.time()
+                    sleep_time = max(0.0, self._last_request_time + self._request_delay - now)
+                    self._last_request_time = now + sleep_time
+            if sleep_time > 0:
                 logging.info(f"⏳ Rate limiting active: waiting {sleep_time:.1f} seconds...")
                 try:
-                    time.sleep(sleep_time)
+                    with self._tracer.span("http.backoff", reason="rate_limit"):
+                        time.sleep(sleep_time)
                 except KeyboardInterrupt:
                     logging.info("⚠️ Rate limiting interrupted by user")
                     raise
     
+    def _is_rate_limited(self) -> bool:
+        """Whether requests are currently spaced out (in any worker, with shared state)."""
+        if self._shared_state is not None:
+            return self._shared_state.is_rate_limited()
+        return self._rate_limited
+    
     def _handle_rate_limit(self, response: Response) -> None:
         """Handle 429 Too Many Requests response."""
-        if not self._rate_limited:
-            logging.warning("⚠️ First 429 error detected - rate limiting now active")
+        with self._lock:
+            if self._shared_state is not None:
+                newly_limited = self._shared_state.set_rate_limited(True)
+            else:
+                newly_limited = not self._rate_limited
+            if newly_limited:
+                logging.warning("⚠️ First 429 error detected - rate limiting now active")
             self._rate_limited = True
-        self._successful_requests = 0
+            self._successful_requests = 0
         
         retry_after = response.headers.get('Retry-After')
         if retry_after:
             wait_time = int(retry_after)
             logging.warning(f"⚠️ Rate limited (429). Waiting {wait_time} seconds as per Retry-After header...")
-            time.sleep(wait_time)
+            with self._tracer.span("http.backoff", reason="retry_after"):
+                time.sleep(wait_time)
         else:
             logging.warning("⚠️ Rate limited (429). Using exponential backoff...")
     
     def _handle_success(self) -> None:
         """Handle successful response."""
-        logging.info("✅ Request successful")
-        self._successful_requests += 1
-        
-        if (self._rate_limited and 
-            self._successful_requests >= self._successful_requests_to_reset):
-            logging.info(f"🚀 Rate limiting disabled after {self._successful_requests_to_reset} successful requests")
-            self._rate_limited = False
-            self._successful_requests = 0
+        logging.info("✅ Request successful", extra={"sample": "http.success"})
+        with self._lock:
+            self._successful_requests += 1
+            
+            if (self._successful_requests >= self._successful_requests_to_reset and
+                self._is_rate_limited()):
+                logging.info(f"🚀 Rate limiting disabled after {self._successful_requests_to_reset} successful requests")
+                self._rate_limited = False
+                self._successful_requests = 0
+                if self._shared_state is not None:
+                    self._shared_state.set_rate_limited(False)
     
     def _handle_failure(self, response: Response) -> None:
         """Handle non-ok response."""
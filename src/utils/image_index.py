@@ -0,0 +1,181 @@
+"""
+In-memory index of the images available in the afbeeldingen directory.
+
+The index is built with a single directory scan at startup and kept up to date
+by the ImageStore, so checking whether (and which) images exist for a besluit
+is a dictionary lookup instead of a filesystem stat.
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+from functools import lru_cache
+from pathlib import Path
+import logging
+import mimetypes
+import os
+import re
+import threading
+
+from src.config.settings import get_settings
+from src.utils.metrics import get_metrics
+
+OBJECTS_DIRNAME = "objects"
+THUMBNAILS_DIRNAME = "thumbnails"
+
+# Public image names look like '<besluit_id>_page_<n>_bijlage.<ext>'
+_BESLUIT_IMAGE_PATTERN = re.compile(r"^(?P<besluit_id>.+)_page_\d+_bijlage\.\w+$")
+_OBJECT_PATTERN = re.compile(r"^(?P<hash>[0-9a-f]{64})(?P<thumb>_thumb)?\.\w+$")
+
+
+class ImageEntry(NamedTuple):
+    """An indexed image file."""
+    path: Path
+    size: int
+    mtime: float
+    etag: str
+    media_type: str
+
+
+class ImageIndex:
+    """Thread-safe index of public images and their thumbnails."""
+
+    def __init__(self, directory: Path):
+        """
+        Args:
+            directory: The afbeeldingen directory to index
+        """
+        self._directory = Path(directory)
+        self._lock = threading.Lock()
+        self._images: Dict[str, ImageEntry] = {}
+        self._thumbnails: Dict[str, ImageEntry] = {}
+        self._by_besluit: Dict[str, List[str]] = {}
+
+    def build(self) -> None:
+        """Scan the directory once and (re)build the index."""
+        object_hashes = self._scan_object_hashes()
+        images = self._scan(self._directory, object_hashes)
+        thumbnails = self._scan(self._directory / THUMBNAILS_DIRNAME, object_hashes)
+
+        by_besluit: Dict[str, List[str]] = {}
+        for filename in sorted(images):
+            if match := _BESLUIT_IMAGE_PATTERN.match(filename):
+                by_besluit.setdefault(match.group("besluit_id"), []).append(filename)
+
+        with self._lock:
+            self._images = images
+            self._thumbnails = thumbnails
+            self._by_besluit = by_besluit
+        logging.info(f"🗂️ Indexed {len(images)} images and {len(thumbnails)} thumbnails")
+
+    def add(self, filename: str, content_hash: Optional[str] = None, thumbnail: bool = False) -> Optional[ImageEntry]:
+        """
+        Add or refresh a single file in the index (called after an image was stored).
+
+        Args:
+            filename: Public filename relative to the (thumbnails) directory
+            content_hash: Content hash to use as ETag; a size/mtime validator is used if omitted
+            thumbnail: Whether the file is a thumbnail
+
+        Returns:
+            The new index entry, or None if the file does not exist
+        """
+        directory = self._directory / THUMBNAILS_DIRNAME if thumbnail else self._directory
+        entry = self._entry(directory / filename, content_hash)
+        if entry is None:
+            return None
+
+        with self._lock:
+            if thumbnail:
+                self._thumbnails[filename] = entry
+            else:
+                self._images[filename] = entry
+                if match := _BESLUIT_IMAGE_PATTERN.match(filename):
+                    filenames = self._by_besluit.setdefault(match.group("besluit_id"), [])
+                    if filename not in filenames:
+                        filenames.append(filename)
+                        filenames.sort()
+        return entry
+
+    def get(self, filename: str, thumbnail: bool = False) -> Optional[ImageEntry]:
+        """
+        Look up an image. Files that were added outside this process (e.g. by another
+        worker) are picked up on a miss and added to the index.
+        """
+        with self._lock:
+            entry = (self._thumbnails if thumbnail else self._images).get(filename)
+        if entry is not None:
+            return entry
+        if "/" in filename or filename.startswith("."):
+            return None
+        return self.add(filename, thumbnail=thumbnail)
+
+    def images_for_besluit(self, besluit_id: str) -> List[str]:
+        """Public filenames of all indexed images of a besluit."""
+        with self._lock:
+            return list(self._by_besluit.get(besluit_id, []))
+
+    def has_images(self, besluit_id: str) -> bool:
+        """Whether any image is indexed for a besluit (no filesystem access)."""
+        with self._lock:
+            return bool(self._by_besluit.get(besluit_id))
+
+    def stats(self) -> Dict[str, int]:
+        """Number of indexed images, thumbnails and besluiten, and total image bytes."""
+        with self._lock:
+            return {
+                "images": len(self._images),
+                "thumbnails": len(self._thumbnails),
+                "besluiten": len(self._by_besluit),
+                "image_bytes": sum(entry.size for entry in self._images.values())
+            }
+
+    def _scan_object_hashes(self) -> Dict[int, str]:
+        """Map inode -> content hash for the deduplicated objects, so linked files reuse the hash as ETag."""
+        hashes = {}
+        objects_dir = self._directory / OBJECTS_DIRNAME
+        if not objects_dir.is_dir():
+            return hashes
+        for root, _, files in os.walk(objects_dir):
+            for name in files:
+                if match := _OBJECT_PATTERN.match(name):
+                    suffix = "-thumb" if match.group("thumb") else ""
+                    hashes[os.stat(os.path.join(root, name)).st_ino] = match.group("hash") + suffix
+        return hashes
+
+    def _scan(self, directory: Path, object_hashes: Dict[int, str]) -> Dict[str, ImageEntry]:
+        entries = {}
+        if not directory.is_dir():
+            return entries
+        with os.scandir(directory) as it:
+            for dir_entry in it:
+                if not dir_entry.is_file() or dir_entry.name.startswith("."):
+                    continue
+                stat = dir_entry.stat()
+                content_hash = object_hashes.get(stat.st_ino)
+                entries[dir_entry.name] = self._make_entry(Path(dir_entry.path), stat, content_hash)
+        return entries
+
+    def _entry(self, path: Path, content_hash: Optional[str]) -> Optional[ImageEntry]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        if not path.is_file():
+            return None
+        return self._make_entry(path, stat, content_hash)
+
+    @staticmethod
+    def _make_entry(path: Path, stat: os.stat_result, content_hash: Optional[str]) -> ImageEntry:
+        # Files stored before content-hash deduplication get a size/mtime validator,
+        # so building the index never has to read image contents
+        etag = content_hash or f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        return ImageEntry(path, stat.st_size, stat.st_mtime, f'"{etag}"', media_type)
+
+
+@lru_cache()
+def get_image_index() -> ImageIndex:
+    """Get the process-wide image index, built on first use."""
+    index = ImageIndex(get_settings().directories.afbeeldingen)
+    index.build()
+    get_metrics().register_collector("images", index.stats)
+    return index
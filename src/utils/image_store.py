@@ -0,0 +1,198 @@
+"""
+Storage of rendered besluit images in the afbeeldingen directory.
+
+Images are encoded in the configured output format and stored once per content
+hash under ``objects/``. The public, besluit-named files (and their thumbnails
+under ``thumbnails/``) are hard links to those objects, so identical maps that
+are attached to several besluiten only take up disk space once.
+"""
+
+from typing import Optional
+from pathlib import Path
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+
+from PIL import Image
+
+from src.config.settings import Settings, get_settings
+from src.utils.image_index import ImageIndex, OBJECTS_DIRNAME, THUMBNAILS_DIRNAME
+from src.utils.page_buffers import buffer_hash
+
+# Output format -> (file extension, PIL format)
+IMAGE_FORMATS = {
+    "png": ("png", "PNG"),
+    "png-optimized": ("png", "PNG"),
+    "palette": ("png", "PNG"),
+    "webp": ("webp", "WEBP"),
+}
+
+# Rows hashed at a time: bounds the pixel copy PIL makes for tobytes()
+HASH_STRIP_ROWS = 256
+
+
+class ImageStore:
+    """
+    Saves images with content-hash deduplication and pre-generated thumbnails.
+    """
+
+    def __init__(
+        self,
+        settings: Optional[Settings] = None,
+        directory: Optional[Path] = None,
+        index: Optional[ImageIndex] = None
+    ):
+        """
+        Args:
+            settings: Application settings
+            directory: Root directory for images (defaults to directories.afbeeldingen)
+            index: Optional image index to keep up to date with stored images
+        """
+        self._settings = settings or get_settings()
+        self._index = index
+        self._directory = Path(directory or self._settings.directories.afbeeldingen)
+        self._format = self._settings.file.image_format
+        if self._format not in IMAGE_FORMATS:
+            raise ValueError(
+                f"Unsupported image format: {self._format}. "
+                f"Valid options: {', '.join(IMAGE_FORMATS)}"
+            )
+        self._extension, self._pil_format = IMAGE_FORMATS[self._format]
+
+    @property
+    def directory(self) -> Path:
+        return self._directory
+
+    def filename(self, stem: str) -> str:
+        """Public filename for an image stem in the configured format."""
+        return f"{stem}.{self._extension}"
+
+    def save(self, image: Image.Image, stem: str) -> str:
+        """
+        Store an image under a public name, reusing an identical stored image if present.
+
+        Args:
+            image: PIL image to store
+            stem: Public filename without extension (e.g. '<besluit_id>_page_1_bijlage')
+
+        Returns:
+            Public filename, relative to the afbeeldingen directory
+        """
+        content_hash = self.content_hash(image)
+        filename = self.filename(stem)
+
+        object_path = self._object_path(content_hash)
+        if object_path.exists():
+            logging.info(f"♻️ Identical image already stored ({content_hash[:12]}), linking {filename}")
+        else:
+            self._write_encoded(image, object_path)
+        self._link(object_path, self._directory / filename)
+
+        if self._settings.file.thumbnail_max_size > 0:
+            thumbnail_object_path = self._object_path(content_hash, thumbnail=True)
+            if not thumbnail_object_path.exists():
+                thumbnail = image.copy()
+                thumbnail.thumbnail((self._settings.file.thumbnail_max_size,) * 2)
+                self._write_encoded(thumbnail, thumbnail_object_path)
+            self._link(thumbnail_object_path, self._directory / THUMBNAILS_DIRNAME / filename)
+            self._index_file(filename, f"{content_hash}-thumb", thumbnail=True)
+
+        self._index_file(filename, content_hash)
+        return filename
+
+    def link(self, existing_filename: str, stem: str) -> str:
+        """
+        Publish an already stored image (and its thumbnail) under another name.
+
+        Args:
+            existing_filename: Public filename of the stored image
+            stem: New public filename without extension
+
+        Returns:
+            The new public filename
+        """
+        filename = self.filename(stem)
+        if filename == existing_filename:
+            return filename
+        self._link(self._directory / existing_filename, self._directory / filename)
+        existing_thumbnail = self._directory / THUMBNAILS_DIRNAME / existing_filename
+        if existing_thumbnail.exists():
+            self._link(existing_thumbnail, self._directory / THUMBNAILS_DIRNAME / filename)
+            self._index_link(existing_filename, filename, thumbnail=True)
+        self._index_link(existing_filename, filename)
+        return filename
+
+    def _index_file(self, filename: str, content_hash: str, thumbnail: bool = False) -> None:
+        if self._index is not None:
+            self._index.add(filename, content_hash=content_hash, thumbnail=thumbnail)
+
+    def _index_link(self, existing_filename: str, filename: str, thumbnail: bool = False) -> None:
+        """Index a linked file with the ETag of the file it links to."""
+        if self._index is None:
+            return
+        existing = self._index.get(existing_filename, thumbnail=thumbnail)
+        content_hash = existing.etag.strip('"') if existing else None
+        self._index.add(filename, content_hash=content_hash, thumbnail=thumbnail)
+
+    @staticmethod
+    def content_hash(image: Image.Image) -> str:
+        """
+        SHA-256 over the decoded pixels, so the hash does not depend on the encoding.
+        Rendered pages carry the hash of their page buffer; other images are hashed in
+        strips of rows, so a 300 dpi page is never copied out in full.
+        """
+        precomputed = buffer_hash(image)
+        if precomputed is not None:
+            return precomputed
+        width, height = image.size
+        digest = hashlib.sha256(f"{image.mode}:{width}x{height}:".encode())
+        for top in range(0, height, HASH_STRIP_ROWS):
+            digest.update(image.crop((0, top, width, min(top + HASH_STRIP_ROWS, height))).tobytes())
+        return digest.hexdigest()
+
+    def _object_path(self, content_hash: str, thumbnail: bool = False) -> Path:
+        suffix = "_thumb" if thumbnail else ""
+        return self._directory / OBJECTS_DIRNAME / content_hash[:2] / f"{content_hash}{suffix}.{self._extension}"
+
+    def _write_encoded(self, image: Image.Image, path: Path) -> None:
+        """Encode an image in the configured format and move it into place atomically."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if image.mode not in ("RGB", "RGBA", "L", "P"):
+            image = image.convert("RGB")
+
+        save_kwargs = {}
+        if self._format == "png-optimized":
+            save_kwargs = {"optimize": True}
+        elif self._format == "palette":
+            if image.mode != "P":
+                image = image.convert("RGB").quantize(
+                    colors=self._settings.file.palette_colors,
+                    method=Image.Quantize.FASTOCTREE
+                )
+            save_kwargs = {"optimize": True}
+        elif self._format == "webp":
+            save_kwargs = {"lossless": True, "method": self._settings.file.webp_method}
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=f".{self._extension}.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, self._pil_format, **save_kwargs)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _link(source: Path, target: Path) -> None:
+        """Hard-link target to source, falling back to a copy when linking is not possible."""
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            os.link(source, tmp_target)
+        except OSError:
+            shutil.copyfile(source, tmp_target)
+        os.replace(tmp_target, target)
@@ -0,0 +1,172 @@
+"""
+Queue-based, low-overhead logging.
+
+Log records are put on an in-process queue by the calling thread and
+formatted and written (console, file) by a background listener thread, so
+request and worker threads never wait on disk I/O. Messages use lazy
+%-style arguments; formatting happens on the listener thread, and only for
+records that are actually emitted.
+
+Hot-loop messages (one per besluit or per HTTP request) are marked with
+``extra={"sample": "<key>"}``. Below WARNING only one in every
+``logging.sample_every`` such messages per key is kept, and the kept record
+carries the number suppressed since the previous one. Warnings and errors are never sampled.
+"""
+
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import json
+import logging
+import queue
+import threading
+
+from src.config.settings import Settings
+from src.utils.metrics import get_metrics
+
+SAMPLE_ATTRIBUTE = "sample"
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_STANDARD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every `every` records per sample key (records below WARNING only)."""
+
+    def __init__(self, every: int):
+        super().__init__()
+        self._every = max(1, every)
+        self._seen: Dict[str, int] = defaultdict(int)
+        self._skipped: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, SAMPLE_ATTRIBUTE, None)
+        if key is None or self._every == 1 or record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            seen = self._seen[key]
+            self._seen[key] = seen + 1
+            if seen % self._every:
+                self._skipped[key] += 1
+                self.suppressed += 1
+                return False
+            skipped = self._skipped.pop(key, 0)
+        if skipped:
+            record.suppressed = skipped
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Enqueues records without formatting them and never blocks the caller.
+
+    The queue is in-process, so records don't need to be made picklable; the
+    listener thread does the formatting. When the queue is full the record is
+    dropped and counted instead of stalling the request thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, including any fields passed through `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES and key != SAMPLE_ATTRIBUTE:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(settings: Settings) -> None:
+    """
+    Configure the root logger from LoggingSettings.
+
+    With `logging.queue_enabled` the console and file handlers run on a background
+    listener thread behind a bounded queue; otherwise they are attached directly.
+    """
+    global _listener, _queue_handler
+    shutdown_logging()
+
+    log_settings = settings.logging
+    level = getattr(logging, log_settings.level)
+    formatter = JSONFormatter() if log_settings.json_format else logging.Formatter(log_settings.format)
+
+    handlers: List[logging.Handler] = []
+    if log_settings.console:
+        handlers.append(logging.StreamHandler())  # Console output for Docker logs
+    if log_settings.file_enabled and log_settings.file:
+        handlers.append(logging.FileHandler(log_settings.file))  # File output
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    sampling = SamplingFilter(log_settings.sample_every)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(level)
+
+    if log_settings.queue_enabled:
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=log_settings.queue_size))
+        _queue_handler.addFilter(sampling)
+        root.addHandler(_queue_handler)
+        _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+    else:
+        for handler in handlers:
+            handler.addFilter(sampling)
+            root.addHandler(handler)
+
+    get_metrics().register_collector("logging", lambda: {
+        "queue_enabled": _queue_handler is not None,
+        "queued": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "enqueued": _queue_handler.enqueued if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+        "sampled_out": sampling.suppressed,
+        "sample_every": log_settings.sample_every
+    })
+
+
+def shutdown_logging() -> None:
+    """Stop the listener thread after it has written everything still queued."""
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+        _queue_handler = None
+
+
+atexit.register(shutdown_logging)
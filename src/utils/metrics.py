@@ -0,0 +1,56 @@
+"""
+In-process metrics for the verkeersbesluiten service.
+
+Counters are cheap, thread-safe and exposed through the /metrics endpoint.
+Components that keep their own statistics can register a collector that is
+called when a snapshot is taken.
+"""
+
+from typing import Callable, Dict, Any
+from functools import lru_cache
+import threading
+
+
+class MetricsRegistry:
+    """Thread-safe registry of named counters and snapshot collectors."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """Add a value to a counter, creating it if needed."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get(self, name: str) -> float:
+        """Current value of a counter (0 if it was never incremented)."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def register_collector(self, name: str, collector: Callable[[], Dict[str, Any]]) -> None:
+        """Register a callable whose result is included in snapshots under the given name."""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Take a point-in-time copy of all metrics.
+        
+        Returns:
+            Dictionary with 'counters' and one entry per registered collector
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            collectors = dict(self._collectors)
+        snapshot: Dict[str, Any] = {"counters": counters}
+        for name, collector in collectors.items():
+            snapshot[name] = collector()
+        return snapshot
+
+
+@lru_cache()
+def get_metrics() -> MetricsRegistry:
+    """Get the process-wide metrics registry."""
+    return MetricsRegistry()
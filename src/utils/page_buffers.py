@@ -0,0 +1,124 @@
+"""
+Rendering PDF pages without copying them through Python byte strings.
+
+pdf2image's default path reads poppler's PPM output from a pipe into a bytes
+object, splits it per page and decodes every page from that buffer: a 300 dpi
+A4 page (~26 MB of RGB) exists two to three times over before it becomes a
+PIL image. Here poppler writes the pages as PPM files into a directory on a
+tmpfs (/dev/shm: shared memory, no disk I/O), each file is memory-mapped and
+the image is built with Image.frombuffer straight from the mapping.
+
+pdftoppm writes colour pages (P6, RGB), which PIL keeps as 4 bytes per pixel,
+so each page is decoded once from the mapped pages into PIL's own storage;
+that one copy is unavoidable. The content hash the image store deduplicates
+by is computed from the mapping at the same time (see buffer_hash), so saving
+the page does not need another full-size copy of its pixels. Then the mapping
+is closed and the file removed.
+"""
+
+from typing import Dict, List, Optional
+from pathlib import Path
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import weakref
+
+from pdf2image import convert_from_path
+from PIL import Image
+
+# Binary PPM header as written by pdftoppm: width, height, maxval, one whitespace
+_PPM_HEADER = re.compile(rb"P6\s+(\d+)\s+(\d+)\s+(\d+)\s")
+
+# Pixel hashes of loaded pages by id(image), dropped when the image is garbage collected. Not kept in
+# Image.info: PIL copies info into derived images (crop, convert), which have different pixels
+_buffer_hashes: Dict[int, str] = {}
+
+_SHARED_MEMORY_DIR = "/dev/shm"
+
+
+def buffer_directory(configured: str = "", fallback: str = "") -> Optional[str]:
+    """
+    Directory for rendered page buffers: the configured one, else /dev/shm when
+    available, else the fallback (None = system temp directory).
+    """
+    if configured:
+        return configured
+    if os.path.isdir(_SHARED_MEMORY_DIR) and os.access(_SHARED_MEMORY_DIR, os.W_OK):
+        return _SHARED_MEMORY_DIR
+    return fallback or None
+
+
+def load_ppm(path: str) -> Image.Image:
+    """
+    Load a binary PPM file through a memory map.
+
+    Raises:
+        ValueError: If the file is not an 8-bit binary PPM
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        header = _PPM_HEADER.match(mapped[:64])
+        if header is None or header.group(3) != b"255":
+            raise ValueError(f"{path} is not an 8-bit binary PPM file")
+
+        size = (int(header.group(1)), int(header.group(2)))
+        offset = header.end()
+        view = memoryview(mapped)[offset:offset + size[0] * size[1] * 3]
+        try:
+            image = Image.frombuffer("RGB", size, view, "raw", "RGB", 0, 1)
+            digest = hashlib.sha256(f"RGB:{size[0]}x{size[1]}:".encode())
+            digest.update(view)
+            _buffer_hashes[id(image)] = digest.hexdigest()
+            weakref.finalize(image, _buffer_hashes.pop, id(image), None)
+        finally:
+            view.release()
+        return image
+    finally:
+        mapped.close()
+
+
+def buffer_hash(image: Image.Image) -> Optional[str]:
+    """
+    SHA-256 of a page's pixels, computed from its page buffer (the same digest as
+    ImageStore.content_hash), or None for images that were not loaded by load_ppm.
+    """
+    return _buffer_hashes.get(id(image))
+
+
+def render_pages(
+    pdf_path: str,
+    dpi: int,
+    first_page: int = 1,
+    last_page: Optional[int] = None,
+    directory: Optional[str] = None,
+    timeout: Optional[int] = None
+) -> List[Image.Image]:
+    """
+    Render PDF pages with poppler into memory-mapped page buffers.
+
+    Args:
+        pdf_path: Path of the PDF file
+        dpi: Resolution to render at
+        first_page: First page to render (1-based)
+        last_page: Last page to render (defaults to the last page of the PDF)
+        directory: Where poppler writes the page buffers (see buffer_directory)
+        timeout: Seconds before poppler is stopped
+
+    Returns:
+        The rendered pages in page order
+    """
+    with tempfile.TemporaryDirectory(prefix="pages-", dir=directory) as output_folder:
+        paths = convert_from_path(
+            pdf_path,
+            dpi=dpi,
+            first_page=first_page,
+            last_page=last_page,
+            output_folder=output_folder,
+            fmt="ppm",
+            paths_only=True,
+            timeout=timeout
+        )
+        return [load_ppm(path) for path in sorted(paths, key=lambda path: Path(path).name)]
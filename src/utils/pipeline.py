@@ -0,0 +1,187 @@
+"""
+Staged producer/consumer pipeline.
+
+Items flow through a sequence of stages, each with its own worker threads,
+connected by bounded queues. A full queue blocks the stage in front of it
+(backpressure), so the number of items in flight - and the memory they hold -
+stays bounded however many items are fed in. All stages work at the same time,
+so the wall-clock time of a run approaches that of the slowest stage instead of
+the sum of all stages.
+
+Worker threads run in a copy of the caller's context, so spans they record
+stay in the caller's trace, and they are sampled when the caller's run is
+being profiled.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from dataclasses import dataclass
+import contextvars
+import logging
+import queue
+import threading
+import time
+
+from src.utils.metrics import MetricsRegistry, get_metrics
+from src.utils.profiling import profiled_thread
+
+_DONE = object()
+
+
+@dataclass(slots=True)
+class Stage:
+    """A pipeline stage: fn returns the item for the next stage, or None to drop it."""
+    name: str
+    fn: Callable[[Any], Optional[Any]]
+    workers: int = 1
+    queue_size: Optional[int] = None  # Items waiting in front of this stage (defaults to the pipeline's)
+
+
+class _StageStats:
+    __slots__ = ("processed", "dropped", "failed", "busy", "blocked")
+
+    def __init__(self):
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy = 0.0  # Seconds spent in fn, summed over workers
+        self.blocked = 0.0  # Seconds spent waiting for room in the next stage's queue
+
+    def add(self, other: "_StageStats") -> None:
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy, 3),
+            "blocked_seconds": round(self.blocked, 3)
+        }
+
+
+class Pipeline:
+    """Runs items through stages of worker threads connected by bounded queues."""
+
+    def __init__(self, name: str, stages: List[Stage], queue_size: int = 16,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            name: Name for thread names, logs and the metrics snapshot
+            stages: Stages in processing order
+            queue_size: Default bound of the queue in front of each stage
+            metrics: Metrics registry (defaults to the process-wide registry)
+        """
+        if any(stage.workers < 1 for stage in stages):
+            raise ValueError("Every pipeline stage needs at least one worker")
+        self._name = name
+        self._stages = stages
+        self._queue_size = queue_size
+        self._lock = threading.Lock()
+        self._totals = {stage.name: _StageStats() for stage in stages}
+        self._runs = 0
+        (metrics or get_metrics()).register_collector(f"pipeline.{name}", self.stats)
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """
+        Feed items through all stages and wait until they are done.
+
+        Returns:
+            The items that came out of the last stage, in completion order
+        """
+        queues = [queue.Queue(maxsize=max(1, stage.queue_size or self._queue_size)) for stage in self._stages]
+        results: List[Any] = []
+        stats = [_StageStats() for _ in self._stages]
+        remaining = [stage.workers for stage in self._stages]
+        remaining_lock = threading.Lock()
+
+        def worker(index: int) -> None:
+            with profiled_thread():
+                work(index)
+
+        def work(index: int) -> None:
+            stage = self._stages[index]
+            inbox = queues[index]
+            outbox = queues[index + 1] if index + 1 < len(queues) else None
+            stage_stats = _StageStats()
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                started = time.perf_counter()
+                try:
+                    item = stage.fn(item)
+                except Exception as e:
+                    stage_stats.failed += 1
+                    logging.warning(f"⚠️ Pipeline {self._name}: stage {stage.name} failed: {e}")
+                    continue
+                finally:
+                    stage_stats.busy += time.perf_counter() - started
+                if item is None:
+                    stage_stats.dropped += 1
+                    continue
+                stage_stats.processed += 1
+                if outbox is None:
+                    results.append(item)
+                else:
+                    started = time.perf_counter()
+                    outbox.put(item)
+                    stage_stats.blocked += time.perf_counter() - started
+
+            # The last worker of a stage to finish closes the next stage
+            with remaining_lock:
+                stats[index].add(stage_stats)
+                remaining[index] -= 1
+                last = remaining[index] == 0
+            if last and outbox is not None:
+                for _ in range(self._stages[index + 1].workers):
+                    outbox.put(_DONE)
+
+        threads = []
+        for index, stage in enumerate(self._stages):
+            for number in range(stage.workers):
+                # Each thread needs its own context copy (a context can only be entered by one thread)
+                thread = threading.Thread(
+                    target=contextvars.copy_context().run,
+                    args=(worker, index),
+                    name=f"{self._name}-{stage.name}-{number}",
+                    daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+
+        started = time.perf_counter()
+        try:
+            for item in items:
+                queues[0].put(item)
+        finally:
+            for _ in range(self._stages[0].workers):
+                queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+
+        self._record(stats, time.perf_counter() - started)
+        return results
+
+    def _record(self, stats: List[_StageStats], elapsed: float) -> None:
+        with self._lock:
+            self._runs += 1
+            for stage, stage_stats in zip(self._stages, stats):
+                self._totals[stage.name].add(stage_stats)
+        logging.info(
+            f"🧵 Pipeline {self._name} finished in {elapsed:.1f}s - busy per stage: " + ", ".join(
+                f"{stage.name} {stage_stats.busy:.1f}s/{stage.workers}w"
+                for stage, stage_stats in zip(self._stages, stats)
+            )
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Cumulative per-stage counts, busy time and backpressure time."""
+        with self._lock:
+            return {
+                "runs": self._runs,
+                "stages": {
+                    stage.name: {"workers": stage.workers, **self._totals[stage.name].to_dict()}
+                    for stage in self._stages
+                }
+            }
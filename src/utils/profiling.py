@@ -0,0 +1,277 @@
+"""
+Opt-in profiling of processing runs.
+
+A profiled run is sampled by a background thread that captures the Python
+stacks of the threads doing the work at a fixed interval: the calling thread
+plus the threads that join the run through profiled_thread (its pipeline
+workers, and pool threads while they run a task of the run). Threads of other
+requests, warm runs or exports working at the same time are left out. Samples
+are written in the folded-stack format used by flamegraph.pl, speedscope and
+inferno. Memory is traced with tracemalloc over the run; tracemalloc is
+process-wide, so allocations of concurrent work are included there.
+
+Both CPU samples and allocations are attributed to pipeline stages (http, xml,
+pdf, image, clip, index) by the innermost frame that belongs to a stage, so the
+summary shows where time and memory go per stage.
+
+Output per run, in `<directories.verkeersbesluiten>/<profiling.dirname>/<timestamp>_<label>/`:
+    cpu.folded    folded stacks, one 'frame;frame;... count' line per stack
+    memory.txt    top allocators per stage (memory still held at the end of the run)
+    summary.json  duration, sample counts and CPU share per stage, traced memory peak
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+import contextvars
+from datetime import datetime
+from pathlib import Path
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+
+from src.config.settings import Settings
+
+# Stage of a frame, decided by the first (innermost) frame whose file matches
+STAGES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("clip", ("clip_classifier.py", f"{os.sep}torch{os.sep}", f"{os.sep}clip{os.sep}")),
+    ("pdf", ("pdf2image", "poppler", "pdf_prescreen.py", "page_buffers.py")),
+    ("xml", ("xml_parser.py", f"xml{os.sep}etree")),
+    ("image", ("image_store.py", "image_index.py", f"{os.sep}PIL{os.sep}")),
+    ("index", ("search_index.py", "spatial_index.py", "geometry.py", "sqlite3")),
+    ("http", ("http_client.py", f"{os.sep}requests{os.sep}", f"{os.sep}urllib3{os.sep}", "ssl.py", "socket.py")),
+]
+OTHER_STAGE = "other"
+
+_SAFE_LABEL = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# tracemalloc is process-wide, so only one run is profiled at a time
+_active = threading.Lock()
+
+# Profiler of the run being executed; threads started in a copy of its context inherit it
+_current_profiler: contextvars.ContextVar[Optional["SamplingProfiler"]] = contextvars.ContextVar(
+    "profiler", default=None
+)
+
+
+def stage_of(filenames: List[str]) -> str:
+    """The stage of a stack, given its filenames from innermost to outermost."""
+    for filename in filenames:
+        for stage, patterns in STAGES:
+            if any(pattern in filename for pattern in patterns):
+                return stage
+    return OTHER_STAGE
+
+
+class SamplingProfiler:
+    """Samples the stacks of the threads working on a run from a background thread."""
+
+    def __init__(self, interval: float, thread_ids: Optional[List[int]] = None):
+        """
+        Args:
+            interval: Seconds between samples
+            thread_ids: Threads that are sampled (more join with add_thread)
+        """
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._thread_ids: Counter = Counter(thread_ids or [])
+        self.threads_seen = set(self._thread_ids)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self.stacks: Counter = Counter()
+        self.stages: Counter = Counter()
+        self.samples = 0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def add_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self._thread_ids[thread_id] += 1
+            self.threads_seen.add(thread_id)
+
+    def remove_thread(self, thread_id: int) -> None:
+        with self._lock:
+            self._thread_ids[thread_id] -= 1
+            if self._thread_ids[thread_id] <= 0:
+                del self._thread_ids[thread_id]
+
+    def _run(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not self._stop.wait(self._interval):
+            with self._lock:
+                thread_ids = set(self._thread_ids)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in thread_ids:
+                    continue
+                stack = []
+                filenames = []
+                while frame is not None:
+                    code = frame.f_code
+                    filenames.append(code.co_filename)
+                    stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                    frame = frame.f_back
+                if thread_id not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                thread_name = _SAFE_LABEL.sub("_", names.get(thread_id, str(thread_id)))
+                self.stacks[";".join([thread_name] + stack[::-1])] += 1
+                self.stages[stage_of(filenames)] += 1
+                self.samples += 1
+
+    def write_folded(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+@contextmanager
+def profiled_thread() -> Iterator[None]:
+    """
+    Sample the calling thread while the enclosed block runs, if it works for the
+    run being profiled (the profiler is found through the context, so call it in
+    a copy of the run's context).
+    """
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profiler.add_thread(thread_id)
+    try:
+        yield
+    finally:
+        profiler.remove_thread(thread_id)
+
+
+def run_profiled(fn, *args, **kwargs):
+    """Call fn inside profiled_thread (for tasks submitted to shared pools)."""
+    with profiled_thread():
+        return fn(*args, **kwargs)
+
+
+def top_allocators_per_stage(
+    start: tracemalloc.Snapshot,
+    end: tracemalloc.Snapshot,
+    limit: int
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Memory allocated during the run and still held at its end, per stage.
+
+    Returns:
+        Per stage, the allocation sites with the largest growth (innermost frame)
+    """
+    per_stage: Dict[str, Counter] = defaultdict(Counter)
+    counts: Dict[str, Counter] = defaultdict(Counter)
+    # Leave out the profiler's own bookkeeping
+    ignored = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+    for diff in end.filter_traces(ignored).compare_to(start.filter_traces(ignored), "traceback"):
+        if diff.size_diff <= 0:
+            continue
+        frames = list(reversed(diff.traceback))  # tracemalloc stores oldest first
+        stage = stage_of([frame.filename for frame in frames])
+        site = f"{frames[0].filename}:{frames[0].lineno}" if frames else "?"
+        per_stage[stage][site] += diff.size_diff
+        counts[stage][site] += diff.count_diff
+
+    return {
+        stage: [
+            {"site": site, "size_bytes": size, "count": counts[stage][site]}
+            for site, size in sites.most_common(limit)
+        ]
+        for stage, sites in sorted(per_stage.items(), key=lambda item: -sum(item[1].values()))
+    }
+
+
+@contextmanager
+def profile_run(settings: Settings, label: str) -> Iterator[Optional[Path]]:
+    """
+    Profile the enclosed block (CPU samples and tracemalloc) and write the results.
+
+    Yields the output directory, or None when another run is already being profiled
+    (the block then runs unprofiled).
+    """
+    if not _active.acquire(blocking=False):
+        logging.warning(f"⚠️ Profiling of '{label}' skipped: another run is being profiled")
+        yield None
+        return
+
+    profiling = settings.profiling
+    run_name = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{_SAFE_LABEL.sub('_', label)}"
+    output_dir = Path(settings.directories.verkeersbesluiten) / profiling.dirname / run_name
+    started_tracemalloc = not tracemalloc.is_tracing()
+    profiler = SamplingProfiler(profiling.interval_ms / 1000, thread_ids=[threading.get_ident()])
+    try:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        if started_tracemalloc:
+            tracemalloc.start(profiling.tracemalloc_frames)
+        tracemalloc.reset_peak()
+        start_snapshot = tracemalloc.take_snapshot()
+        started = time.perf_counter()
+        profiler.start()
+        token = _current_profiler.set(profiler)
+        logging.info(f"🔬 Profiling '{label}' into {output_dir}")
+        try:
+            yield output_dir
+        finally:
+            _current_profiler.reset(token)
+            profiler.stop()
+            duration = time.perf_counter() - started
+            end_snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started_tracemalloc:
+                tracemalloc.stop()
+            _write_results(output_dir, label, profiler, start_snapshot, end_snapshot, duration, peak,
+                           profiling.top_allocators)
+    finally:
+        _active.release()
+
+
+def _write_results(
+    output_dir: Path,
+    label: str,
+    profiler: SamplingProfiler,
+    start_snapshot: tracemalloc.Snapshot,
+    end_snapshot: tracemalloc.Snapshot,
+    duration: float,
+    peak: int,
+    top: int
+) -> None:
+    try:
+        profiler.write_folded(output_dir / "cpu.folded")
+
+        allocators = top_allocators_per_stage(start_snapshot, end_snapshot, top)
+        with open(output_dir / "memory.txt", "w", encoding="utf-8") as f:
+            for stage, sites in allocators.items():
+                f.write(f"== {stage} ({sum(s['size_bytes'] for s in sites) / 1024:.1f} KiB in top {len(sites)})\n")
+                for site in sites:
+                    f.write(f"{site['size_bytes'] / 1024:10.1f} KiB {site['count']:8d} blocks  {site['site']}\n")
+                f.write("\n")
+
+        samples = max(profiler.samples, 1)
+        summary = {
+            "label": label,
+            "duration_s": round(duration, 3),
+            "samples": profiler.samples,
+            "threads_sampled": len(profiler.threads_seen),
+            "cpu_share_per_stage": {
+                stage: round(count / samples, 3) for stage, count in profiler.stages.most_common()
+            },
+            "tracemalloc_peak_bytes": peak,
+            "retained_bytes_per_stage": {
+                stage: sum(site["size_bytes"] for site in sites) for stage, sites in allocators.items()
+            }
+        }
+        with open(output_dir / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        logging.info(f"🔬 Profile of '{label}' written to {output_dir} ({profiler.samples} samples, {duration:.1f}s)")
+    except Exception as e:
+        logging.warning(f"⚠️ Failed to write profile to {output_dir}: {e}")
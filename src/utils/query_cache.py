@@ -0,0 +1,270 @@
+"""
+Result cache of /besluiten queries.
+
+Workflows often ask for the same range with the same filters, in whatever
+order they list them. Queries are normalized into a key (date range, sorted
+and lowercased filters, the parts of the pipeline that run), so
+`?provinces=Utrecht&provinces=gelderland` and
+`?provinces=gelderland&provinces=utrecht` share one entry.
+
+How long a result stays fresh depends on the range: a range that ended before
+today hardly changes and is kept for `past_ttl`; one that includes today still
+gets new besluiten and is kept for `current_ttl`. After that the entry is
+stale for another `stale_ttl`: it is still returned immediately, while a
+background refresh replaces it (stale-while-revalidate). Concurrent misses and
+refreshes of the same query share a single run.
+
+Entries live in process memory (they are lists of records, not JSON), so each
+server worker has its own cache.
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from collections import OrderedDict
+from datetime import date
+from enum import Enum
+from functools import lru_cache
+from urllib.parse import parse_qs
+import logging
+import threading
+import time
+
+from src.config.settings import QueryCacheSettings, get_settings
+from src.utils.filters import BordcodeCategory
+from src.utils.metrics import MetricsRegistry, get_metrics
+from src.utils.single_flight import SingleFlight
+
+HIT = "HIT"
+STALE = "STALE"
+MISS = "MISS"
+BYPASS = "BYPASS"
+
+# /besluiten query parameters that change the result
+_QUERY_PARAMETERS = {"bordcode_categories", "provinces", "gemeenten", "fields", "metadata_only", "classify_images"}
+
+
+class BesluitenQuery(NamedTuple):
+    """Normalized /besluiten query, used as cache key."""
+    start: str
+    end: str
+    bordcode_categories: Tuple[str, ...]
+    provinces: Tuple[str, ...]
+    gemeenten: Tuple[str, ...]
+    include_text: bool
+    include_images: bool
+    metadata_only: bool
+    classify_images: bool
+
+    @classmethod
+    def normalize(
+        cls,
+        start_date_str: str,
+        end_date_str: str,
+        bordcode_categories: Optional[Iterable[Any]] = None,
+        provinces: Optional[Iterable[str]] = None,
+        gemeenten: Optional[Iterable[str]] = None,
+        include_text: bool = True,
+        include_images: bool = True,
+        metadata_only: bool = False,
+        classify_images: bool = False
+    ) -> "BesluitenQuery":
+        """
+        Raises:
+            ValueError: If a date is not in YYYY-MM-DD format
+        """
+        if metadata_only:
+            include_text = include_images = False
+        return cls(
+            start=date.fromisoformat(start_date_str).isoformat(),
+            end=date.fromisoformat(end_date_str).isoformat(),
+            bordcode_categories=_normalize_filter(
+                category.value if isinstance(category, Enum) else category for category in bordcode_categories or ()
+            ),
+            provinces=_normalize_filter(provinces),
+            gemeenten=_normalize_filter(gemeenten),
+            include_text=include_text,
+            include_images=include_images,
+            metadata_only=metadata_only,
+            classify_images=classify_images and include_images
+        )
+
+    @classmethod
+    def from_query_string(
+        cls, start_date_str: str, end_date_str: str, query_string: str = "", classify_images: bool = False
+    ) -> "BesluitenQuery":
+        """
+        The query of a /besluiten request, e.g. "provinces=utrecht&fields=metadata".
+
+        Args:
+            classify_images: Default when the query string has no classify_images
+
+        Raises:
+            ValueError: If a date or parameter is invalid
+        """
+        params = parse_qs(query_string)
+        unknown = set(params) - _QUERY_PARAMETERS
+        if unknown:
+            raise ValueError(f"Unsupported query parameters: {', '.join(sorted(unknown))}")
+        field_names = set(params.get("fields", [])) or None
+        metadata_only = _flag(params, "metadata_only", False)
+        if metadata_only:
+            field_names = (field_names or {"id", "metadata"}) - {"text", "images"}
+        return cls.normalize(
+            start_date_str, end_date_str,
+            bordcode_categories=[BordcodeCategory(value.upper()) for value in params.get("bordcode_categories", [])],
+            provinces=params.get("provinces"),
+            gemeenten=params.get("gemeenten"),
+            include_text=field_names is None or "text" in field_names,
+            include_images=field_names is None or "images" in field_names,
+            metadata_only=metadata_only,
+            classify_images=_flag(params, "classify_images", classify_images)
+        )
+
+    def service_kwargs(self) -> Dict[str, Any]:
+        """Arguments of BesluitService.get_besluiten_for_date that run this query."""
+        return {
+            "start_date_str": self.start,
+            "end_date_str": self.end,
+            "bordcode_categories": [BordcodeCategory(value.upper()) for value in self.bordcode_categories] or None,
+            "provinces": list(self.provinces) or None,
+            "gemeenten": list(self.gemeenten) or None,
+            "include_text": self.include_text,
+            "include_images": self.include_images,
+            "metadata_only": self.metadata_only,
+            "classify_embedded_images": self.classify_images
+        }
+
+    def includes_today(self) -> bool:
+        return self.end >= date.today().isoformat()
+
+
+def _flag(params: Dict[str, List[str]], name: str, default: bool) -> bool:
+    values = params.get(name)
+    return values[-1].lower() in ("true", "1", "yes", "on") if values else default
+
+
+def _normalize_filter(values: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    return tuple(sorted({value.strip().lower() for value in values or () if value and value.strip()}))
+
+
+class _Entry:
+    __slots__ = ("value", "fresh_until", "stale_until")
+
+    def __init__(self, value: Any, fresh_until: float, stale_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+
+class QueryCache:
+    """LRU cache of query results with per-range TTLs and stale-while-revalidate."""
+
+    def __init__(self, settings: QueryCacheSettings, metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            settings: Query cache settings (TTLs, size limits)
+            metrics: Metrics registry (defaults to the process-wide registry)
+        """
+        self._settings = settings
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[BesluitenQuery, _Entry]" = OrderedDict()
+        self._refreshing: set = set()
+        self._metrics = metrics or get_metrics()
+        self._flight = SingleFlight("query_cache", metrics=self._metrics)
+        self._metrics.register_collector("query_cache", self.stats)
+
+    def get(self, query: BesluitenQuery, loader: Callable[[], List[Any]]) -> Tuple[List[Any], str]:
+        """
+        The cached result of a query, loading it on a miss.
+
+        Args:
+            query: The normalized query
+            loader: Runs the query (called without arguments)
+
+        Returns:
+            Tuple of (result, cache status: HIT, STALE or MISS)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None and entry.stale_until <= now:
+                del self._entries[query]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(query)
+                status = HIT if entry.fresh_until > now else STALE
+                refresh = status == STALE and query not in self._refreshing
+                if refresh:
+                    self._refreshing.add(query)
+
+        if entry is None:
+            self._metrics.increment("query_cache.miss")
+            return self._flight.do(query, self._load, query, loader), MISS
+
+        self._metrics.increment(f"query_cache.{status.lower()}")
+        if refresh:
+            threading.Thread(
+                target=self._refresh, args=(query, loader), name="query-cache-refresh", daemon=True
+            ).start()
+        return entry.value, status
+
+    def refresh(self, query: BesluitenQuery, loader: Callable[[], List[Any]]) -> List[Any]:
+        """Run a query and store its result, whatever the state of its entry (used by the cache warmer)."""
+        return self._flight.do(query, self._load, query, loader)
+
+    def needs_refresh(self, query: BesluitenQuery) -> bool:
+        """Whether the query is missing or no longer fresh."""
+        with self._lock:
+            entry = self._entries.get(query)
+            return entry is None or entry.fresh_until <= time.monotonic()
+
+    def ttl(self, query: BesluitenQuery) -> int:
+        """Seconds a result of the query stays fresh."""
+        return self._settings.current_ttl if query.includes_today() else self._settings.past_ttl
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            fresh = sum(1 for entry in self._entries.values() if entry.fresh_until > now)
+            return {
+                "entries": len(self._entries),
+                "fresh": fresh,
+                "stale": len(self._entries) - fresh,
+                "refreshing": len(self._refreshing)
+            }
+
+    def _load(self, query: BesluitenQuery, loader: Callable[[], List[Any]]) -> List[Any]:
+        result = loader()
+        # Empty results are not kept, so a day KOOP has not published yet is not cached as empty
+        if result and len(result) <= self._settings.max_records_per_entry:
+            now = time.monotonic()
+            fresh_until = now + self.ttl(query)
+            with self._lock:
+                self._entries.pop(query, None)
+                self._entries[query] = _Entry(result, fresh_until, fresh_until + self._settings.stale_ttl)
+                while len(self._entries) > self._settings.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def _refresh(self, query: BesluitenQuery, loader: Callable[[], List[Any]]) -> None:
+        try:
+            self._flight.do(query, self._load, query, loader)
+            self._metrics.increment("query_cache.refreshed")
+        except Exception as e:
+            self._metrics.increment("query_cache.refresh_failed")
+            logging.warning(f"⚠️ Background refresh of {query.start} to {query.end} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(query)
+
+
+@lru_cache()
+def get_query_cache() -> Optional[QueryCache]:
+    """The process-wide query cache, or None when it is disabled."""
+    settings = get_settings()
+    if not settings.query_cache.enabled:
+        return None
+    return QueryCache(settings.query_cache)
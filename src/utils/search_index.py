@@ -0,0 +1,315 @@
+"""
+Local full-text and metadata search index over processed verkeersbesluiten.
+
+Every besluit produced by the service is stored in a SQLite database with an
+FTS5 index over its text and the metadata fields people search on (authority,
+creator, verkeersbordcode and gebiedsmarkering labels). Queries are answered
+locally in milliseconds, without going back to KOOP.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+import json
+import logging
+import re
+import sqlite3
+import threading
+
+from src.config.settings import get_settings
+from src.utils.besluit_record import BesluitMetadata, BesluitRecord
+
+# Metadata keys that may carry the publication date, in order of preference
+DATE_METADATA_KEYS = ["DCTERMS.modified", "DCTERMS.issued", "DCTERMS.available", "DC.date"]
+
+_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS besluiten (
+    rowid INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    date TEXT,
+    authority TEXT,
+    creator TEXT,
+    bordcode TEXT,
+    labels TEXT,
+    text TEXT,
+    metadata TEXT NOT NULL,
+    images TEXT NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS besluiten_date ON besluiten(date);
+CREATE INDEX IF NOT EXISTS besluiten_authority ON besluiten(authority COLLATE NOCASE);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS besluiten_fts USING fts5(
+    text, authority, creator, bordcode, labels,
+    content='besluiten', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS besluiten_ai AFTER INSERT ON besluiten BEGIN
+    INSERT INTO besluiten_fts(rowid, text, authority, creator, bordcode, labels)
+    VALUES (new.rowid, new.text, new.authority, new.creator, new.bordcode, new.labels);
+END;
+CREATE TRIGGER IF NOT EXISTS besluiten_ad AFTER DELETE ON besluiten BEGIN
+    INSERT INTO besluiten_fts(besluiten_fts, rowid, text, authority, creator, bordcode, labels)
+    VALUES ('delete', old.rowid, old.text, old.authority, old.creator, old.bordcode, old.labels);
+END;
+CREATE TRIGGER IF NOT EXISTS besluiten_au AFTER UPDATE ON besluiten BEGIN
+    INSERT INTO besluiten_fts(besluiten_fts, rowid, text, authority, creator, bordcode, labels)
+    VALUES ('delete', old.rowid, old.text, old.authority, old.creator, old.bordcode, old.labels);
+    INSERT INTO besluiten_fts(rowid, text, authority, creator, bordcode, labels)
+    VALUES (new.rowid, new.text, new.authority, new.creator, new.bordcode, new.labels);
+END;
+"""
+
+_UPSERT = """
+INSERT INTO besluiten (id, date, authority, creator, bordcode, labels, text, metadata, images, indexed_at)
+VALUES (:id, :date, :authority, :creator, :bordcode, :labels, :text, :metadata, :images, :indexed_at)
+ON CONFLICT(id) DO UPDATE SET
+    date = excluded.date,
+    authority = excluded.authority,
+    creator = excluded.creator,
+    bordcode = excluded.bordcode,
+    labels = excluded.labels,
+    text = COALESCE(excluded.text, besluiten.text),
+    metadata = excluded.metadata,
+    images = excluded.images,
+    indexed_at = excluded.indexed_at
+"""
+
+
+class SearchIndex:
+    """SQLite FTS5 index of processed besluiten."""
+
+    def __init__(self, database_path: Path):
+        """
+        Args:
+            database_path: Path of the SQLite database file (created if missing)
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(database_path), check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(_SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The underlying connection (hold `lock` while using it)."""
+        return self._connection
+
+    @property
+    def lock(self) -> threading.Lock:
+        return self._lock
+
+    def add_many(self, besluiten: Iterable[BesluitRecord]) -> int:
+        """
+        Insert or update processed besluiten in one transaction.
+
+        Args:
+            besluiten: Processed besluit records
+
+        Returns:
+            Number of besluiten written
+        """
+        rows = [self._to_row(besluit) for besluit in besluiten]
+        if not rows:
+            return 0
+        with self._lock, self._connection:
+            self._connection.executemany(_UPSERT, rows)
+        logging.info(f"🔎 Indexed {len(rows)} besluiten for local search")
+        return len(rows)
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        authority: Optional[str] = None,
+        creator: Optional[str] = None,
+        bordcode: Optional[str] = None,
+        label: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        include_text: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Search the index by keywords and/or metadata fields.
+
+        Args:
+            q: Full-text query in FTS5 syntax (e.g. 'hoofdweg AND parkeren', 'fiets*')
+            authority: Match within OVERHEID.authority
+            creator: Match within DC.creator
+            bordcode: Verkeersbordcode, prefix match (e.g. 'C' or 'C1')
+            label: Match within gebiedsmarkering labels (street names)
+            start_date: Only besluiten on or after this date (YYYY-MM-DD)
+            end_date: Only besluiten on or before this date (YYYY-MM-DD)
+            limit: Maximum number of results
+            offset: Number of results to skip
+            include_text: Include the full text of each besluit
+
+        Returns:
+            Dictionary with the total number of matches and the requested page of results
+
+        Raises:
+            ValueError: If the query cannot be parsed
+        """
+        match_terms = []
+        if q:
+            match_terms.append(f"({q})")
+        for column, value in (("authority", authority), ("creator", creator), ("labels", label)):
+            if value:
+                match_terms.append(f"{column} : {self._phrase(value)}")
+        if bordcode:
+            match_terms.append(f"bordcode : {self._phrase(bordcode)} *")
+
+        where = []
+        params: Dict[str, Any] = {"limit": limit, "offset": offset}
+        if match_terms:
+            where.append("besluiten_fts MATCH :match")
+            params["match"] = " AND ".join(match_terms)
+        if start_date:
+            where.append("b.date >= :start_date")
+            params["start_date"] = start_date
+        if end_date:
+            where.append("b.date <= :end_date")
+            params["end_date"] = end_date
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+
+        if match_terms:
+            from_sql = "besluiten_fts JOIN besluiten b ON b.rowid = besluiten_fts.rowid"
+            snippet_sql = "snippet(besluiten_fts, 0, '[', ']', '…', 16)"
+            order_sql = "ORDER BY bm25(besluiten_fts)"
+        else:
+            from_sql = "besluiten b"
+            snippet_sql = "NULL"
+            order_sql = "ORDER BY b.date DESC, b.id"
+
+        text_sql = ", b.text" if include_text else ""
+        query = (
+            f"SELECT b.id, b.date, b.authority, b.creator, b.bordcode, b.metadata, b.images{text_sql}, "
+            f"{snippet_sql} AS snippet FROM {from_sql} {where_sql} {order_sql} LIMIT :limit OFFSET :offset"
+        )
+        count_query = f"SELECT COUNT(*) FROM {from_sql} {where_sql}"
+
+        try:
+            with self._lock:
+                total = self._connection.execute(count_query, params).fetchone()[0]
+                rows = self._connection.execute(query, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query: {e}")
+
+        results = []
+        for row in rows:
+            result = {
+                "id": row["id"],
+                "date": row["date"],
+                "authority": row["authority"],
+                "creator": row["creator"],
+                "bordcode": row["bordcode"],
+                "snippet": row["snippet"],
+                "metadata": json.loads(row["metadata"]),
+                "images": json.loads(row["images"])
+            }
+            if include_text:
+                result["text"] = row["text"]
+            results.append(result)
+        return {"total": total, "results": results}
+
+    def iter_metadata(self, start_date: str, end_date: str) -> Iterator[Tuple[str, Optional[str], Dict[str, Any]]]:
+        """
+        Iterate over the indexed besluiten published in a date range.
+
+        Returns:
+            Iterator of (id, publication date, metadata dictionary)
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, date, metadata FROM besluiten WHERE date >= ? AND date <= ? ORDER BY date, id",
+                (start_date, end_date)
+            ).fetchall()
+        for row in rows:
+            yield row["id"], row["date"], json.loads(row["metadata"])
+
+    def iter_records(
+        self,
+        start_date: str,
+        end_date: str,
+        include_text: bool = False,
+        batch_size: int = 1000
+    ) -> Iterator[Tuple[Optional[str], BesluitRecord]]:
+        """
+        Stream the indexed besluiten published in a date range, ordered by date and id.
+
+        Rows are read in batches (keyset pagination), so memory stays bounded
+        however large the range is and the lock is not held between batches.
+
+        Returns:
+            Iterator of (publication date, record)
+        """
+        text_sql = "text" if include_text else "NULL AS text"
+        query = (
+            f"SELECT id, date, {text_sql}, metadata, images FROM besluiten "
+            "WHERE date >= :start_date AND date <= :end_date AND (date > :after_date OR (date = :after_date AND id > :after_id)) "
+            "ORDER BY date, id LIMIT :limit"
+        )
+        params = {"start_date": start_date, "end_date": end_date, "after_date": "", "after_id": "", "limit": batch_size}
+        while True:
+            with self._lock:
+                rows = self._connection.execute(query, params).fetchall()
+            for row in rows:
+                yield row["date"], BesluitRecord(
+                    id=row["id"],
+                    text=row["text"],
+                    metadata=BesluitMetadata.from_dict(json.loads(row["metadata"])),
+                    images=json.loads(row["images"])
+                )
+            if len(rows) < batch_size:
+                return
+            params["after_date"], params["after_id"] = rows[-1]["date"], rows[-1]["id"]
+
+    def count(self) -> int:
+        """Number of indexed besluiten."""
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM besluiten").fetchone()[0]
+
+    @staticmethod
+    def publication_date(metadata: BesluitMetadata) -> Optional[str]:
+        """The publication date (YYYY-MM-DD) of a besluit, taken from its metadata."""
+        for key in DATE_METADATA_KEYS:
+            value = metadata.get(key)
+            if isinstance(value, str) and (match := _DATE_PATTERN.match(value)):
+                return match.group(0)
+        return None
+
+    @classmethod
+    def _to_row(cls, besluit: BesluitRecord) -> Dict[str, Any]:
+        metadata = besluit.metadata
+        labels = " ".join(gebied.label or "" for gebied in metadata.gebiedsmarkering).strip()
+        return {
+            "id": besluit.id,
+            "date": cls.publication_date(metadata),
+            "authority": metadata.authority,
+            "creator": metadata.creator,
+            "bordcode": metadata.bordcode,
+            "labels": labels or None,
+            "text": besluit.text,
+            "metadata": json.dumps(metadata.to_dict(), ensure_ascii=False),
+            "images": json.dumps([str(url) for url in besluit.images]),
+            "indexed_at": datetime.now().isoformat(timespec="seconds")
+        }
+
+    @staticmethod
+    def _phrase(value: str) -> str:
+        """Quote a user value as an FTS5 phrase."""
+        return '"' + value.replace('"', '""') + '"'
+
+
+@lru_cache()
+def get_search_index() -> SearchIndex:
+    """Get the process-wide search index."""
+    settings = get_settings()
+    return SearchIndex(settings.directories.verkeersbesluiten / settings.search.database)
@@ -0,0 +1,193 @@
+"""
+State shared between the worker processes of a pre-fork server.
+
+Every worker has its own memory, so rate limiting (a 429 seen by one worker
+has to slow down all of them), caches whose entries are expensive to
+recompute and leases for background jobs that must run in only one worker
+are kept in a small SQLite database next to the search index.
+Read-modify-write updates take SQLite's write lock up front (BEGIN IMMEDIATE),
+which makes them atomic between processes. Each process uses its own
+connection; a connection inherited through a fork is never used.
+"""
+
+from typing import Any, Dict, Optional
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+import os
+import sqlite3
+import threading
+import time
+
+from src.config.settings import get_settings
+from src.utils.metrics import get_metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_limit (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    rate_limited INTEGER NOT NULL DEFAULT 0,
+    last_request_time REAL NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO rate_limit (id) VALUES (1);
+CREATE TABLE IF NOT EXISTS cache (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS lease (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Expired cache entries are purged every this many writes
+_PURGE_EVERY = 1000
+
+
+class SharedState:
+    """Rate-limit state and a TTL key/value cache shared between processes."""
+
+    def __init__(self, database_path: Path):
+        """
+        Args:
+            database_path: Path of the SQLite database file (created if missing)
+        """
+        self._database_path = Path(database_path)
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._connection = self._connect()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            str(self._database_path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        return connection
+
+    def _current_connection(self) -> sqlite3.Connection:
+        """This process's connection (hold the lock); reopened after a fork."""
+        if os.getpid() != self._pid:
+            # The parent's connection stays untouched: closing it here could release its locks
+            self._pid = os.getpid()
+            self._connection = self._connect()
+        return self._connection
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            connection = self._current_connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def is_rate_limited(self) -> bool:
+        with self._lock:
+            row = self._current_connection().execute("SELECT rate_limited FROM rate_limit WHERE id = 1").fetchone()
+        return bool(row and row[0])
+
+    def set_rate_limited(self, rate_limited: bool) -> bool:
+        """
+        Switch the shared rate limiting on or off.
+
+        Returns:
+            Whether the state changed (so only one worker logs the switch)
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE rate_limit SET rate_limited = ? WHERE id = 1 AND rate_limited != ?",
+                (int(rate_limited), int(rate_limited))
+            )
+            return cursor.rowcount > 0
+
+    def reserve_request(self, delay: float) -> float:
+        """
+        Reserve the next request slot, spaced `delay` seconds after the previous one
+        across all workers.
+
+        Returns:
+            Seconds the caller has to wait before making its request
+        """
+        with self._transaction() as connection:
+            (last_request_time,) = connection.execute(
+                "SELECT last_request_time FROM rate_limit WHERE id = 1"
+            ).fetchone()
+            now = time.time()
+            sleep_time = max(0.0, last_request_time + delay - now)
+            connection.execute("UPDATE rate_limit SET last_request_time = ? WHERE id = 1", (now + sleep_time,))
+        return sleep_time
+
+    def cache_get(self, namespace: str, key: str) -> Optional[str]:
+        """The cached value, or None when missing or expired."""
+        with self._lock:
+            row = self._current_connection().execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND expires > ?",
+                (namespace, key, time.time())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def cache_set(self, namespace: str, key: str, value: str, ttl: float) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                (namespace, key, value, time.time() + ttl)
+            )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY == 0:
+                connection.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """
+        Take or renew a named lease. A lease that is not renewed expires after `ttl`
+        seconds, so a worker that died hands it over to another one.
+
+        Returns:
+            Whether `owner` holds the lease
+        """
+        with self._transaction() as connection:
+            row = connection.execute("SELECT owner, expires FROM lease WHERE name = ?", (name,)).fetchone()
+            now = time.time()
+            if row is not None and row[0] != owner and row[1] > now:
+                return False
+            connection.execute(
+                "INSERT OR REPLACE INTO lease (name, owner, expires) VALUES (?, ?, ?)", (name, owner, now + ttl)
+            )
+            return True
+
+    def release_lease(self, name: str, owner: str) -> None:
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM lease WHERE name = ? AND owner = ?", (name, owner))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._current_connection().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {"database": str(self._database_path), "cache_entries": entries,
+                "hits": self.hits, "misses": self.misses}
+
+
+@lru_cache()
+def get_shared_state() -> Optional[SharedState]:
+    """The state shared between workers, or None when running a single process."""
+    settings = get_settings()
+    if not settings.server.shared_state_enabled:
+        return None
+    directory = Path(settings.directories.verkeersbesluiten)
+    directory.mkdir(parents=True, exist_ok=True)
+    state = SharedState(directory / settings.server.shared_state_database)
+    get_metrics().register_collector("shared_state", state.stats)
+    return state
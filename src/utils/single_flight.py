@@ -0,0 +1,93 @@
+"""
+In-flight request coalescing ("single flight").
+
+When several threads ask for the same key at the same time, only the first one
+executes the work; the others wait for it and receive the same result (or the
+same exception). Nothing is cached once the call has finished.
+"""
+
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+
+from src.utils.metrics import MetricsRegistry, get_metrics
+
+
+class _Call:
+    """State of a single in-flight call shared between its waiters."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution."""
+
+    def __init__(self, name: str, metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            name: Name under which statistics are reported in the metrics snapshot
+            metrics: Metrics registry (defaults to the process-wide registry)
+        """
+        self._name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executed = 0
+        self._coalesced = 0
+        (metrics or get_metrics()).register_collector(f"single_flight.{name}", self.stats)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) unless a call with the same key is already running,
+        in which case wait for that call and return its result.
+        
+        Args:
+            key: Hashable identity of the work (e.g. a URL or besluit ID)
+            fn: Callable that performs the work
+            
+        Returns:
+            The result of the (possibly shared) call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Execution and coalescing counts, plus the share of calls that were coalesced."""
+        with self._lock:
+            executed, coalesced, in_flight = self._executed, self._coalesced, len(self._calls)
+        total = executed + coalesced
+        return {
+            "calls": total,
+            "executed": executed,
+            "coalesced": coalesced,
+            "in_flight": in_flight,
+            "coalescing_rate": round(coalesced / total, 4) if total else 0.0
+        }
@@ -0,0 +1,201 @@
+"""
+Spatial index over the gebiedsmarkering geometries of processed besluiten.
+
+Geometries are parsed from WKT into packed coordinate arrays and stored next
+to the search index, with their bounding boxes in an SQLite R*Tree. Bounding
+box and radius queries use the R*Tree to find candidates and then test the
+exact geometry.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from functools import lru_cache
+import json
+import logging
+import math
+
+from src.utils.besluit_record import BesluitRecord, GebiedsMarkering
+from src.utils.geometry import Geometry, METRES_PER_DEGREE, parse_wkt
+from src.utils.search_index import SearchIndex, get_search_index
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS gebieden (
+    rowid INTEGER PRIMARY KEY,
+    besluit_id TEXT NOT NULL,
+    type TEXT,
+    label TEXT,
+    geometry_type TEXT NOT NULL,
+    coords BLOB NOT NULL,
+    structure BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS gebieden_besluit ON gebieden(besluit_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS gebieden_rtree USING rtree(rowid, min_x, max_x, min_y, max_y);
+"""
+
+
+class SpatialIndex:
+    """R*Tree index of gebiedsmarkering geometries, stored in the search database."""
+
+    def __init__(self, search_index: SearchIndex):
+        """
+        Args:
+            search_index: Search index whose database also holds the spatial tables
+        """
+        self._connection = search_index.connection
+        self._lock = search_index.lock
+        with self._lock:
+            self._connection.executescript(_SCHEMA)
+
+    def add_many(self, besluiten: Iterable[BesluitRecord]) -> int:
+        """
+        Replace the indexed geometries of the given besluiten.
+
+        Args:
+            besluiten: Processed besluit records
+
+        Returns:
+            Number of geometries indexed
+        """
+        rows: List[Tuple[str, GebiedsMarkering, Geometry]] = []
+        besluit_ids = []
+        for besluit in besluiten:
+            besluit_ids.append(besluit.id)
+            for gebied in besluit.metadata.gebiedsmarkering:
+                if geometry := parse_wkt(gebied.geometrie):
+                    rows.append((besluit.id, gebied, geometry))
+
+        if not besluit_ids:
+            return 0
+
+        with self._lock, self._connection:
+            for besluit_id in besluit_ids:
+                self._connection.execute(
+                    "DELETE FROM gebieden_rtree WHERE rowid IN (SELECT rowid FROM gebieden WHERE besluit_id = ?)",
+                    (besluit_id,)
+                )
+                self._connection.execute("DELETE FROM gebieden WHERE besluit_id = ?", (besluit_id,))
+            for besluit_id, gebied, geometry in rows:
+                coords, structure = geometry.to_blobs()
+                cursor = self._connection.execute(
+                    "INSERT INTO gebieden (besluit_id, type, label, geometry_type, coords, structure) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (besluit_id, gebied.type, gebied.label, geometry.geometry_type, coords, structure)
+                )
+                min_x, min_y, max_x, max_y = geometry.bbox
+                self._connection.execute(
+                    "INSERT INTO gebieden_rtree (rowid, min_x, max_x, min_y, max_y) VALUES (?, ?, ?, ?, ?)",
+                    (cursor.lastrowid, min_x, max_x, min_y, max_y)
+                )
+
+        if rows:
+            logging.info(f"🗺️ Indexed {len(rows)} gebiedsmarkering geometries")
+        return len(rows)
+
+    def search_bbox(
+        self,
+        min_x: float,
+        min_y: float,
+        max_x: float,
+        max_y: float,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """
+        Find besluiten with a gebiedsmarkering that intersects a bounding box.
+
+        Args:
+            min_x, min_y, max_x, max_y: Box in the coordinate system of the stored geometries
+
+        Returns:
+            Matching besluiten with their intersecting gebiedsmarkeringen
+        """
+        if min_x > max_x or min_y > max_y:
+            raise ValueError("Bounding box minimum must not exceed its maximum")
+
+        matches = []
+        for row in self._candidates(min_x, min_y, max_x, max_y):
+            geometry = Geometry.from_blobs(row["geometry_type"], row["coords"], row["structure"])
+            if geometry.intersects_bbox(min_x, min_y, max_x, max_y):
+                matches.append((row, None))
+        return self._group_by_besluit(matches, limit)
+
+    def search_radius(self, x: float, y: float, radius_m: float, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Find besluiten with a gebiedsmarkering within a radius of a point.
+
+        The point must be in the same coordinate system as the stored geometries. For
+        WGS84 longitude/latitude the radius is converted to degrees around the point;
+        for RD New the coordinates already are metres.
+
+        Args:
+            x: Longitude or RD x
+            y: Latitude or RD y
+            radius_m: Radius in metres
+
+        Returns:
+            Matching besluiten, nearest first, with the distance in metres
+        """
+        if radius_m < 0:
+            raise ValueError("Radius must not be negative")
+
+        if -180 <= x <= 180 and -90 <= y <= 90:
+            delta_y = radius_m / METRES_PER_DEGREE
+            delta_x = radius_m / (METRES_PER_DEGREE * max(math.cos(math.radians(y)), 1e-6))
+        else:
+            delta_x = delta_y = radius_m
+
+        matches = []
+        for row in self._candidates(x - delta_x, y - delta_y, x + delta_x, y + delta_y):
+            geometry = Geometry.from_blobs(row["geometry_type"], row["coords"], row["structure"])
+            distance = geometry.distance_to(x, y)
+            if distance <= radius_m:
+                matches.append((row, distance))
+        return self._group_by_besluit(matches, limit)
+
+    def _candidates(self, min_x: float, min_y: float, max_x: float, max_y: float):
+        with self._lock:
+            return self._connection.execute(
+                "SELECT g.rowid, g.besluit_id, g.type, g.label, g.geometry_type, g.coords, g.structure "
+                "FROM gebieden_rtree r JOIN gebieden g ON g.rowid = r.rowid "
+                "WHERE r.max_x >= ? AND r.min_x <= ? AND r.max_y >= ? AND r.min_y <= ?",
+                (min_x, max_x, min_y, max_y)
+            ).fetchall()
+
+    def _group_by_besluit(self, matches: List[Tuple[Any, Optional[float]]], limit: int) -> List[Dict[str, Any]]:
+        """Collapse matching geometries to one result per besluit, joined with its indexed metadata."""
+        results: Dict[str, Dict[str, Any]] = {}
+        for row, distance in matches:
+            result = results.setdefault(row["besluit_id"], {"id": row["besluit_id"], "gebiedsmarkeringen": []})
+            result["gebiedsmarkeringen"].append({
+                "type": row["type"],
+                "label": row["label"],
+                "geometry_type": row["geometry_type"]
+            })
+            if distance is not None:
+                result["distance_m"] = round(min(distance, result.get("distance_m", math.inf)), 1)
+
+        ordered = sorted(results.values(), key=lambda r: (r.get("distance_m", 0), r["id"]))[:limit]
+        if not ordered:
+            return []
+
+        placeholders = ",".join("?" for _ in ordered)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT id, date, authority, creator, bordcode, images FROM besluiten WHERE id IN ({placeholders})",
+                [r["id"] for r in ordered]
+            ).fetchall()
+        details = {row["id"]: row for row in rows}
+        for result in ordered:
+            if row := details.get(result["id"]):
+                result.update({
+                    "date": row["date"],
+                    "authority": row["authority"],
+                    "creator": row["creator"],
+                    "bordcode": row["bordcode"],
+                    "images": json.loads(row["images"])
+                })
+        return ordered
+
+
+@lru_cache()
+def get_spatial_index() -> SpatialIndex:
+    """Get the process-wide spatial index (shares the search index database)."""
+    return SpatialIndex(get_search_index())
@@ -0,0 +1,44 @@
+"""
+CPU priority (niceness) of individual threads.
+
+On Linux every thread has its own nice value, and a new thread starts with
+the value of the thread that created it. Lowering the priority of a thread
+that outlives its job, or that starts workers of a shared thread pool, would
+therefore slow down unrelated later work as well. Background jobs lower the
+priority of a thread they own and that ends with the job; shared pools reset
+their workers to the priority of the process. Raising a priority again needs
+CAP_SYS_NICE (root in the Docker image); without it the reset is skipped.
+"""
+
+import logging
+import os
+import threading
+
+
+def lower_thread_priority(increment: int) -> bool:
+    """
+    Raise the niceness of the calling thread by `increment`.
+
+    Returns:
+        Whether the priority was lowered
+    """
+    if increment <= 0:
+        return False
+    try:
+        thread_id = threading.get_native_id()
+        os.setpriority(os.PRIO_PROCESS, thread_id, os.getpriority(os.PRIO_PROCESS, thread_id) + increment)
+        return True
+    except (AttributeError, OSError) as e:
+        logging.info(f"ℹ️ {threading.current_thread().name} runs at normal priority: {e}")
+        return False
+
+
+def reset_thread_priority() -> None:
+    """Give the calling thread the niceness of the process's main thread (a thread pool initializer)."""
+    try:
+        thread_id = threading.get_native_id()
+        niceness = os.getpriority(os.PRIO_PROCESS, os.getpid())
+        if os.getpriority(os.PRIO_PROCESS, thread_id) != niceness:
+            os.setpriority(os.PRIO_PROCESS, thread_id, niceness)
+    except (AttributeError, OSError) as e:
+        logging.warning(f"⚠️ {threading.current_thread().name} keeps a lower priority: {e}")
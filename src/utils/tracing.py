@@ -0,0 +1,343 @@
+"""
+Lightweight span tracing for the processing pipeline.
+
+Spans are timed sections (SRU search, HTTP requests and backoff, XML parsing,
+PDF rendering, CLIP classification, ...) linked into a trace per API request.
+The current trace and span live in context variables, so they follow a request
+into the threadpool; worker pools that should keep the trace submit their work
+through `contextvars.copy_context().run`.
+
+Finished spans are collected on the request's trace (for the Server-Timing
+header) and, when configured, exported in the OpenTelemetry OTLP/JSON format to
+a local file (one ExportTraceServiceRequest per line) and/or an OTLP/HTTP
+collector endpoint. Export runs on a background thread.
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import lru_cache, wraps
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+
+import requests
+
+from src.config.settings import Settings, get_settings
+from src.utils.metrics import get_metrics
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+STATUS_ERROR = 2
+
+# Spans with this name are reported per besluit in the Server-Timing header
+BESLUIT_SPAN = "besluit"
+
+_TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+@dataclass(slots=True)
+class Span:
+    """A timed section of work."""
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    kind: int = SPAN_KIND_INTERNAL
+    start_ns: int = 0
+    end_ns: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The span in OTLP/JSON form."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()]
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": STATUS_ERROR, "message": self.error}
+        return span
+
+
+class Trace:
+    """The spans recorded for one request."""
+
+    def __init__(self, trace_id: str, max_spans: int):
+        self.trace_id = trace_id
+        self._max_spans = max_spans
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            if len(self._spans) < self._max_spans:
+                self._spans.append(span)
+            else:
+                self.dropped += 1
+
+    def stage_totals(self) -> Dict[str, Tuple[float, int]]:
+        """Total duration (ms) and count per span name, besluit spans excluded."""
+        totals: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+        with self._lock:
+            for span in self._spans:
+                if span.name != BESLUIT_SPAN:
+                    totals[span.name][0] += span.duration_ms
+                    totals[span.name][1] += 1
+        return {name: (total, int(count)) for name, (total, count) in totals.items()}
+
+    def slowest_besluiten(self, limit: int) -> List[Tuple[str, float]]:
+        with self._lock:
+            besluiten = [
+                (str(span.attributes.get("besluit.id")), span.duration_ms)
+                for span in self._spans if span.name == BESLUIT_SPAN
+            ]
+        return sorted(besluiten, key=lambda item: item[1], reverse=True)[:limit]
+
+    def server_timing(self, max_besluiten: int) -> str:
+        """
+        Summarize the trace as a Server-Timing header value: one metric per stage
+        (total duration, with the number of spans in the description) and the
+        slowest besluiten.
+        """
+        metrics = [
+            f'{name};desc="{count}x";dur={total:.1f}'
+            for name, (total, count) in sorted(self.stage_totals().items(), key=lambda item: -item[1][0])
+        ]
+        metrics.extend(
+            f'{BESLUIT_SPAN};desc="{besluit_id}";dur={duration:.1f}'
+            for besluit_id, duration in self.slowest_besluiten(max_besluiten)
+        )
+        return ", ".join(metrics)
+
+
+class OTLPExporter:
+    """Exports finished spans in OTLP/JSON batches from a background thread."""
+
+    def __init__(self, service_name: str, file_path: str = "", endpoint: str = "",
+                 batch_size: int = 512, flush_interval: float = 2.0):
+        """
+        Args:
+            service_name: Value of the service.name resource attribute
+            file_path: File to append one ExportTraceServiceRequest JSON object per line to
+            endpoint: OTLP/HTTP traces endpoint, e.g. http://otel-collector:4318/v1/traces
+        """
+        self._resource = {"attributes": [_otlp_attribute("service.name", service_name)]}
+        self._file_path = file_path
+        self._endpoint = endpoint
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=batch_size * 20)
+        self.exported = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._flush_interval
+            while len(batch) < self._batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.dropped += len(batch)
+                logging.warning(f"⚠️ Failed to export {len(batch)} spans: {e}")
+
+    def _write(self, batch: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": self._resource,
+                "scopeSpans": [{
+                    "scope": {"name": "verkeersbesluiten"},
+                    "spans": [span.to_otlp() for span in batch]
+                }]
+            }]
+        }
+        if self._file_path:
+            with open(self._file_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        if self._endpoint:
+            response = requests.post(self._endpoint, json=payload, timeout=5)
+            response.raise_for_status()
+
+
+class Tracer:
+    """Creates spans for the current request's trace (and for export)."""
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self._settings = settings or get_settings()
+        tracing = self._settings.tracing
+        self.enabled = tracing.enabled
+        self._exporter: Optional[OTLPExporter] = None
+        if self.enabled and (tracing.export_file or tracing.otlp_endpoint):
+            self._exporter = OTLPExporter(
+                service_name=tracing.service_name,
+                file_path=tracing.export_file,
+                endpoint=tracing.otlp_endpoint
+            )
+        get_metrics().register_collector("tracing", self.stats)
+
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+        """
+        Context manager timing a section of work as a child of the current span.
+        Does nothing when tracing is disabled, or when there is no request trace and
+        nothing to export to.
+
+        Usage:
+            with tracer.span("pdf.render", dpi=300) as span:
+                ...
+                if span: span.set_attribute("pages", 1)
+        """
+        if not self.enabled or (_current_trace.get() is None and self._exporter is None):
+            return nullcontext()
+        return self._span(name, kind, attributes)
+
+    @contextmanager
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes) -> Iterator[Trace]:
+        """
+        Start a trace (e.g. for an HTTP request) with a root span, continuing the
+        W3C traceparent of the caller when given.
+        """
+        trace_id, parent_id = _new_id(16), None
+        if traceparent and (match := _TRACEPARENT_PATTERN.match(traceparent.strip().lower())):
+            trace_id, parent_id = match.groups()
+
+        trace = Trace(trace_id, self._settings.tracing.max_spans_per_trace)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            with self._span(name, SPAN_KIND_SERVER, attributes, parent_id=parent_id):
+                yield trace
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+
+    def record(self, name: str, start_ns: int, end_ns: int, **attributes) -> None:
+        """
+        Record an already finished section of work as a child of the current span,
+        e.g. a besluit that moved through several pipeline threads.
+        """
+        if not self.enabled or (_current_trace.get() is None and self._exporter is None):
+            return
+        span = self._new_span(name, SPAN_KIND_INTERNAL, attributes)
+        span.start_ns, span.end_ns = start_ns, end_ns
+        self._finish(span, _current_trace.get())
+
+    @contextmanager
+    def _span(self, name: str, kind: int, attributes: Dict[str, Any], parent_id: Optional[str] = None):
+        trace = _current_trace.get()
+        span = self._new_span(name, kind, attributes, parent_id)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            self._finish(span, trace)
+
+    @staticmethod
+    def _new_span(name: str, kind: int, attributes: Dict[str, Any], parent_id: Optional[str] = None) -> Span:
+        parent = _current_span.get()
+        trace = _current_trace.get()
+        return Span(
+            name=name,
+            trace_id=trace.trace_id if trace else (parent.trace_id if parent else _new_id(16)),
+            span_id=_new_id(8),
+            parent_id=parent.span_id if parent else parent_id,
+            kind=kind,
+            start_ns=time.time_ns(),
+            attributes=attributes
+        )
+
+    def _finish(self, span: Span, trace: Optional[Trace]) -> None:
+        if trace is not None:
+            trace.add(span)
+        if self._exporter is not None:
+            self._exporter.export(span)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "exporter": bool(self._exporter),
+            "exported_spans": self._exporter.exported if self._exporter else 0,
+            "dropped_spans": self._exporter.dropped if self._exporter else 0
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the current request, if any."""
+    return _current_trace.get()
+
+
+def traced(name: str, kind: int = SPAN_KIND_INTERNAL) -> Callable:
+    """Decorator that records every call of a function as a span."""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(name, kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@lru_cache()
+def get_tracer() -> Tracer:
+    """Get the process-wide tracer."""
+    return Tracer()
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
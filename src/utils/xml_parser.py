@@ -3,6 +3,8 @@ from typing import Dict, Any, List, Optional
 import logging
 import re
 
+from src.utils.tracing import traced
+
 class XMLParser:
     """
     Handles all XML parsing operations for verkeersbesluit data.
@@ -15,6 +17,7 @@ class XMLParser:
             "gzd": "http://standaarden.overheid.nl/sru"
         }
     
+    @traced("xml.plain_text")
     def extract_plain_text(self, xml_string: str) -> str:
         """
         Extracts plain text content from an XML string.
@@ -32,6 +35,7 @@ class XMLParser:
             logging.error(f"❌ XML Parse error: {e}")
             return ""
     
+    @traced("xml.parse_metadata")
     def parse_metadata_block(self, meta_root: ET.Element) -> Dict[str, Any]:
         """
         Parses a metadata block from XML into a structured dictionary.
@@ -86,6 +90,7 @@ class XMLParser:
                 urls["metadata"] = item_url.text
         return urls
     
+    @traced("xml.embedded_images")
     def extract_embedded_images(self, xml_string: str) -> List[str]:
         """
         Extracts embedded image references from XML content.
@@ -108,6 +113,7 @@ class XMLParser:
             logging.error(f"❌ XML parsing error: {e}")
             return []
     
+    @traced("xml.parse_sru")
     def parse_sru_response(self, xml_content: bytes) -> List[ET.Element]:
         """
         Parses an SRU response and extracts all records.
@@ -125,6 +131,26 @@ class XMLParser:
             logging.error(f"❌ XML parsing error: {e}")
             return []
     
+    def parse_number_of_records(self, xml_content: bytes) -> Optional[int]:
+        """
+        Extracts the total hit count (numberOfRecords) from an SRU response.
+        
+        Args:
+            xml_content: Raw XML content in bytes
+            
+        Returns:
+            Number of matching records, or None if it could not be determined
+        """
+        try:
+            root = ET.fromstring(xml_content)
+            element = root.find(".//sru:numberOfRecords", self.ns)
+            if element is None or not element.text:
+                return None
+            return int(element.text.strip())
+        except (ET.ParseError, ValueError) as e:
+            logging.error(f"❌ Could not read numberOfRecords: {e}")
+            return None
+    
     def extract_exb_code(self, metadata: Dict[str, Any]) -> Optional[str]:
         """
         Extracts the externe bijlage code from metadata.